@@ -0,0 +1,75 @@
+from functools import wraps
+
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt
+
+from idempotencia import idempotente
+
+admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
+
+
+def apenas_admin(view):
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if get_jwt().get("tipo") != "admin":
+            return jsonify({"message": "Acesso negado"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# ------------------------
+# Exportação completa (CSV / NDJSON em streaming)
+# ------------------------
+@admin_bp.get("/exportar/<string:model>")
+@apenas_admin
+def exportar(model):
+    from exportacao import resposta_exportacao
+    return resposta_exportacao(model)
+
+
+# ------------------------
+# Importação em lote de pacientes/profissionais (CSV)
+# ------------------------
+@admin_bp.post("/importar/<string:tipo>")
+@apenas_admin
+@idempotente
+def importar(tipo):
+    if tipo not in ("paciente", "profissional"):
+        return jsonify({"message": f"Tipo '{tipo}' inválido"}), 404
+    from importacao import MAX_LINHAS_HTTP, importar_de_requisicao
+    resultado = importar_de_requisicao(tipo, request)
+    if resultado is None:
+        return jsonify({"message": f"Arquivo com mais de {MAX_LINHAS_HTTP} linhas: "
+                                   f"use o comando flask importar-usuarios"}), 413
+    return jsonify(resultado), 200
+
+
+# ------------------------
+# Projeções analíticas (atualizadas por `flask projetar`)
+# ------------------------
+@admin_bp.get("/projecoes/<string:nome>")
+@apenas_admin
+def projecao(nome):
+    from projecoes import PROJECOES, listar_projecao
+    if nome not in PROJECOES:
+        return jsonify({"message": f"Projeção '{nome}' não encontrada"}), 404
+    estado = (request.args.get("uf") or "").upper() or None
+    return jsonify(listar_projecao(nome, estado)), 200
+
+
+# ------------------------
+# Busca de usuários por nome, e-mail ou descrição da necessidade
+# ------------------------
+@admin_bp.get("/buscar")
+@apenas_admin
+def buscar():
+    from busca import buscar_usuarios
+    resultado = buscar_usuarios(
+        request.args.get("q", ""),
+        pagina=request.args.get("pagina", 1, type=int),
+        por_pagina=request.args.get("por_pagina", 20, type=int),
+    )
+    if resultado is None:
+        return jsonify({"message": "Busca de texto não disponível neste banco"}), 501
+    return jsonify(resultado), 200
@@ -0,0 +1,66 @@
+import os
+import threading
+
+from flask import g, jsonify, request
+
+# Controle de admissão: limite de requisições em andamento por classe de rota, em cada processo.
+# Acima do limite a requisição é recusada na hora com 503 + Retry-After, em vez de esperar
+# atrás de hashes de senha e SMTP até todo o serviço estourar o tempo limite.
+#   senha    hash de senha e envio de e-mail (login, cadastros, recuperação, importação)
+#   escrita  demais rotas que gravam
+#   leitura  consultas (ranking, históricos, listagens)
+# /health nunca é recusada. Leituras e escritas esperam um pouco por vaga; rotas de senha não.
+# Limite 0 = sem limite para a classe. Deixe WEB_THREADS acima de ADMISSAO_SENHA, para sobrar
+# thread para recusar e para as leituras.
+ATIVA = os.getenv("ADMISSAO", "1") == "1"
+LIMITES = {
+    "senha": int(os.getenv("ADMISSAO_SENHA", 2)),
+    "escrita": int(os.getenv("ADMISSAO_ESCRITA", 4)),
+    "leitura": int(os.getenv("ADMISSAO_LEITURA", 8)),
+}
+_espera = float(os.getenv("ADMISSAO_ESPERA_MS", 100)) / 1000
+ESPERA = {"senha": 0, "escrita": _espera, "leitura": _espera}
+RETRY_AFTER = int(os.getenv("ADMISSAO_RETRY_AFTER", 2))
+
+ROTAS_SENHA = {
+    "auth.login", "auth.register_paciente", "auth.register_profissional",
+    "auth.enviar_codigo", "auth.resetar_senha", "admin.importar",
+}
+ROTAS_ESCRITA = {"auth.sortear_paciente"}  # GET que grava
+ROTAS_LIVRES = {"health", "static"}
+
+
+def classe_da_rota(endpoint, metodo):
+    if endpoint in ROTAS_LIVRES or metodo == "OPTIONS":
+        return None
+    if endpoint in ROTAS_SENHA:
+        return "senha"
+    if endpoint in ROTAS_ESCRITA or metodo not in ("GET", "HEAD"):
+        return "escrita"
+    return "leitura"
+
+
+def registrar_admissao(app):
+    """Registra antes dos demais before_request: a recusa não deve tocar no banco."""
+    if not ATIVA:
+        return
+    vagas = {classe: threading.BoundedSemaphore(limite) for classe, limite in LIMITES.items() if limite > 0}
+
+    @app.before_request
+    def admitir():
+        classe = classe_da_rota(request.endpoint, request.method)
+        if classe not in vagas:
+            return None
+        if not vagas[classe].acquire(timeout=ESPERA[classe]):
+            response = jsonify({"message": "Servidor sobrecarregado. Tente novamente em instantes."})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(RETRY_AFTER)
+            return response
+        g.vaga_admissao = vagas[classe]
+        return None
+
+    @app.teardown_request
+    def liberar(exc):
+        vaga = g.pop("vaga_admissao", None)
+        if vaga is not None:
+            vaga.release()
@@ -1,30 +1,67 @@
 import os
+from dotenv import load_dotenv
+
+# Antes dos imports locais: vários módulos leem os.getenv ao serem importados
+load_dotenv()
+
+import click
 from flask import Flask, jsonify
+from flask.cli import with_appcontext
+from sqlalchemy.orm.exc import StaleDataError
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from dotenv import load_dotenv
 
 from database import db
 from auth import auth_bp
+from cep import cep_bp
+from admin import admin_bp
+from serializacao import OrjsonProvider, orjson
+from cache_http import registrar_compressao
+from invalidacao import registrar_invalidacao
+from admissao import registrar_admissao
+from perfilamento import registrar_perfilamento
+from fragmentos import binds, registrar_fragmentos
+from arquivamento import arquivar_command
+from importacao import importar_usuarios_command
+from estados import migrar_status_command
+from idempotencia import limpar_idempotencia_command
+from projecoes import projetar_command
+from lembretes import enviar_lembretes_command
+from migracao_usuarios import migrar_usuarios_command
+from migracao_esquema import migrar_esquema_command
+from busca import indexar_busca_command
+from simulador import simular_command
+from exportacao import exportar_analitico_command
 
 
 google_api_key = os.getenv("GOOGLE_API_KEY")
 
 
-def create_app():
-    load_dotenv()
+@click.command("criar-tabelas")
+@with_appcontext
+def criar_tabelas_command():
+    """Cria as tabelas que ainda não existem."""
+    db.create_all()
+    click.echo("Tabelas criadas.")
+
 
+def create_app():
     app = Flask(__name__)
+    if orjson:
+        app.json = OrjsonProvider(app)
 
     # Banco de dados: por padrão SQLite local; pode sobrescrever via variável de ambiente
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", "sqlite:///db.sqlite3")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Filas fragmentadas por UF (FRAGMENTOS=uf|regiao): um arquivo por fragmento, ver fragmentos.py
+    app.config["SQLALCHEMY_BINDS"] = binds(app.config["SQLALCHEMY_DATABASE_URI"])
 
     # JWT
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "chave-muito-secreta-em-dev")  # troque em produção
 
     # Inicializações
     db.init_app(app)
+    registrar_fragmentos(app)
 
     # --- Ajuste de CORS ---
     # Para liberar tudo (todas as origens e endpoints)
@@ -34,10 +71,22 @@ def create_app():
     CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}}, supports_credentials=True)
 
     JWTManager(app)  # habilita JWT
-
-    # Cria tabelas (somente em dev; em prod use migrações)
-    with app.app_context():
-        db.create_all()
+    registrar_compressao(app)
+    registrar_admissao(app)  # antes de qualquer before_request que use o banco
+    registrar_perfilamento(app)
+    registrar_invalidacao(app)
+
+    # Cria tabelas só em dev ou sob pedido: create_all inspeciona todas as tabelas a cada
+    # partida de worker. Em prod rode `flask criar-tabelas` (ou migrações) no deploy
+    if app.debug or os.getenv("CRIAR_TABELAS") == "1":
+        with app.app_context():
+            db.create_all()
+
+    # Conflito de versão (concorrência otimista): outra requisição alterou o registro antes
+    @app.errorhandler(StaleDataError)
+    def conflito_versao(e):
+        db.session.rollback()
+        return jsonify({"message": "O registro foi alterado por outra operação. Atualize a página e tente novamente."}), 409
 
     # Health check
     @app.get("/health")
@@ -46,11 +95,31 @@ def create_app():
 
     # Blueprints
     app.register_blueprint(auth_bp)
+    app.register_blueprint(cep_bp)
+    app.register_blueprint(admin_bp)
+    if app.debug or os.getenv("ROTAS_DEPURACAO") == "1":
+        from depuracao import depuracao_bp
+        app.register_blueprint(depuracao_bp)
+
+    # Comandos de manutenção (flask <comando>)
+    app.cli.add_command(criar_tabelas_command)
+    app.cli.add_command(arquivar_command)
+    app.cli.add_command(importar_usuarios_command)
+    app.cli.add_command(migrar_status_command)
+    app.cli.add_command(limpar_idempotencia_command)
+    app.cli.add_command(projetar_command)
+    app.cli.add_command(enviar_lembretes_command)
+    app.cli.add_command(migrar_usuarios_command)
+    app.cli.add_command(migrar_esquema_command)
+    app.cli.add_command(indexar_busca_command)
+    app.cli.add_command(simular_command)
+    app.cli.add_command(exportar_analitico_command)
 
     return app
 
 
 if __name__ == "__main__":
     # Para acessar a partir de outras máquinas/rede, troque host="0.0.0.0"
+    os.environ.setdefault("FLASK_DEBUG", "1")  # cria as tabelas e registra as rotas de depuração
     app = create_app()
     app.run(host="127.0.0.1", port=int(os.getenv("PORT", 5000)), debug=True)
@@ -0,0 +1,128 @@
+import os
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, insert, select
+
+import fragmentos
+from database import db
+from estados import (
+    CANCELADO_PACIENTE, CANCELADO_PROFISSIONAL, INSCRICAO_EXPIRADA, FINALIZADO_CONFIRMADO,
+    FINALIZADO_NAO_CONFIRMADO, ATENDIMENTO_CONCLUIDO_ANTIGO, ATENDIMENTO_EXPIRADO_ANTIGO,
+    CONCLUIDO_ANTIGO, EXPIRADO_ANTIGO,
+)
+from models import SorteioAtendimento, Atendimento, SorteioAtendimentoArquivo, AtendimentoArquivo
+
+ARQUIVO = {
+    SorteioAtendimento: SorteioAtendimentoArquivo,
+    Atendimento: AtendimentoArquivo,
+}
+
+# Estados finais: a linha não muda mais e só interessa ao histórico
+STATUS_FINAIS = {
+    SorteioAtendimento: (
+        CANCELADO_PACIENTE, CANCELADO_PROFISSIONAL, INSCRICAO_EXPIRADA,
+        ATENDIMENTO_CONCLUIDO_ANTIGO, FINALIZADO_CONFIRMADO,
+    ),
+    Atendimento: (
+        CANCELADO_PACIENTE, CANCELADO_PROFISSIONAL, FINALIZADO_CONFIRMADO,
+        FINALIZADO_NAO_CONFIRMADO, ATENDIMENTO_EXPIRADO_ANTIGO, EXPIRADO_ANTIGO, CONCLUIDO_ANTIGO,
+    ),
+}
+
+
+def _data_referencia(modelo):
+    if modelo is SorteioAtendimento:
+        return func.coalesce(
+            SorteioAtendimento.data_finalizacao,
+            SorteioAtendimento.data_cancelamento_profissional,
+            SorteioAtendimento.data_cancelamento_paciente,
+            SorteioAtendimento.data_expiracao,
+            SorteioAtendimento.data_inscricao,
+        )
+    return func.coalesce(Atendimento.data_fim, Atendimento.data_inicio)
+
+
+def arquivar(modelo, dias, lote=500):
+    """Move em lotes as linhas em estado final mais antigas que `dias` para a tabela de arquivo."""
+    limite = datetime.utcnow() - timedelta(days=dias)
+    tabela = modelo.__table__
+    arquivo = ARQUIVO[modelo].__table__
+    colunas = [c.name for c in tabela.columns]
+
+    criterios = [
+        tabela.c.status.in_(STATUS_FINAIS[modelo]),
+        _data_referencia(modelo) < limite,
+    ]
+    if modelo is SorteioAtendimento:
+        # Inscrições que originaram outra ainda viva ficam até a derivada ser arquivada
+        origens = select(tabela.c.inscricao_origem_id).where(tabela.c.inscricao_origem_id != None)
+        criterios.append(tabela.c.id.not_in(origens))
+        # ...e as que ainda têm atendimento vivo apontando para elas (FK atendimento.inscricao_id)
+        vinculadas = select(Atendimento.inscricao_id).where(Atendimento.inscricao_id != None)
+        criterios.append(tabela.c.id.not_in(vinculadas))
+
+    total = 0
+    for fragmento in fragmentos.todos():  # arquivo e tabela viva ficam no mesmo fragmento
+        opcoes = {"fragmento": fragmento}
+        while True:
+            ids = db.session.execute(
+                select(tabela.c.id).where(*criterios).order_by(tabela.c.id).limit(lote), execution_options=opcoes
+            ).scalars().all()
+            if not ids:
+                break
+
+            agora = datetime.utcnow()
+            db.session.execute(
+                insert(arquivo).from_select(
+                    colunas + ["arquivado_em"],
+                    select(*[tabela.c[c] for c in colunas], db.literal(agora)).where(tabela.c.id.in_(ids)),
+                ),
+                execution_options=opcoes,
+            )
+            db.session.execute(delete(tabela).where(tabela.c.id.in_(ids)), execution_options=opcoes)
+            db.session.commit()
+            total += len(ids)
+    return total
+
+
+# ------------------------
+# Leitura transparente (tabela viva + arquivo)
+# ------------------------
+def uniao_com_arquivo(modelo):
+    """Subconsulta com as linhas vivas e arquivadas (colunas da tabela viva), para selects de colunas."""
+    tabela, arquivo = modelo.__table__, ARQUIVO[modelo].__table__
+    colunas = [c.name for c in tabela.columns]
+    return (
+        select(*[tabela.c[c] for c in colunas])
+        .union_all(select(*[arquivo.c[c] for c in colunas]))
+        .subquery(f"{tabela.name}_todos")
+    )
+
+
+def obter_com_arquivo(modelo, **filtros):
+    return modelo.query.filter_by(**filtros).first() or ARQUIVO[modelo].query.filter_by(**filtros).first()
+
+
+def ultimo_com_arquivo(modelo, fragmento=None, **filtros):
+    """Registro de maior id com os filtros, procurando também no arquivo (do `fragmento`, se fragmentado)."""
+    candidatos = [
+        m.query.filter_by(**filtros).order_by(m.id.desc()).execution_options(fragmento=fragmento).first()
+        for m in (modelo, ARQUIVO[modelo])
+    ]
+    candidatos = [r for r in candidatos if r is not None]
+    return max(candidatos, key=lambda r: r.id) if candidatos else None
+
+
+@click.command("arquivar")
+@click.option("--dias", type=int, default=lambda: int(os.getenv("ARQUIVAMENTO_DIAS", 180)),
+              help="Idade mínima (em dias) das linhas em estado final.")
+@click.option("--lote", type=int, default=lambda: int(os.getenv("ARQUIVAMENTO_LOTE", 500)),
+              help="Linhas movidas por transação.")
+@with_appcontext
+def arquivar_command(dias, lote):
+    """Move inscrições e atendimentos finalizados antigos para as tabelas de arquivo."""
+    for modelo in (Atendimento, SorteioAtendimento):
+        total = arquivar(modelo, dias, lote)
+        click.echo(f"{modelo.__tablename__}: {total} registros arquivados")
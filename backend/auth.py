@@ -1,58 +1,34 @@
 from flask import Blueprint, request, jsonify, url_for
 from database import db
-from models import User, PasswordReset, SorteioAtendimento, Atendimento
+from models import User, Paciente, Profissional, MODELOS_USUARIO, usuarios_completos, SorteioAtendimento, Atendimento, AtendimentoArquivo
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from datetime import datetime, timedelta
-from utils.email_utils import enviar_email
-import re, random
+from cep import normalizar_cep, enriquecer_endereco
+from geo import raio_sorteio_km, inscricoes_no_raio, existe_profissional_no_raio
+from arquivamento import uniao_com_arquivo, obter_com_arquivo, ultimo_com_arquivo
+from serializacao import status_amigavel, serialize_user, mapeador_linhas
+from cache_http import etag_por_versao
+from idempotencia import idempotente
+import codigos_reset
+import elegibilidade
+import fragmentos
+import invalidacao
+from eventos import registrar_evento, INSCRICAO_CRIADA, INSCRICAO_RENOVADA
+from estados import (
+    AGUARDANDO_SORTEIO, SORTEADO, EM_ATENDIMENTO, FINALIZADO_CONFIRMADO, PRAZO_INSCRICAO, REENTRADA,
+    permitido, transicionar, transicionar_em_lote,
+)
+import re, random, heapq
+from collections import Counter
+from functools import lru_cache
 from sqlalchemy import or_, select, and_, func, desc, asc
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
-# Mapeamento status interno => status amigável para o frontend
-STATUS_LABELS = {
-    "cancelado_paciente": "Cancelado pelo paciente",
-    "cancelado_profissional": "Cancelado pelo profissional",
-    "aguardando_sorteio": "Aguardando sorteio",
-    "sorteado_em_atendimento": "Em atendimento",
-    "atendimento_concluido": "Concluído",
-    "finalizado_profissional": "Aguardando confirmação de conclusão",
-    "atendimento_expirado": "Atendimento expirado",
-    "inscricao_expirada" : "Inscrição expirada" 
-    # Inclua outros status do seu sistema aqui conforme usados...
-}
-
-def status_amigavel(status):
-    return STATUS_LABELS.get(status, status.capitalize())
-
 # ------------------------
 # Funções Auxiliares
 # ------------------------
-def serialize_user(u: User):
-    return {
-        "id": u.id,
-        "tipo": u.tipo,
-        "email": u.email,
-        "nome": u.nome,
-        "telefone": u.telefone,
-        "cep": u.cep,
-        "endereco": u.endereco,
-        "bairro": u.bairro,
-        "estado": u.estado,
-        "municipio": u.municipio,
-        "criado_em": u.criado_em.isoformat(),
-        "cpf": u.cpf,
-        "especialidade_necessaria": u.especialidade_necessaria,
-        "descricao_necessidade": u.descricao_necessidade,
-        "especialidade": u.especialidade,
-        "local_atendimento": u.local_atendimento,
-        "registro_conselho": u.registro_conselho,
-        "uf_registro": u.uf_registro,
-        "cidade": u.cidade,
-    }
-
-
 def is_cpf_valido(cpf: str) -> bool:
     num = re.sub(r"\D", "", cpf or "")
     if len(num) != 11 or num == num[0] * 11:
@@ -65,17 +41,105 @@ def is_cpf_valido(cpf: str) -> bool:
 
     return calc_dv(num[:9]) == int(num[9]) and calc_dv(num[:10]) == int(num[10])
 
+# Mapeadores das listagens (tuplas na ordem dos selects de cada endpoint)
+_historico_paciente = mapeador_linhas(
+    ("id", "especialidade", "status", "profissional", "data_inicio", "data_fim"),
+    datas=("data_inicio", "data_fim"), status="status",
+)
+_historico_profissional = mapeador_linhas(
+    ("id", "especialidade", "status", "paciente", "data_inicio", "data_fim",
+     "local_inscricao_municipio", "local_inscricao_estado"),
+    datas=("data_inicio", "data_fim"), status="status",
+)
+_inscricao_paciente = mapeador_linhas(
+    ("id", "especialidade", "profissional_municipio", "profissional_estado",
+     "data_inscricao", "data_expiracao", "status"),
+    datas=("data_inscricao", "data_expiracao"), status="status",
+)
+_ranking = mapeador_linhas(("id", "nome", "especialidade", "estado", "total_concluidos"))
+
+
+# Versões para o GET condicional: (maior atualizado_em, contagem, maior id) das linhas da
+# listagem mais o maior atualizado_em de usuários (nomes exibidos nas listagens)
+def _versao(tabela, *criterios):
+    return tuple(db.session.execute(
+        select(func.max(tabela.c.atualizado_em), func.count(), func.max(tabela.c.id)).where(*criterios)
+    ).one())
+
+
+def _versao_fila(tabela, *criterios):
+    # Inscrições/atendimentos: a versão de cada fragmento (uma só sem fragmentação)
+    consulta = select(func.max(tabela.c.atualizado_em), func.count(), func.max(tabela.c.id)).where(*criterios)
+    return tuple(
+        valor for f in fragmentos.todos()
+        for valor in db.session.execute(consulta.execution_options(fragmento=f)).one()
+    )
+
+
+def _versao_usuarios():
+    return db.session.execute(select(func.max(User.atualizado_em))).scalar()
+
+
+def _versao_historico(tipo):
+    coluna = f"{tipo}_id"
+
+    def versao():
+        if get_jwt().get("tipo") != tipo:
+            return None
+        identidade = get_jwt_identity()
+        a = uniao_com_arquivo(Atendimento)
+        marca = _versao_fila(a, a.c[coluna] == identidade) + (_versao_usuarios(),)
+        if tipo == "profissional":
+            s = uniao_com_arquivo(SorteioAtendimento)
+            marca += _versao_fila(s, s.c.profissional_id == identidade)
+        return marca
+    return versao
+
+
+def _versao_inscricoes():
+    if get_jwt().get("tipo") != "paciente":
+        return None
+    t = SorteioAtendimento.__table__
+    return _versao_fila(t, t.c.paciente_id == get_jwt_identity())
+
+
+def _versao_ranking():
+    # Tabela a tabela, para o max/count usarem os índices em vez de varrer a união
+    return (_versao_fila(Atendimento.__table__) + _versao_fila(AtendimentoArquivo.__table__)
+            + (_versao_usuarios(),))
+
+
+def _versao_admin(model):
+    model_map = {"usuarios": User, "sorteios": SorteioAtendimento, "atendimentos": Atendimento}
+    if get_jwt().get("tipo") != "admin" or model.lower() not in model_map:
+        return None
+    model = model_map[model.lower()]
+    return _versao(User.__table__) if model is User else _versao_fila(model.__table__)
+
+
+@lru_cache(maxsize=None)
+def _mapeador_tabela(tabela):
+    return mapeador_linhas(
+        [c.name for c in tabela.columns],
+        datas=[c.name for c in tabela.columns if isinstance(c.type, db.DateTime)],
+    )
+
+
+def _mais_recentes_primeiro(consulta):
+    # Históricos: a consulta (ordenada por data_inicio desc) em cada fragmento, intercalada
+    resultados = [db.session.execute(consulta.execution_options(fragmento=f)) for f in fragmentos.todos()]
+    if len(resultados) == 1:
+        return resultados[0]
+    return heapq.merge(*resultados, key=lambda l: l.data_inicio or datetime.min, reverse=True)
+
+
 def finalizar_atendimentos_nao_confirmados():
     limite = datetime.utcnow() - timedelta(days=30)
-    atendimentos = Atendimento.query.filter(
-        Atendimento.status == "finalizado_profissional",
+    transicionar_em_lote(
+        "expirar_confirmacao", Atendimento,
         Atendimento.data_fim <= limite,
-        (Atendimento.data_confirmacao == None)
-    ).all()
-
-    for a in atendimentos:
-        a.status = "finalizado_nao_confirmado"
-
+        Atendimento.data_confirmacao == None,
+    )
     db.session.commit()
 
 
@@ -83,6 +147,7 @@ def finalizar_atendimentos_nao_confirmados():
 # Cadastro - PACIENTE
 # ------------------------
 @auth_bp.post("/register/paciente")
+@idempotente
 def register_paciente():
     data = request.get_json() or {}
     required = ["cpf", "email", "senha", "nome", "telefone", "cep", "endereco",
@@ -93,11 +158,13 @@ def register_paciente():
     cpf_normalizado = re.sub(r"\D", "", data["cpf"])
     if not is_cpf_valido(cpf_normalizado):
         return jsonify({"message": "CPF inválido."}), 400
-    if User.query.filter_by(cpf=cpf_normalizado).first():
+    if not normalizar_cep(data["cep"]):
+        return jsonify({"message": "CEP inválido."}), 400
+    if Paciente.query.filter_by(cpf=cpf_normalizado).first():
         return jsonify({"message": "CPF já cadastrado."}), 409
 
-    user = User(
-        tipo="paciente", cpf=cpf_normalizado,
+    user = Paciente(
+        cpf=cpf_normalizado,
         email=data["email"], senha_hash=generate_password_hash(data["senha"]),
         nome=data["nome"], telefone=data["telefone"], cep=data["cep"],
         endereco=data["endereco"], bairro=data.get("bairro"),
@@ -105,6 +172,7 @@ def register_paciente():
         especialidade_necessaria=data["especialidade_necessaria"],
         descricao_necessidade=data["descricao_necessidade"]
     )
+    enriquecer_endereco(user)
     db.session.add(user)
     db.session.commit()
     return jsonify({"message": "Paciente cadastrado com sucesso!", "id": user.id}), 201
@@ -113,6 +181,7 @@ def register_paciente():
 # Cadastro - PROFISSIONAL
 # ------------------------
 @auth_bp.post("/register/profissional")
+@idempotente
 def register_profissional():
     data = request.get_json() or {}
     required = ["email", "senha", "nome", "cep", "endereco", "estado", "municipio",
@@ -121,21 +190,28 @@ def register_profissional():
     if any(not data.get(k) for k in required):
         return jsonify({"message": "Todos os campos são obrigatórios, exceto telefone."}), 400
 
+    if not normalizar_cep(data["cep"]):
+        return jsonify({"message": "CEP inválido."}), 400
+
     registro = data["registro_conselho"].strip()
     uf = data["uf_registro"].strip().upper()
-    if User.query.filter_by(tipo="profissional", registro_conselho=registro, uf_registro=uf).first():
+    if Profissional.query.filter_by(registro_conselho=registro, uf_registro=uf).first():
         return jsonify({"message": "Registro de conselho já cadastrado para esta UF."}), 409
 
-    user = User(
-        tipo="profissional", email=data["email"],
+    user = Profissional(
+        email=data["email"],
         senha_hash=generate_password_hash(data["senha"]), nome=data["nome"],
         telefone=data.get("telefone"), cep=data["cep"], endereco=data["endereco"],
         bairro=data.get("bairro"), estado=data["estado"], municipio=data["municipio"],
         especialidade=data["especialidade"], local_atendimento=data["local_atendimento"],
         registro_conselho=registro, uf_registro=uf, cidade=data["cidade"]
     )
+    enriquecer_endereco(user)
     db.session.add(user)
+    invalidacao.publicar(elegibilidade.CANAL)
+    marca = elegibilidade.geracao()
     db.session.commit()
+    elegibilidade.profissional_mudou(None, elegibilidade.regiao(user), marca)
     return jsonify({"message": "Profissional cadastrado com sucesso!", "id": user.id}), 201
 
 # ------------------------
@@ -147,7 +223,8 @@ def login():
     if not all([data.get("email"), data.get("senha"), data.get("tipo")]):
         return jsonify({"message": "Informe e-mail, senha e tipo de usuário."}), 400
 
-    user = User.query.filter_by(email=data["email"], tipo=data["tipo"]).first()
+    modelo = MODELOS_USUARIO.get(data["tipo"], User)
+    user = modelo.query.filter_by(email=data["email"], tipo=data["tipo"]).first()
     if not user or not check_password_hash(user.senha_hash, data["senha"]):
         return jsonify({"message": "Credenciais inválidas."}), 401
 
@@ -160,7 +237,7 @@ def login():
 @auth_bp.get("/me")
 @jwt_required()
 def me():
-    u = User.query.get(get_jwt_identity())
+    u = MODELOS_USUARIO.get(get_jwt().get("tipo"), User).query.get(get_jwt_identity())
     if not u:
         return jsonify({"message": "Usuário não encontrado"}), 404
     return jsonify(serialize_user(u))
@@ -171,16 +248,21 @@ def me():
 # ------------------------
 @auth_bp.put("/paciente/atualizar")
 @jwt_required()
+@idempotente
 def atualizar_paciente():
     if get_jwt().get("tipo") != "paciente":
         return jsonify({"message": "Acesso negado"}), 403
     data = request.get_json() or {}
-    u = User.query.get(get_jwt_identity())
+    u = Paciente.query.get(get_jwt_identity())
     if not u:
         return jsonify({"message": "Usuário não encontrado"}), 404
+    if "cep" in data and not normalizar_cep(data["cep"]):
+        return jsonify({"message": "CEP inválido."}), 400
     for campo in ["email", "nome", "telefone", "cep", "endereco", "bairro", "estado", "municipio"]:
         if campo in data:
             setattr(u, campo, data[campo])
+    if "cep" in data:
+        enriquecer_endereco(u)
     db.session.commit()
     return jsonify({"message": "Dados atualizados com sucesso", "user": serialize_user(u)})
 
@@ -189,18 +271,28 @@ def atualizar_paciente():
 # ------------------------
 @auth_bp.put("/profissional/atualizar")
 @jwt_required()
+@idempotente
 def atualizar_profissional():
     if get_jwt().get("tipo") != "profissional":
         return jsonify({"message": "Acesso negado"}), 403
     data = request.get_json() or {}
-    u = User.query.get(get_jwt_identity())
+    u = Profissional.query.get(get_jwt_identity())
     if not u:
         return jsonify({"message": "Usuário não encontrado"}), 404
+    if "cep" in data and not normalizar_cep(data["cep"]):
+        return jsonify({"message": "CEP inválido."}), 400
+    regiao_anterior = elegibilidade.regiao(u)
     for campo in ["email", "nome", "telefone", "cep", "endereco", "bairro",
                   "estado", "municipio", "especialidade", "local_atendimento", "cidade"]:
         if campo in data:
             setattr(u, campo, data[campo])
+    if "cep" in data:
+        enriquecer_endereco(u)
+    if elegibilidade.regiao(u) != regiao_anterior:
+        invalidacao.publicar(elegibilidade.CANAL)
+    marca = elegibilidade.geracao()
     db.session.commit()
+    elegibilidade.profissional_mudou(regiao_anterior, elegibilidade.regiao(u), marca)
     return jsonify({"message": "Dados atualizados com sucesso", "user": serialize_user(u)})
 
 
@@ -208,6 +300,7 @@ def atualizar_profissional():
 # ENVIAR CODIGO RECUPERACAO SENHA
 # ------------------------
 @auth_bp.post("/enviar-codigo")
+@idempotente
 def enviar_codigo():
     data = request.get_json() or {}
     email = data.get("email")
@@ -217,46 +310,47 @@ def enviar_codigo():
     if not user:
         return jsonify({"message": "E-mail não encontrado"}), 404
 
-    codigo = f"{random.randint(100000,999999)}"
-    PasswordReset.query.filter_by(email=email).delete()
-    db.session.add(PasswordReset(email=email, codigo=codigo))
-    db.session.commit()
+    codigo = codigos_reset.emitir(email)
 
     assunto = "Recuperação de Senha"
-    corpo = f"Seu código é {codigo} e expira em 10 minutos."
-    if enviar_email(email, assunto, corpo):
+    corpo = f"Seu código é {codigo} e expira em {int(codigos_reset.VALIDADE.total_seconds() // 60)} minutos."
+    from utils.email_utils import enviar_email_em_segundo_plano  # smtplib só é carregado no primeiro envio
+    if enviar_email_em_segundo_plano(email, assunto, corpo):
         return jsonify({"message": "Código enviado para o e-mail."}), 200
     return jsonify({"message": "Erro ao enviar e-mail."}), 500
 
+MENSAGENS_CODIGO = {
+    codigos_reset.INVALIDO: "Código inválido",
+    codigos_reset.EXPIRADO: "Código expirado",
+    codigos_reset.ESGOTADO: "Tentativas esgotadas. Solicite um novo código.",
+}
+
 # ------------------------
 # VALIDAR CODIGO RECUPERACAO SENHA
 # ------------------------
 @auth_bp.post("/verificar-codigo")
 def verificar_codigo():
     data = request.get_json() or {}
-    pr = PasswordReset.query.filter_by(email=data.get("email"), codigo=data.get("codigo")).first()
-    if not pr:
-        return jsonify({"message": "Código inválido"}), 400
-    if pr.expira_em < datetime.utcnow():
-        return jsonify({"message": "Código expirado"}), 400
+    resultado = codigos_reset.verificar(data.get("email"), data.get("codigo"))
+    if resultado != codigos_reset.VALIDO:
+        return jsonify({"message": MENSAGENS_CODIGO[resultado]}), 400
     return jsonify({"message": "Código verificado com sucesso."}), 200
 
 # ------------------------
 # RESETAR SENHA
 # ------------------------
 @auth_bp.post("/resetar-senha")
+@idempotente
 def resetar_senha():
     data = request.get_json() or {}
-    pr = PasswordReset.query.filter_by(email=data.get("email"), codigo=data.get("codigo")).first()
-    if not pr:
-        return jsonify({"message": "Código inválido"}), 400
-    if pr.expira_em < datetime.utcnow():
-        return jsonify({"message": "Código expirado"}), 400
+    resultado = codigos_reset.consumir(data.get("email"), data.get("codigo"))
+    if resultado != codigos_reset.VALIDO:
+        return jsonify({"message": MENSAGENS_CODIGO[resultado]}), 400
     user = User.query.filter_by(email=data["email"]).first()
     if not user:
+        db.session.rollback()
         return jsonify({"message": "Usuário não encontrado"}), 404
     user.senha_hash = generate_password_hash(data["nova_senha"])
-    db.session.delete(pr)
     db.session.commit()
     return jsonify({"message": "Senha alterada com sucesso!"}), 200
 
@@ -266,24 +360,21 @@ def resetar_senha():
 #Retorna a lista de atendimentos para o paciente logado na area do paciente
 @auth_bp.get("/paciente/atendimentos")
 @jwt_required()
+@etag_por_versao(_versao_historico("paciente"))
 def listar_atendimentos_paciente():
     if get_jwt().get("tipo") != "paciente":
         return jsonify({"message": "Apenas pacientes podem acessar seus atendimentos."}), 403
 
     paciente_id = get_jwt_identity()
-    atendimentos = Atendimento.query.filter_by(paciente_id=paciente_id) \
-                                    .order_by(Atendimento.data_inicio.desc()).all()
-    return jsonify([
-        {
-            "id": a.id,
-            "especialidade": a.especialidade,
-            "status": a.status,
-            "status_legivel": status_amigavel(a.status),  # <-- adicionado
-            "profissional": a.profissional.nome if a.profissional else None,
-            "data_inicio": a.data_inicio.isoformat() if a.data_inicio else None,
-            "data_fim": a.data_fim.isoformat() if a.data_fim else None
-        } for a in atendimentos
-    ]), 200
+    a = uniao_com_arquivo(Atendimento)
+    consulta = (
+        select(a.c.id, a.c.especialidade, a.c.status, User.nome,
+               a.c.data_inicio, a.c.data_fim)
+        .outerjoin(User, User.id == a.c.profissional_id)
+        .where(a.c.paciente_id == paciente_id)
+        .order_by(a.c.data_inicio.desc())
+    )
+    return jsonify(list(map(_historico_paciente, _mais_recentes_primeiro(consulta)))), 200
 
 # ------------------------
 # Lista de Inscrições(Sorteios) - Paciente
@@ -291,6 +382,7 @@ def listar_atendimentos_paciente():
 #Retorna a lista de inscricoes para o paciente logado na area do paciente
 @auth_bp.get("/paciente/sorteios")
 @jwt_required()
+@etag_por_versao(_versao_inscricoes)
 def listar_sorteios_paciente():
     if get_jwt().get("tipo") != "paciente":
         return jsonify({"message": "Apenas pacientes podem ver seus sorteios."}), 403
@@ -298,37 +390,45 @@ def listar_sorteios_paciente():
     paciente_id = get_jwt_identity()
 
     # Busca somente inscrições que estão em 'aguardando_sorteio'
-    sorteios = SorteioAtendimento.query.filter_by(
-        paciente_id=paciente_id,
-        status='aguardando_sorteio'
-    ).all()
+    linhas = db.session.execute(
+        select(SorteioAtendimento.id, SorteioAtendimento.especialidade,
+               SorteioAtendimento.municipio, SorteioAtendimento.estado,
+               SorteioAtendimento.data_inscricao, SorteioAtendimento.data_expiracao,
+               SorteioAtendimento.status)
+        .where(SorteioAtendimento.paciente_id == paciente_id,
+               SorteioAtendimento.status == AGUARDANDO_SORTEIO)
+    )
 
+    # Uma inscrição por especialidade
     vistos = set()
     result = []
-    for s in sorteios:
-        esp = s.especialidade
-        if esp not in vistos:
-            result.append({
-            "id": s.id,
-            "especialidade": s.especialidade,
-            "profissional_municipio": s.municipio,
-            "profissional_estado": s.estado,
-            "data_inscricao": s.data_inscricao.isoformat() if s.data_inscricao else None,
-            "data_expiracao": s.data_expiracao.isoformat() if s.data_expiracao else None,
-            #"status": s.status,
-            "status_legivel": status_amigavel(s.status),
-        })
-
-            vistos.add(esp)
+    for linha in linhas:
+        if linha.especialidade not in vistos:
+            result.append(_inscricao_paciente(linha))
+            vistos.add(linha.especialidade)
 
     return jsonify(result), 200
 
 
+# ------------------------
+# Regiões atendidas (pública): especialidade + município com profissional cadastrado
+# ------------------------
+@auth_bp.get("/regioes-atendidas")
+def regioes_atendidas():
+    estado = (request.args.get("uf") or "").upper() or None
+    response = jsonify(elegibilidade.listar_regioes(estado, request.args.get("especialidade") or None))
+    # Mesma defasagem que a cópia em memória já admite entre workers
+    response.cache_control.public = True
+    response.cache_control.max_age = elegibilidade.RECARGA_SEGUNDOS
+    return response, 200
+
+
 # ------------------------
 # Criar Inscrição(Sorteio) - Paciente
 # ------------------------
 @auth_bp.post("/paciente/sorteios")
 @jwt_required()
+@idempotente
 def criar_sorteio_paciente():
     if get_jwt().get("tipo") != "paciente":
         return jsonify({"message": "Apenas pacientes podem se inscrever"}), 403
@@ -347,12 +447,14 @@ def criar_sorteio_paciente():
 
     agora = datetime.utcnow()
 
-    existe_profissional = User.query.filter_by(
-        tipo="profissional",
-        especialidade=especialidade,
-        estado=estado,
-        municipio=municipio
-    ).first()
+    existe_profissional = elegibilidade.atendida(especialidade, estado, municipio)
+
+    paciente = User.query.get(pid)
+    raio_km = raio_sorteio_km()
+    if not existe_profissional and raio_km and paciente.latitude is not None:
+        existe_profissional = existe_profissional_no_raio(
+            especialidade, paciente.latitude, paciente.longitude, raio_km
+        )
 
     if not existe_profissional:
         return jsonify({
@@ -369,7 +471,7 @@ def criar_sorteio_paciente():
             SorteioAtendimento.especialidade == especialidade,
             SorteioAtendimento.estado == estado,
             SorteioAtendimento.municipio == municipio,
-            (SorteioAtendimento.status == "aguardando_sorteio") | (SorteioAtendimento.status == "sorteado_em_atendimento") ,
+            SorteioAtendimento.status.in_((AGUARDANDO_SORTEIO, SORTEADO)),
             (SorteioAtendimento.data_expiracao == None) | (SorteioAtendimento.data_expiracao > agora)
         )
         .first()
@@ -389,15 +491,22 @@ def criar_sorteio_paciente():
     especialidade=especialidade,
     estado=estado,
     municipio=municipio,
-    status='aguardando_sorteio',
+    status=AGUARDANDO_SORTEIO,
     data_inscricao=agora,
-    data_expiracao=agora + timedelta(days=30),
+    data_expiracao=agora + PRAZO_INSCRICAO,
     data_sorteio=None,
-    descricao_necessidade=descricao
+    descricao_necessidade=descricao,
+    latitude=paciente.latitude,
+    longitude=paciente.longitude
 )
 
 
     db.session.add(nova_inscricao)
+    db.session.flush()
+    registrar_evento(
+        INSCRICAO_CRIADA, agora, inscricao_id=nova_inscricao.id, paciente_id=paciente.id,
+        especialidade=especialidade, estado=estado, municipio=municipio, data_inscricao=agora,
+    )
     db.session.commit()
     return jsonify({"message": "Inscrição criada com sucesso."}), 201
 
@@ -408,6 +517,7 @@ def criar_sorteio_paciente():
 # ------------------------
 @auth_bp.put("/paciente/sorteios/<int:sorteio_id>/renovar")
 @jwt_required()
+@idempotente
 def renovar_sorteio(sorteio_id):
     if get_jwt().get("tipo") != "paciente":
         return jsonify({"message": "Apenas pacientes podem renovar sorteios."}), 403
@@ -417,8 +527,11 @@ def renovar_sorteio(sorteio_id):
     if not s:
         return jsonify({"message": "Sorteio não encontrado"}), 404
 
-    s.data_renovacao = datetime.utcnow()
-    s.data_expiracao = datetime.utcnow() + timedelta(days=30)
+    agora = datetime.utcnow()
+    s.data_renovacao = agora
+    s.data_expiracao = agora + PRAZO_INSCRICAO
+    s.data_lembrete = None  # novo prazo, novo lembrete
+    registrar_evento(INSCRICAO_RENOVADA, agora, inscricao_id=s.id)
 
     db.session.commit()
     return jsonify({"message": "Prazo renovado com sucesso."}), 200
@@ -428,6 +541,7 @@ def renovar_sorteio(sorteio_id):
 # ------------------------
 @auth_bp.put("/paciente/sorteios/<int:sorteio_id>/cancelar")
 @jwt_required()
+@idempotente
 def cancelar_inscricao_sorteio(sorteio_id):
     if get_jwt().get("tipo") != "paciente":
         return jsonify({"message": "Apenas pacientes podem cancelar inscrições."}), 403
@@ -437,11 +551,11 @@ def cancelar_inscricao_sorteio(sorteio_id):
     if not sorteio:
         return jsonify({"message": "Inscrição de sorteio não encontrada."}), 404
 
-    # Atualiza o registro de inscrição
-    sorteio.status = "cancelado_paciente"
-    sorteio.data_cancelamento_paciente = datetime.utcnow()
+    if not permitido("cancelar_inscricao", sorteio):
+        return jsonify({"message": "Inscrição não pode ser cancelada nesse status."}), 400
+
+    transicionar("cancelar_inscricao", sorteio)
 
-    db.session.add(sorteio)
     db.session.commit()
     return jsonify({"message": "Inscrição cancelada com sucesso."}), 200
 
@@ -457,7 +571,7 @@ def detalhes_sorteio(sorteio_id):
     if tipo != "paciente":
         return jsonify({"message": "Apenas pacientes podem ver detalhes das inscrições."}), 403
 
-    s = SorteioAtendimento.query.filter_by(id=sorteio_id, paciente_id=user_id).first()
+    s = obter_com_arquivo(SorteioAtendimento, id=sorteio_id, paciente_id=user_id)
     if not s:
         return jsonify({"message": "Inscrição não encontrada."}), 404
 
@@ -483,43 +597,34 @@ def detalhes_sorteio(sorteio_id):
 # ------------------------
 @auth_bp.get("/profissional/atendimentos")
 @jwt_required()
+@etag_por_versao(_versao_historico("profissional"))
 def listar_atendimentos_profissional():
     if get_jwt().get("tipo") != "profissional":
         return jsonify({"message": "Apenas profissionais podem acessar seus atendimentos."}), 403
 
     profissional_id = get_jwt_identity()
-    atendimentos = Atendimento.query.filter_by(profissional_id=profissional_id) \
-        .order_by(Atendimento.data_inicio.desc()).all()
-
-    resultado = []
-    for a in atendimentos:
-        inscricao = (
-            SorteioAtendimento.query
-            .filter(
-                SorteioAtendimento.paciente_id == a.paciente_id,
-                SorteioAtendimento.profissional_id == a.profissional_id,
-                SorteioAtendimento.especialidade == a.especialidade,
-            )
-            .order_by(SorteioAtendimento.id.desc())
-            .first()
-        )
-
-        local_inscricao_municipio = inscricao.municipio if inscricao else None
-        local_inscricao_estado = inscricao.estado if inscricao else None
-
-        resultado.append({
-            "id": a.id,
-            "especialidade": a.especialidade,
-            "status": a.status,  # incluir este campo
-            "status_legivel": status_amigavel(a.status),
-            "paciente": a.paciente.nome if a.paciente else None,
-            "data_inicio": a.data_inicio.isoformat() if a.data_inicio else None,
-            "data_fim": a.data_fim.isoformat() if a.data_fim else None,
-            "local_inscricao_municipio": local_inscricao_municipio,
-            "local_inscricao_estado": local_inscricao_estado,
-        })
-
-    return jsonify(resultado), 200
+    a = uniao_com_arquivo(Atendimento)
+    s = uniao_com_arquivo(SorteioAtendimento)
+    inscricao = uniao_com_arquivo(SorteioAtendimento).alias("inscricao")
+
+    # Local da última inscrição de cada paciente/especialidade, numa única consulta
+    ultima = (
+        select(s.c.paciente_id, s.c.especialidade, func.max(s.c.id).label("id"))
+        .where(s.c.profissional_id == profissional_id)
+        .group_by(s.c.paciente_id, s.c.especialidade)
+        .subquery("ultima")
+    )
+    consulta = (
+        select(a.c.id, a.c.especialidade, a.c.status, User.nome,
+               a.c.data_inicio, a.c.data_fim, inscricao.c.municipio, inscricao.c.estado)
+        .outerjoin(User, User.id == a.c.paciente_id)
+        .outerjoin(ultima, and_(ultima.c.paciente_id == a.c.paciente_id,
+                                ultima.c.especialidade == a.c.especialidade))
+        .outerjoin(inscricao, inscricao.c.id == ultima.c.id)
+        .where(a.c.profissional_id == profissional_id)
+        .order_by(a.c.data_inicio.desc())
+    )
+    return jsonify(list(map(_historico_profissional, _mais_recentes_primeiro(consulta)))), 200
 
 
 
@@ -534,26 +639,26 @@ def detalhes_atendimento(atendimento_id):
     tipo_usuario = get_jwt().get("tipo")
 
     if tipo_usuario == "profissional":
-        atendimento = Atendimento.query.filter_by(id=atendimento_id, profissional_id=user_id).first()
+        atendimento = obter_com_arquivo(Atendimento, id=atendimento_id, profissional_id=user_id)
     elif tipo_usuario == "paciente":
-        atendimento = Atendimento.query.filter_by(id=atendimento_id, paciente_id=user_id).first()
+        atendimento = obter_com_arquivo(Atendimento, id=atendimento_id, paciente_id=user_id)
     else:
         return jsonify({"message": "Tipo de usuário inválido."}), 403
 
     if not atendimento:
         return jsonify({"message": "Atendimento não encontrado ou acesso negado."}), 404
 
-    # Buscar a inscrição correspondente (sem FK explícita)
-    inscricao = (
-        SorteioAtendimento.query
-        .filter(
-            SorteioAtendimento.paciente_id == atendimento.paciente_id,
-            SorteioAtendimento.profissional_id == atendimento.profissional_id,
-            SorteioAtendimento.especialidade == atendimento.especialidade,
+    # Inscrição correspondente; atendimentos antigos não têm inscricao_id
+    if atendimento.inscricao_id:
+        inscricao = obter_com_arquivo(SorteioAtendimento, id=atendimento.inscricao_id)
+    else:
+        inscricao = ultimo_com_arquivo(
+            SorteioAtendimento,
+            fragmentos.do_id(atendimento.id),
+            paciente_id=atendimento.paciente_id,
+            profissional_id=atendimento.profissional_id,
+            especialidade=atendimento.especialidade,
         )
-        .order_by(SorteioAtendimento.id.desc())
-        .first()
-    )
 
     local_inscricao_municipio = inscricao.municipio if inscricao else None
     local_inscricao_estado = inscricao.estado if inscricao else None
@@ -583,6 +688,7 @@ def detalhes_atendimento(atendimento_id):
 # ------------------------
 @auth_bp.put("/atendimentos/<int:atendimento_id>/cancelar")
 @jwt_required()
+@idempotente
 def cancelar_atendimento(atendimento_id):
     user_id = get_jwt_identity()
     user_claims = get_jwt()
@@ -602,68 +708,42 @@ def cancelar_atendimento(atendimento_id):
     else:
         return jsonify({"message": "Tipo de usuário inválido."}), 403
 
-    # Bloqueios de status
-    if atendimento.status in ("finalizado_profissional", "finalizado_confirmado", "cancelado_paciente", "cancelado_profissional"):
+    # Bloqueios de status (tabela de transições em estados.py)
+    acao = f"cancelar_{tipo_usuario}"
+    if not permitido(acao, atendimento):
         return jsonify({"message": "Atendimento não pode ser cancelado nesse status."}), 400
 
-    # Opcional: se quiser restringir o cancelamento a "Em atendimento":
-    # if atendimento.status != "Em atendimento":
-    #     return jsonify({"message": f"Atendimento não pode ser cancelado. Status inválido: {atendimento.status}"}), 400
-
     data = request.get_json() or {}
     justificativa = data.get("justificativa", "").strip()
     if len(justificativa) < 20:
         return jsonify({"message": "A justificativa deve ter pelo menos 20 caracteres."}), 400
 
     agora = datetime.utcnow()
-
-    if tipo_usuario == "profissional":
-        atendimento.status = "cancelado_profissional"
-        atendimento.justificativa_cancelamento = justificativa
-        atendimento.data_fim = agora  # Data final no momento do cancelamento
-
-        # Atualiza inscrição vinculada (se houver)
-        inscricao = (
-            SorteioAtendimento.query.filter_by(
-                paciente_id=atendimento.paciente_id,
-                profissional_id=atendimento.profissional_id,
-                status="sorteado_em_atendimento",
-            ).first()
+    inscricao_id = transicionar(acao, atendimento, agora, justificativa_cancelamento=justificativa)
+
+    if acao in REENTRADA and inscricao_id:
+        # Reentrada do paciente na fila (estados.REENTRADA)
+        inscricao = db.session.get(SorteioAtendimento, inscricao_id)
+        nova_inscricao = SorteioAtendimento(
+            paciente_id=inscricao.paciente_id,
+            especialidade=inscricao.especialidade,
+            estado=inscricao.estado,
+            municipio=inscricao.municipio,
+            status=AGUARDANDO_SORTEIO,
+            data_inscricao=agora,
+            data_expiracao=agora + PRAZO_INSCRICAO,
+            inscricao_origem_id=inscricao.id,
+            descricao_necessidade=inscricao.descricao_necessidade,
+            latitude=inscricao.latitude,
+            longitude=inscricao.longitude
         )
-        if inscricao:
-            inscricao.status = "cancelado_profissional"
-            if hasattr(inscricao, "data_cancelamento_profissional"):
-                inscricao.data_cancelamento_profissional = agora
-
-            # Reentrada do paciente na fila (se a regra de negócio aplicar)
-            nova_inscricao = SorteioAtendimento(
-                paciente_id=inscricao.paciente_id,
-                especialidade=inscricao.especialidade,
-                estado=inscricao.estado,
-                municipio=inscricao.municipio,
-                status="aguardando_sorteio",
-                data_inscricao=agora,
-                data_expiracao=agora + timedelta(days=30),
-                inscricao_origem_id=inscricao.id,
-                descricao_necessidade=inscricao.descricao_necessidade
-            )
-            db.session.add(nova_inscricao)
-
-    elif tipo_usuario == "paciente":
-        atendimento.status = "cancelado_paciente"
-        atendimento.justificativa_cancelamento = justificativa
-        atendimento.data_fim = agora  # Data final no momento do cancelamento
-
-        inscricao = (
-            SorteioAtendimento.query.filter_by(
-                paciente_id=atendimento.paciente_id,
-                status="sorteado_em_atendimento",
-            ).first()
+        db.session.add(nova_inscricao)
+        db.session.flush()
+        registrar_evento(
+            INSCRICAO_CRIADA, agora, dados={"origem": inscricao.id}, inscricao_id=nova_inscricao.id,
+            paciente_id=inscricao.paciente_id, especialidade=inscricao.especialidade,
+            estado=inscricao.estado, municipio=inscricao.municipio, data_inscricao=agora,
         )
-        if inscricao:
-            inscricao.status = "cancelado_paciente"
-            if hasattr(inscricao, "data_cancelamento_paciente"):
-                inscricao.data_cancelamento_paciente = agora
 
     db.session.commit()
     return jsonify({"message": "Atendimento cancelado com sucesso."}), 200
@@ -673,6 +753,7 @@ def cancelar_atendimento(atendimento_id):
 
 @auth_bp.route("/admin/listar/<string:model>", methods=["GET"])
 @jwt_required()
+@etag_por_versao(_versao_admin)
 def admin_listar_registros(model):
     claims = get_jwt()
     # Permitir acesso só para admin (ajuste conforme seu modelo)
@@ -689,96 +770,101 @@ def admin_listar_registros(model):
     if not ModelClass:
         return jsonify({"message": f"Model '{model}' não encontrado"}), 404
 
-    registros = ModelClass.query.limit(100).all()  # limite para evitar sobrecarga
-
-    # Converte registros para dict (supondo que seus modelos tenham __repr__ ou implemente serialization)
-    def serialize(obj):
-        # exemplo básico, ajuste segundo seu modelo
-        data = {}
-        for column in obj.__table__.columns:
-            val = getattr(obj, column.name)
-            if isinstance(val, datetime):
-                val = val.isoformat()
-            data[column.name] = val
-        return data
-
-    resultados = [serialize(r) for r in registros]
-
-    return jsonify(resultados), 200
+    tabela = usuarios_completos if ModelClass is User else ModelClass.__table__
+    linhas = []
+    for f in ([None] if ModelClass is User else fragmentos.todos()):
+        # limite para evitar sobrecarga
+        linhas += db.session.execute(select(tabela).limit(100 - len(linhas)).execution_options(fragmento=f)).all()
+        if len(linhas) >= 100:
+            break
+    return jsonify(list(map(_mapeador_tabela(tabela), linhas))), 200
 
 # ------------------------
 # Sorteio de Paciente (Profissional) com criação de atendimento
 # ------------------------
 @auth_bp.get("/sortear-paciente")
 @jwt_required()
+@idempotente
 def sortear_paciente():
     if get_jwt().get('tipo') != 'profissional':
         return jsonify({"message": "Apenas profissionais podem sortear."}), 403
 
-    profissional = User.query.get(get_jwt_identity())
+    profissional = Profissional.query.get(get_jwt_identity())
     if not profissional:
         return jsonify({"message": "Profissional não encontrado."}), 404
 
     agora = datetime.utcnow()
 
-    # Subconsulta: pacientes já sorteados pelo profissional para evitar repetições
-    ja_sorteados_subquery = (
-        db.session.query(SorteioAtendimento.paciente_id)
-        .filter(SorteioAtendimento.profissional_id == profissional.id)
-        .subquery()
-    )
+    # Modo por raio (opcional): candidatos próximos, inclusive em municípios vizinhos
+    raio_km = raio_sorteio_km(request.args.get("raio_km"))
+    if raio_km and profissional.latitude is not None:
+        inscricoes = inscricoes_no_raio(
+            profissional.especialidade, profissional.latitude, profissional.longitude, raio_km, agora
+        )
+        if not inscricoes:
+            return jsonify({
+                "message": f"Não há pacientes elegíveis para atendimento de {profissional.especialidade} num raio de {raio_km:g} km."
+            }), 404
 
-    # Buscar candidatos elegíveis
-    candidatos = (
-        db.session.query(User)
-        .join(SorteioAtendimento, SorteioAtendimento.paciente_id == User.id)
-        .filter(
-            User.tipo == 'paciente',
-            SorteioAtendimento.status == 'aguardando_sorteio',
-            SorteioAtendimento.especialidade == profissional.especialidade,
-            SorteioAtendimento.estado == profissional.estado,
-            SorteioAtendimento.municipio == profissional.municipio,
-            or_(
-                SorteioAtendimento.data_expiracao == None,
-                SorteioAtendimento.data_expiracao > agora
+        inscricao = random.choice(inscricoes)
+        paciente_sorteado = inscricao.paciente
+    else:
+        # Subconsulta: pacientes já sorteados pelo profissional para evitar repetições
+        ja_sorteados_subquery = (
+            db.session.query(SorteioAtendimento.paciente_id)
+            .filter(SorteioAtendimento.profissional_id == profissional.id)
+            .subquery()
+        )
+
+        # Buscar candidatos elegíveis
+        candidatos = (
+            db.session.query(Paciente)
+            .join(SorteioAtendimento, SorteioAtendimento.paciente_id == Paciente.id)
+            .filter(
+                SorteioAtendimento.status == AGUARDANDO_SORTEIO,
+                SorteioAtendimento.especialidade == profissional.especialidade,
+                SorteioAtendimento.estado == profissional.estado,
+                SorteioAtendimento.municipio == profissional.municipio,
+                or_(
+                    SorteioAtendimento.data_expiracao == None,
+                    SorteioAtendimento.data_expiracao > agora
+                )
             )
+            .all()
         )
-        .all()
-    )
 
-    if not candidatos:
-        return jsonify({
-            "message": f"Não há pacientes elegíveis para atendimento de {profissional.especialidade} em {profissional.municipio}/{profissional.estado}."
-        }), 404
+        if not candidatos:
+            return jsonify({
+                "message": f"Não há pacientes elegíveis para atendimento de {profissional.especialidade} em {profissional.municipio}/{profissional.estado}."
+            }), 404
 
-    paciente_sorteado = random.choice(candidatos)
+        paciente_sorteado = random.choice(candidatos)
 
-    inscricao = (
-        db.session.query(SorteioAtendimento)
-        .filter(
-            SorteioAtendimento.paciente_id == paciente_sorteado.id,
-            SorteioAtendimento.especialidade == profissional.especialidade,
-            SorteioAtendimento.estado == profissional.estado,
-            SorteioAtendimento.municipio == profissional.municipio,
-            SorteioAtendimento.status == 'aguardando_sorteio'
+        inscricao = (
+            db.session.query(SorteioAtendimento)
+            .filter(
+                SorteioAtendimento.paciente_id == paciente_sorteado.id,
+                SorteioAtendimento.especialidade == profissional.especialidade,
+                SorteioAtendimento.estado == profissional.estado,
+                SorteioAtendimento.municipio == profissional.municipio,
+                SorteioAtendimento.status == AGUARDANDO_SORTEIO
+            )
+            .first()
         )
-        .first()
-    )
 
-    if not inscricao:
-        return jsonify({"message": "Inscrição não encontrada."}), 404
+        if not inscricao:
+            return jsonify({"message": "Inscrição não encontrada."}), 404
 
     # Atualizar inscrição e criar atendimento
-    inscricao.profissional_id = profissional.id
-    inscricao.status = 'sorteado_em_atendimento'
-    inscricao.data_sorteio = agora
-    db.session.add(inscricao)
+    inscricao_id = inscricao.id
+    transicionar("sortear", inscricao, agora, profissional_id=profissional.id)
 
     atendimento = Atendimento(
         profissional_id=profissional.id,
         paciente_id=paciente_sorteado.id,
         especialidade=profissional.especialidade,
-        status='Em atendimento',
+        inscricao_id=inscricao_id,
+        status=EM_ATENDIMENTO,
         data_inicio=agora,
         data_fim=agora + timedelta(days=30)
         #descricao_necessidade=paciente_sorteado.descricao_necessidade
@@ -797,7 +883,8 @@ def sortear_paciente():
         "Atenciosamente,\nEquipe Meu Atendimento Solidario"
     )
 
-    enviar_email(paciente_sorteado.email, assunto, corpo)
+    from utils.email_utils import enviar_email_em_segundo_plano
+    enviar_email_em_segundo_plano(paciente_sorteado.email, assunto, corpo)
 
     return jsonify({
         "message": "Paciente sorteado com sucesso, atendimento criado e e-mail enviado.",
@@ -820,36 +907,9 @@ def sortear_paciente():
     }), 200
 
 
-
-
-@auth_bp.get("/depurar/pacientes-candidatos/<int:profissional_id>")
-@jwt_required()
-def depurar_pacientes_candidatos(profissional_id):
-    profissional = User.query.get(profissional_id)
-    if not profissional:
-        return jsonify({"message": "Profissional não encontrado."}), 404
-
-    candidatos = User.query.filter(
-        User.tipo == "paciente",
-        User.especialidade_necessaria == profissional.especialidade,
-        User.estado == profissional.estado,
-        User.municipio == profissional.municipio
-    ).all()
-
-    resultados = []
-    for c in candidatos:
-        resultados.append({
-            "id": c.id,
-            "nome": c.nome,
-            "especialidade_necessaria": c.especialidade_necessaria,
-            "estado": c.estado,
-            "municipio": c.municipio
-        })
-
-    return jsonify(resultados), 200
-
 @auth_bp.put("/atendimentos/<int:atendimento_id>/concluir")
 @jwt_required()
+@idempotente
 def concluir_atendimento(atendimento_id):
     user_id = get_jwt_identity()
     tipo_usuario = get_jwt().get("tipo")
@@ -865,27 +925,11 @@ def concluir_atendimento(atendimento_id):
         return jsonify({"message": "Acesso negado."}), 403
 
     # Permitir concluir quando estava sorteado_em_atendimento ou Em atendimento
-    if atendimento.status not in ("sorteado_em_atendimento", "Em atendimento"):
+    if not permitido("concluir", atendimento):
         return jsonify({"message": f"Atendimento não pode ser concluído no status {atendimento.status}."}), 400
 
-    # Atualiza atendimento
-    atendimento.status = "finalizado_profissional"
-    atendimento.data_fim = datetime.utcnow()
-
-    # Atualiza inscrição correspondente do sorteio
-    inscricao = (
-        SorteioAtendimento.query.filter(
-            SorteioAtendimento.paciente_id == atendimento.paciente_id,
-            SorteioAtendimento.profissional_id == atendimento.profissional_id,
-            SorteioAtendimento.especialidade == atendimento.especialidade,
-            SorteioAtendimento.status == "sorteado_em_atendimento",
-        ).first()
-    )
-
-    if inscricao:
-        inscricao.status = "finalizado_profissional"
-        inscricao.data_finalizacao = datetime.utcnow()
-
+    # Atualiza atendimento e a inscrição correspondente do sorteio
+    transicionar("concluir", atendimento)
     db.session.commit()
 
     # Gera link de confirmação do paciente (mantendo sua lógica)
@@ -906,12 +950,14 @@ def concluir_atendimento(atendimento_id):
         "como bloqueio de conta e suspensão da participação nos sorteios.\n\n"
         "Atenciosamente,\nEquipe Atendimento"
     )
-    enviar_email(atendimento.paciente.email, assunto, corpo)
+    from utils.email_utils import enviar_email_em_segundo_plano
+    enviar_email_em_segundo_plano(atendimento.paciente.email, assunto, corpo)
 
     return jsonify({"message": "Atendimento concluído e e-mail enviado para confirmação do paciente."}), 200
 
 @auth_bp.post("/atendimentos/<int:atendimento_id>/confirmar-finalizacao")
 @jwt_required()
+@idempotente
 def confirmar_finalizacao(atendimento_id):
     user_id = get_jwt_identity()
     tipo_usuario = get_jwt().get("tipo")
@@ -926,70 +972,71 @@ def confirmar_finalizacao(atendimento_id):
     if atendimento.paciente_id != int(user_id):
         return jsonify({"message": "Acesso negado."}), 403
 
-    if atendimento.status != "finalizado_profissional":
+    if not permitido("confirmar", atendimento):
         return jsonify({"message": "Atendimento não está aguardando confirmação."}), 400
 
-    atendimento.status = "finalizado_confirmado"
-    atendimento.data_confirmacao = datetime.utcnow()
-
-    # Atualiza inscrição correspondente do sorteio
-    inscricao = (
-        SorteioAtendimento.query.filter(
-            SorteioAtendimento.paciente_id == atendimento.paciente_id,
-            SorteioAtendimento.profissional_id == atendimento.profissional_id,
-            SorteioAtendimento.especialidade == atendimento.especialidade,
-            SorteioAtendimento.status == "finalizado_profissional",
-        ).first()
-    )
-
-    if inscricao:
-        inscricao.status = "finalizado_confirmado"
-        # Já tem data_finalizacao; mantenha ou ajuste conforme sua necessidade
-        if not inscricao.data_finalizacao:
-            inscricao.data_finalizacao = datetime.utcnow()
-
+    # Atualiza atendimento e a inscrição correspondente do sorteio
+    transicionar("confirmar", atendimento)
     db.session.commit()
 
     return jsonify({"message": "Finalização confirmada com sucesso. Obrigado!"}), 200
 
 @auth_bp.get("/ranking-profissionais")
+@etag_por_versao(_versao_ranking)
 def ranking_profissionais():
     # Considera “concluído” apenas quando finalizado_confirmado (fonte de verdade)
     # Se sua base ainda possuir outros sinônimos, acrescente-os aqui.
+    # Atendimentos arquivados continuam contando no ranking
+    confirmados = (
+        select(Atendimento.profissional_id.label("prof_id"))
+        .where(Atendimento.status == FINALIZADO_CONFIRMADO)
+        .union_all(
+            select(AtendimentoArquivo.profissional_id)
+            .where(AtendimentoArquivo.status == FINALIZADO_CONFIRMADO)
+        )
+        .subquery()
+    )
+    if fragmentos.ATIVO:
+        return jsonify(list(map(_ranking, _ranking_fragmentado(confirmados)))), 200
+
     subq = (
         db.session.query(
-            Atendimento.profissional_id.label("prof_id"),
-            func.count(Atendimento.id).label("total_concluidos")
+            confirmados.c.prof_id,
+            func.count().label("total_concluidos")
         )
-        .filter(Atendimento.status == "finalizado_confirmado")
-        .group_by(Atendimento.profissional_id)
+        .group_by(confirmados.c.prof_id)
         .subquery()
     )
 
-    # Join com User (apenas profissionais)
+    # Join com os profissionais (user + profissional)
     query = (
         db.session.query(
-            User.id,
-            User.nome,
-            User.especialidade,
-            User.estado,
+            Profissional.id,
+            Profissional.nome,
+            Profissional.especialidade,
+            Profissional.estado,
             subq.c.total_concluidos
         )
-        .join(subq, subq.c.prof_id == User.id)
-        .filter(User.tipo == "profissional")
+        .join(subq, subq.c.prof_id == Profissional.id)
         .filter(subq.c.total_concluidos > 0)
-        .order_by(desc(subq.c.total_concluidos), asc(User.nome))
+        .order_by(desc(subq.c.total_concluidos), asc(Profissional.nome))
         .limit(100)  # limite de segurança
     )
 
-    resultados = []
-    for row in query.all():
-        resultados.append({
-            "id": row.id,
-            "nome": row.nome,
-            "especialidade": row.especialidade,
-            "estado": row.estado,
-            "total_concluidos": int(row.total_concluidos)
-        })
-
-    return jsonify(resultados), 200
\ No newline at end of file
+    return jsonify(list(map(_ranking, query.all()))), 200
+
+
+def _ranking_fragmentado(confirmados):
+    # Contagem por profissional em cada fragmento, somada aqui; nomes vêm do banco principal
+    totais = Counter()
+    por_profissional = select(confirmados.c.prof_id, func.count()).group_by(confirmados.c.prof_id)
+    for f in fragmentos.todos():
+        totais.update(dict(db.session.execute(por_profissional.execution_options(fragmento=f)).all()))
+    totais.pop(None, None)
+    profissionais = db.session.execute(
+        select(Profissional.id, Profissional.nome, Profissional.especialidade, Profissional.estado)
+        .where(Profissional.id.in_(list(totais)))
+    )
+    linhas = [(*p, totais[p.id]) for p in profissionais]
+    linhas.sort(key=lambda l: (-l[4], l[1]))
+    return linhas[:100]  # limite de segurança
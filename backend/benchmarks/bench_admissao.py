@@ -0,0 +1,136 @@
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Uso (na pasta backend): python -m benchmarks.bench_admissao [multiplo] [segundos]
+# Sobrecarga: mede quantos logins por segundo um gunicorn de 1 worker aguenta e depois dispara
+# logins em `multiplo` vezes essa taxa (carga aberta: não espera respostas), junto com um fluxo
+# fixo de leituras (/health e ranking), com ADMISSAO=0 e ADMISSAO=1. Mostra latência (p50/p99)
+# por tipo, recusas 503 e respostas que passaram do tempo limite do cliente.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from database import db
+from models import Paciente, Profissional, Atendimento
+from benchmarks.bench_servidor import esperar, porta_livre
+
+MULTIPLO = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+SEGUNDOS = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+LEITURAS_POR_SEGUNDO = 20
+TEMPO_LIMITE = 10
+PASTA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOGIN = json.dumps({"email": "pac@example.com", "senha": "123456", "tipo": "paciente"})
+
+
+def popular():
+    agora = datetime.utcnow()
+    db.session.execute(insert(Paciente), [{"tipo": "paciente", "email": "pac@example.com", "nome": "Paciente",
+                                           "senha_hash": generate_password_hash("123456")}])
+    db.session.execute(insert(Profissional), [{"tipo": "profissional", "email": f"prof{i}@example.com",
+                                               "senha_hash": "-", "nome": f"Prof {i}"} for i in range(20)])
+    db.session.execute(insert(Atendimento), [
+        {"paciente_id": 1, "profissional_id": 2 + i % 20, "especialidade": "Cardiologia",
+         "status": "finalizado_confirmado", "data_inicio": agora - timedelta(hours=i), "data_fim": agora}
+        for i in range(500)
+    ])
+    db.session.commit()
+
+
+def requisicao(porta, metodo, caminho, corpo=None):
+    inicio = time.monotonic()
+    try:
+        conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=TEMPO_LIMITE)
+        conexao.request(metodo, caminho, body=corpo, headers={"Content-Type": "application/json"})
+        status = conexao.getresponse().status
+        conexao.close()
+    except (OSError, http.client.HTTPException):
+        status = None  # tempo limite ou conexão recusada
+    return status, time.monotonic() - inicio
+
+
+def capacidade(porta):
+    # Logins/s com clientes suficientes para ocupar o worker
+    fim = time.monotonic() + 5
+    contagem = [0]
+
+    def cliente():
+        while time.monotonic() < fim:
+            if requisicao(porta, "POST", "/auth/login", LOGIN)[0] == 200:
+                contagem[0] += 1
+
+    threads = [threading.Thread(target=cliente) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return contagem[0] / 5
+
+
+def carga(porta, logins_por_segundo):
+    resultados = {"login": [], "leitura": []}
+    chegadas = sorted(
+        [(i / logins_por_segundo, "login") for i in range(int(SEGUNDOS * logins_por_segundo))]
+        + [(i / LEITURAS_POR_SEGUNDO, "leitura") for i in range(int(SEGUNDOS * LEITURAS_POR_SEGUNDO))]
+    )
+
+    def disparar(tipo, indice):
+        if tipo == "login":
+            resultados["login"].append(requisicao(porta, "POST", "/auth/login", LOGIN))
+        else:
+            caminho = "/auth/ranking-profissionais" if indice % 2 else "/health"
+            resultados["leitura"].append(requisicao(porta, "GET", caminho))
+
+    with ThreadPoolExecutor(max_workers=1000) as pool:
+        inicio = time.monotonic()
+        for indice, (momento, tipo) in enumerate(chegadas):
+            time.sleep(max(0.0, inicio + momento - time.monotonic()))
+            pool.submit(disparar, tipo, indice)
+    return resultados
+
+
+def resumo(rotulo, amostras):
+    ok = sorted(d for s, d in amostras if s == 200)
+    recusadas = sum(1 for s, _ in amostras if s == 503)
+    perdidas = sum(1 for s, _ in amostras if s is None)
+    p = lambda q: f"{ok[min(len(ok) - 1, int(q * len(ok)))] * 1000:7.0f}" if ok else "      -"
+    print(f"  {rotulo:<8} {len(amostras):5d} enviadas  {len(ok):5d} ok  p50 {p(0.5)} ms  p99 {p(0.99)} ms  "
+          f"503: {recusadas:4d}  sem resposta em {TEMPO_LIMITE}s: {perdidas}")
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        popular()
+
+    taxa = None
+    for admissao in ("0", "1"):
+        porta = porta_livre()
+        ambiente = {**os.environ, "PORT": str(porta), "HOST": "127.0.0.1", "WEB_ACCESS_LOG": "",
+                    "WEB_WORKERS": "1", "ADMISSAO": admissao}
+        processo = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                                    cwd=PASTA, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            esperar(porta)
+            if taxa is None:
+                taxa = capacidade(porta)
+                print(f"capacidade: {taxa:.1f} logins/s; carga: {taxa * MULTIPLO:.1f} logins/s + "
+                      f"{LEITURAS_POR_SEGUNDO} leituras/s por {SEGUNDOS:.0f}s")
+            resultados = carga(porta, taxa * MULTIPLO)
+            print(f"ADMISSAO={admissao}")
+            for tipo, amostras in resultados.items():
+                resumo(tipo, amostras)
+        finally:
+            processo.kill()
+            processo.wait(timeout=30)
@@ -0,0 +1,96 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Uso (na pasta backend): python -m benchmarks.bench_busca [usuarios] [consultas]
+# Latência de GET /admin/buscar (índice FTS5) contra a alternativa sem índice, LIKE '%termo%'
+# em nome, e-mail e descrição, com termos comuns (1 a 3) e com um termo seletivo (parte de um
+# e-mail). Também mede o tempo de inserção com os gatilhos e o tamanho do índice.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import and_, insert, or_, select, text
+
+from app import create_app
+from database import db
+from models import Paciente, Profissional, usuarios_completos
+
+USUARIOS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+CONSULTAS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+NOMES = ["Ana", "João", "Maria", "José", "Antônio", "Francisca", "Carlos", "Paulo", "Lúcia", "Pedro",
+         "Luiz", "Marcos", "Luíza", "Gabriel", "Rafael", "Beatriz", "Fernanda", "Juliana", "Márcia", "Sérgio"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima",
+              "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes"]
+PALAVRAS = ("dor crônica no joelho após queda dificuldade para caminhar falta de ar ao subir escadas "
+            "pressão alta acompanhamento pós cirúrgico manchas na pele coceira insônia ansiedade tontura "
+            "visão embaçada dor de cabeça frequente refluxo cansaço exames de rotina diabetes").split()
+
+
+def popular():
+    rnd = random.Random(42)
+    pacientes, profissionais = [], []
+    for i in range(1, USUARIOS + 1):
+        nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}"
+        comum = {"id": i, "email": f"{nome.split()[0].lower()}.{i}@example.com", "senha_hash": "-", "nome": nome}
+        if i % 10:
+            pacientes.append(dict(comum, tipo="paciente",
+                                  descricao_necessidade=" ".join(rnd.choices(PALAVRAS, k=rnd.randint(8, 30)))))
+        else:
+            profissionais.append(dict(comum, tipo="profissional", especialidade="Clínica Geral"))
+        if len(pacientes) >= 20_000 or i == USUARIOS:
+            for modelo, linhas in ((Paciente, pacientes), (Profissional, profissionais)):
+                if linhas:
+                    db.session.execute(insert(modelo), linhas)
+            pacientes, profissionais = [], []
+    db.session.commit()
+
+
+def busca_like(termos, limite=20):
+    u = usuarios_completos.c
+    return select(u.id).where(and_(*[
+        or_(u.nome.ilike(f"%{t}%"), u.email.ilike(f"%{t}%"), u.descricao_necessidade.ilike(f"%{t}%"))
+        for t in termos
+    ])).limit(limite)
+
+
+def medir(rotulo, consultas, executar):
+    inicio = time.perf_counter()
+    for termos in consultas:
+        executar(termos)
+    print(f"{rotulo:<42} {(time.perf_counter() - inicio) / len(consultas) * 1000:8.2f} ms/consulta")
+
+
+if __name__ == "__main__":
+    app = create_app()
+    rnd = random.Random(7)
+    # Termos comuns (nomes, palavras das descrições) e seletivos (parte do e-mail de um usuário)
+    grupos = {
+        "termos comuns": [
+            rnd.sample([*NOMES, *SOBRENOMES, *[p for p in PALAVRAS if len(p) > 3]], rnd.randint(1, 3))
+            for _ in range(CONSULTAS)
+        ],
+        "termo seletivo": [[f"{rnd.randrange(1, USUARIOS)}"] for _ in range(CONSULTAS)],
+    }
+    with app.app_context():
+        db.create_all()
+        inicio = time.perf_counter()
+        popular()
+        com_gatilhos = time.perf_counter() - inicio
+        tamanho = db.session.execute(text(
+            "SELECT sum(pgsize) FROM dbstat WHERE name LIKE 'busca_usuario%'"
+        )).scalar()
+        print(f"{USUARIOS} usuários inseridos em {com_gatilhos:.1f}s (com gatilhos), "
+              f"índice de busca {tamanho / 2**20:.1f} MB")
+        for nome, consultas in grupos.items():
+            medir(f"LIKE '%termo%', {nome} (sem ranking)", consultas[:max(CONSULTAS // 10, 5)],
+                  lambda termos: db.session.execute(busca_like(termos)).all())
+        cabecalhos = {"Authorization": "Bearer " + create_access_token(identity="0", additional_claims={"tipo": "admin"})}
+
+    cliente = app.test_client()
+    for nome, consultas in grupos.items():
+        for pagina in (1, 5):
+            medir(f"GET /admin/buscar, {nome}, página {pagina}", consultas, lambda termos: cliente.get(
+                "/admin/buscar", query_string={"q": " ".join(termos), "pagina": pagina}, headers=cabecalhos))
@@ -0,0 +1,93 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Uso (na pasta backend): python -m benchmarks.bench_concorrencia [rodadas]
+# Dispara transições concorrentes sobre o mesmo atendimento (cancelar x concluir, dois
+# cancelamentos, duas conclusões) e mede o tempo por rodada. A garantia de que exatamente uma
+# vence fica em tests/test_concorrencia.py.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from database import db
+from models import Paciente, Profissional, SorteioAtendimento, Atendimento
+
+RODADAS = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+JUSTIFICATIVA = {"justificativa": "Cancelamento concorrente para teste de versão."}
+
+# Par de operações disparadas ao mesmo tempo: (quem, método, ação)
+CENARIOS = {
+    "cancelar x concluir": [("paciente", "put", "cancelar"), ("profissional", "put", "concluir")],
+    "cancelar x cancelar": [("profissional", "put", "cancelar"), ("profissional", "put", "cancelar")],
+    "concluir x concluir": [("profissional", "put", "concluir"), ("profissional", "put", "concluir")],
+}
+
+def novo_atendimento():
+    agora = datetime.utcnow()
+    inscricao = SorteioAtendimento(
+        paciente_id=1, profissional_id=2, especialidade="Cardiologia", estado="SP",
+        municipio="São Paulo", status="sorteado_em_atendimento", data_inscricao=agora,
+        data_sorteio=agora,
+    )
+    db.session.add(inscricao)
+    db.session.flush()
+    atendimento = Atendimento(
+        paciente_id=1, profissional_id=2, especialidade="Cardiologia", status="Em atendimento",
+        data_inicio=agora, data_fim=agora + timedelta(days=30), inscricao_id=inscricao.id,
+    )
+    db.session.add(atendimento)
+    db.session.commit()
+    return atendimento.id, inscricao.id
+
+
+def disparar(app, operacoes, atendimento_id, tokens):
+    barreira = threading.Barrier(len(operacoes))
+    respostas = [None] * len(operacoes)
+
+    def executar(i, quem, metodo, acao):
+        cliente = app.test_client()
+        url = f"/auth/atendimentos/{atendimento_id}/{acao}"
+        barreira.wait()
+        respostas[i] = getattr(cliente, metodo)(
+            url, json=JUSTIFICATIVA, headers={"Authorization": f"Bearer {tokens[quem]}"}
+        ).status_code
+
+    threads = [threading.Thread(target=executar, args=(i, *op)) for i, op in enumerate(operacoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return respostas
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Paciente(email="pac@example.com", senha_hash="-", nome="Paciente"),
+            Profissional(email="prof@example.com", senha_hash="-", nome="Profissional"),
+        ])
+        db.session.commit()
+        tokens = {
+            "paciente": create_access_token(identity="1", additional_claims={"tipo": "paciente"}),
+            "profissional": create_access_token(identity="2", additional_claims={"tipo": "profissional"}),
+        }
+
+    for nome, operacoes in CENARIOS.items():
+        codigos = Counter()
+        total = 0.0
+        for _ in range(RODADAS):
+            with app.app_context():
+                atendimento_id, _inscricao_id = novo_atendimento()
+            inicio = time.perf_counter()
+            codigos.update(disparar(app, operacoes, atendimento_id, tokens))
+            total += time.perf_counter() - inicio
+        print(f"{nome:<22} {total / RODADAS * 1000:6.2f} ms/rodada  respostas {dict(sorted(codigos.items()))}")
@@ -0,0 +1,63 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Uso (na pasta backend): python -m benchmarks.bench_elegibilidade [profissionais] [consultas]
+# Custo de saber se há profissional para (especialidade, UF, município) na inscrição: consulta ao
+# banco a cada tentativa (como era) contra a cópia em memória de elegibilidade.py, metade das
+# consultas em regiões sem profissional. Também mede a carga da cópia e GET /auth/regioes-atendidas.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from sqlalchemy import insert
+
+from app import create_app
+from database import db
+from models import Profissional
+import elegibilidade
+
+PROFISSIONAIS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+CONSULTAS = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+ESPECIALIDADES = [f"Especialidade {i}" for i in range(40)]
+MUNICIPIOS = [(uf, f"Município {i}") for uf in ("SP", "RJ", "MG", "BA", "RS", "PR", "PE", "CE") for i in range(200)]
+
+
+def medir(rotulo, consultas, verificar):
+    inicio = time.perf_counter()
+    encontrados = sum(1 for c in consultas if verificar(*c))
+    duracao = time.perf_counter() - inicio
+    print(f"{rotulo:<28} {duracao / len(consultas) * 1e6:9.1f} µs/consulta  ({encontrados} atendidas)")
+
+
+if __name__ == "__main__":
+    app = create_app()
+    rnd = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Profissional), [
+            {"tipo": "profissional", "email": f"prof{i}@example.com", "senha_hash": "-", "nome": f"Prof {i}",
+             "especialidade": rnd.choice(ESPECIALIDADES[:20]), "estado": uf, "municipio": municipio}
+            for i, (uf, municipio) in enumerate(rnd.choice(MUNICIPIOS) for _ in range(PROFISSIONAIS))
+        ])
+        db.session.commit()
+        consultas = [(rnd.choice(ESPECIALIDADES), *rnd.choice(MUNICIPIOS)) for _ in range(CONSULTAS)]
+
+        print(f"{PROFISSIONAIS} profissionais, {CONSULTAS} consultas")
+        medir("banco (filter_by().first())", consultas, lambda esp, uf, mun: Profissional.query.filter_by(
+            especialidade=esp, estado=uf, municipio=mun).first() is not None)
+
+        inicio = time.perf_counter()
+        elegibilidade.invalidar()
+        total = len(elegibilidade.listar_regioes())
+        print(f"carga da cópia em memória    {(time.perf_counter() - inicio) * 1000:9.1f} ms  ({total} regiões)")
+        medir("memória (elegibilidade)", consultas, elegibilidade.atendida)
+
+    cliente = app.test_client()
+    for rotulo, caminho in (("todas", "/auth/regioes-atendidas"), ("uma UF", "/auth/regioes-atendidas?uf=SP")):
+        inicio = time.perf_counter()
+        for _ in range(50):
+            tamanho = len(cliente.get(caminho, headers={"Accept-Encoding": "gzip"}).data)
+        print(f"GET regioes-atendidas {rotulo:<7}{(time.perf_counter() - inicio) / 50 * 1000:9.2f} ms  "
+              f"({tamanho / 1024:.0f} KB gzip)")
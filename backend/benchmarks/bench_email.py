@@ -0,0 +1,132 @@
+import http.client
+import json
+import os
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Uso (na pasta backend): python -m benchmarks.bench_email [latencia_ms] [conexoes] [segundos]
+# Vazão de POST /auth/enviar-codigo num gunicorn de 1 worker x 4 threads contra um servidor SMTP
+# local que atrasa cada mensagem em `latencia_ms`, com o envio na requisição (EMAIL_ASSINCRONO=0)
+# e em segundo plano (EMAIL_ASSINCRONO=1). Também confere que toda mensagem aceita foi entregue.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from sqlalchemy import insert
+
+from app import create_app
+from database import db
+from models import Paciente
+from benchmarks.bench_servidor import esperar, porta_livre
+
+LATENCIA = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.3
+CONEXOES = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+SEGUNDOS = float(sys.argv[3]) if len(sys.argv) > 3 else 8
+USUARIOS = 200
+PASTA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+entregues = 0
+_trava = threading.Lock()
+
+
+class SMTPLento(socketserver.StreamRequestHandler):
+    """SMTP mínimo: aceita qualquer AUTH e atrasa a resposta ao fim de cada DATA."""
+
+    def responder(self, linha):
+        self.wfile.write(linha.encode() + b"\r\n")
+
+    def handle(self):
+        global entregues
+        self.responder("220 stub")
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            comando = linha.decode(errors="replace").strip().upper()
+            if comando.startswith("EHLO"):
+                self.wfile.write(b"250-stub\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif comando.startswith("AUTH"):
+                self.responder("235 ok")
+            elif comando.startswith("DATA"):
+                self.responder("354 fim com .")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                time.sleep(LATENCIA)
+                with _trava:
+                    entregues += 1
+                self.responder("250 ok")
+            elif comando.startswith("QUIT"):
+                self.responder("221 tchau")
+                return
+            else:
+                self.responder("250 ok")
+
+
+class Servidor(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def carga(porta):
+    parar = time.monotonic() + SEGUNDOS
+    contagem, erros = [0] * CONEXOES, [0] * CONEXOES
+
+    def cliente(i):
+        conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=60)
+        while time.monotonic() < parar:
+            corpo = json.dumps({"email": f"pac{(i * 7919 + contagem[i]) % USUARIOS}@example.com"})
+            conexao.request("POST", "/auth/enviar-codigo", body=corpo,
+                            headers={"Content-Type": "application/json"})
+            r = conexao.getresponse()
+            r.read()
+            if r.status != 200:
+                erros[i] += 1
+            contagem[i] += 1
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(CONEXOES)]
+    inicio = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(contagem), time.monotonic() - inicio, sum(erros)
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Paciente), [
+            {"tipo": "paciente", "email": f"pac{i}@example.com", "senha_hash": "-", "nome": f"Paciente {i}"}
+            for i in range(USUARIOS)
+        ])
+        db.session.commit()
+
+    smtp = Servidor(("127.0.0.1", 0), SMTPLento)
+    threading.Thread(target=smtp.serve_forever, daemon=True).start()
+
+    print(f"SMTP com {LATENCIA * 1000:.0f} ms por mensagem, {CONEXOES} conexões, {SEGUNDOS:.0f}s, "
+          f"gunicorn 1 worker x 4 threads")
+    for nome, assincrono in (("envio na requisição", "0"), ("envio em segundo plano", "1")):
+        entregues = 0
+        porta = porta_livre()
+        ambiente = {
+            **os.environ, "PORT": str(porta), "HOST": "127.0.0.1", "WEB_ACCESS_LOG": "",
+            "WEB_WORKERS": "1", "WEB_THREADS": "4", "EMAIL_ASSINCRONO": assincrono,
+            "SMTP_SERVER": "127.0.0.1", "SMTP_PORT": str(smtp.server_address[1]), "SMTP_STARTTLS": "0",
+            "SMTP_USERNAME": "bench", "SMTP_PASSWORD": "bench",
+        }
+        processo = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                                    cwd=PASTA, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            esperar(porta)
+            total, duracao, erros = carga(porta)
+        finally:
+            # Desligamento gracioso: o worker espera a fila de e-mails esvaziar
+            processo.terminate()
+            processo.wait(timeout=120)
+        print(f"{nome:<24} {total / duracao:8.1f} req/s  erros {erros}  "
+              f"e-mails entregues {entregues}/{total - erros}")
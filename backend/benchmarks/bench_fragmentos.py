@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Uso (na pasta backend): python -m benchmarks.bench_fragmentos [processos] [inscricoes]
+# Vazão de gravação com vários processos inscrevendo pacientes ao mesmo tempo, cada um numa UF
+# (inscrição + evento, um commit por inscrição, como a rota): sem fragmentação, com
+# FRAGMENTOS=regiao e com FRAGMENTOS=uf. Cada modo roda num subprocesso com banco novo, porque
+# FRAGMENTOS é lido na importação.
+PAPEL = sys.argv[1] if sys.argv[1:2] in (["modo"], ["trabalhador"]) else None
+_argumentos = sys.argv[2:] if PAPEL else sys.argv[1:]
+PROCESSOS = int(_argumentos[0]) if PAPEL != "trabalhador" and _argumentos else 8
+INSCRICOES = int(_argumentos[1]) if PAPEL != "trabalhador" and len(_argumentos) > 1 else 300
+UFS = ["SP", "RJ", "MG", "BA", "PR", "RS", "PE", "CE", "GO", "PA", "SC", "AM"]
+PASTA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SINAL = os.environ.get("DATABASE_URL", "").replace("sqlite:///", "") + ".largada"
+
+
+def trabalhador(paciente_id, uf, quantidade):
+    from app import create_app
+    from database import db
+    from estados import AGUARDANDO_SORTEIO
+    from eventos import registrar_evento, INSCRICAO_CRIADA
+    from models import SorteioAtendimento
+
+    app = create_app()
+    with app.app_context():
+        open(f"{SINAL}.{paciente_id}", "w").close()  # pronto; espera a largada
+        while not os.path.exists(SINAL):
+            time.sleep(0.01)
+        for i in range(quantidade):
+            agora = datetime.utcnow()
+            inscricao = SorteioAtendimento(
+                paciente_id=paciente_id, especialidade=f"Especialidade {i}", estado=uf,
+                municipio="Capital", status=AGUARDANDO_SORTEIO, data_inscricao=agora,
+            )
+            db.session.add(inscricao)
+            db.session.flush()
+            registrar_evento(INSCRICAO_CRIADA, agora, inscricao_id=inscricao.id)
+            db.session.commit()
+
+
+def medir_modo():
+    from sqlalchemy import insert
+
+    from app import create_app
+    from database import db
+    from models import Paciente
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Paciente), [
+            {"tipo": "paciente", "email": f"pac{i}@example.com", "senha_hash": "-", "nome": f"Paciente {i}"}
+            for i in range(PROCESSOS)
+        ])
+        db.session.commit()
+
+    # Mede só as gravações: os processos sobem, avisam que estão prontos e esperam a largada
+    filhos = [
+        subprocess.Popen([sys.executable, "-m", "benchmarks.bench_fragmentos", "trabalhador",
+                          str(i + 1), UFS[i % len(UFS)], str(INSCRICOES)], cwd=PASTA)
+        for i in range(PROCESSOS)
+    ]
+    while not all(os.path.exists(f"{SINAL}.{i + 1}") for i in range(PROCESSOS)):
+        time.sleep(0.05)
+    inicio = time.perf_counter()
+    open(SINAL, "w").close()
+    falhas = sum(1 for filho in filhos if filho.wait() != 0)
+    duracao = time.perf_counter() - inicio
+    print(f"{os.environ.get('FRAGMENTOS') or 'desligada':<10} {PROCESSOS * INSCRICOES / duracao:8.0f} inscrições/s  "
+          f"({duracao:.1f}s{f', {falhas} processos falharam' if falhas else ''})")
+
+
+if __name__ == "__main__":
+    if PAPEL == "trabalhador":
+        trabalhador(int(sys.argv[2]), sys.argv[3], int(sys.argv[4]))
+    elif PAPEL == "modo":
+        medir_modo()
+    else:
+        print(f"{PROCESSOS} processos x {INSCRICOES} inscrições, UFs {', '.join(UFS[:PROCESSOS])}")
+        for modo in ("", "regiao", "uf"):
+            ambiente = {**os.environ, "FRAGMENTOS": modo, "PROJECAO_ATRASO_SEGUNDOS": "0",
+                        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')}"}
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_fragmentos", "modo",
+                            str(PROCESSOS), str(INSCRICOES)], cwd=PASTA, env=ambiente, check=True)
@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Uso (na pasta backend): python -m benchmarks.bench_http_cache [linhas] [repeticoes]
+# Bytes enviados e CPU por requisição do histórico do paciente: sem compressão, gzip, brotli
+# (se instalado) e revalidação com If-None-Match (304).
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+
+from app import create_app
+from cache_http import brotli
+from database import db
+from models import Paciente, Profissional, Atendimento
+
+LINHAS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+REPETICOES = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+
+def popular():
+    agora = datetime.utcnow()
+    db.session.execute(insert(Paciente), [
+        {"tipo": "paciente", "email": "pac@example.com", "senha_hash": "-", "nome": "Paciente"},
+    ])
+    db.session.execute(insert(Profissional), [
+        {"tipo": "profissional", "email": "prof@example.com", "senha_hash": "-", "nome": "Profissional"},
+    ])
+    db.session.execute(insert(Atendimento), [
+        {"paciente_id": 1, "profissional_id": 2, "especialidade": "Cardiologia",
+         "status": "finalizado_confirmado", "data_inicio": agora - timedelta(hours=i),
+         "data_fim": agora - timedelta(hours=i - 1)}
+        for i in range(LINHAS)
+    ])
+    db.session.commit()
+
+
+def medir(cliente, nome, cabecalhos):
+    total_bytes = 0
+    inicio = time.process_time()
+    for _ in range(REPETICOES):
+        r = cliente.get("/auth/paciente/atendimentos", headers=cabecalhos)
+        total_bytes += len(r.data)
+    cpu = (time.process_time() - inicio) / REPETICOES
+    print(f"{nome:<26} status {r.status_code}  {total_bytes / REPETICOES / 1024:9.1f} KB/req  "
+          f"cpu {cpu * 1000:7.2f} ms/req")
+    return r
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        popular()
+        token = create_access_token(identity="1", additional_claims={"tipo": "paciente"})
+    cliente = app.test_client()
+    auth = {"Authorization": f"Bearer {token}"}
+
+    print(f"histórico do paciente com {LINHAS} atendimentos, média de {REPETICOES} requisições")
+    r = medir(cliente, "sem compressão", auth)
+    medir(cliente, "gzip", {**auth, "Accept-Encoding": "gzip"})
+    if brotli:
+        medir(cliente, "brotli", {**auth, "Accept-Encoding": "br"})
+    medir(cliente, "If-None-Match (304)", {**auth, "If-None-Match": r.headers["ETag"]})
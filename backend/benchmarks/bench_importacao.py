@@ -0,0 +1,77 @@
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Uso (na pasta backend): python -m benchmarks.bench_importacao [linhas] [amostra_hash]
+# Mede a importação em lote de profissionais. O hash de senha (scrypt, ~100 ms cada) domina o
+# tempo total: ele é medido numa amostra e extrapolado para o arquivo inteiro por processo.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from database import db
+from models import Profissional
+import importacao
+
+LINHAS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+AMOSTRA_HASH = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+CAMPOS = ["email", "senha", "nome", "cep", "endereco", "estado", "municipio", "especialidade",
+          "local_atendimento", "registro_conselho", "uf_registro", "cidade", "telefone"]
+
+
+def gerar_csv(linhas):
+    rnd = random.Random(1)
+    buffer = io.StringIO()
+    buffer.write(",".join(CAMPOS) + "\n")
+    for i in range(linhas):
+        # ~1% de registros repetidos para exercitar a deduplicação
+        registro = rnd.randrange(linhas) if rnd.random() < 0.01 else i
+        buffer.write(
+            f"prof{i}@example.com,senha{i},Profissional {i},01001000,Rua {i},SP,São Paulo,"
+            f"Cardiologia,Clínica {i},CRM{registro},SP,São Paulo,11999990000\n"
+        )
+    buffer.seek(0)
+    return buffer
+
+
+def hash_por_segundo(processos):
+    senhas = [f"senha{i}" for i in range(AMOSTRA_HASH)]
+    inicio = time.perf_counter()
+    if processos > 1:
+        with ProcessPoolExecutor(processos) as pool:
+            list(pool.map(generate_password_hash, senhas, chunksize=max(1, AMOSTRA_HASH // 32)))
+    else:
+        list(map(generate_password_hash, senhas))
+    return AMOSTRA_HASH / (time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        arquivo = gerar_csv(LINHAS)
+
+        # Sem o custo do hash: validação, deduplicação e inserção em lotes
+        original = importacao.generate_password_hash
+        importacao.generate_password_hash = lambda senha: "-"
+        inicio = time.perf_counter()
+        resultado = importacao.importar_usuarios(arquivo, "profissional", processos=1)
+        sem_hash = time.perf_counter() - inicio
+        importacao.generate_password_hash = original
+
+        print(f"{LINHAS} linhas: {resultado['importados']} importadas, {len(resultado['erros'])} com erro")
+        print(f"validação + deduplicação + inserção em lotes: {sem_hash:.2f}s "
+              f"({LINHAS / sem_hash:,.0f} linhas/s)")
+        print(f"registros no banco: {Profissional.query.count()}")
+
+        for processos in sorted({1, os.cpu_count() or 1}):
+            taxa = hash_por_segundo(processos)
+            print(f"hash de senha com {processos} processo(s): {taxa:,.1f}/s -> "
+                  f"estimativa para {LINHAS} linhas: {LINHAS / taxa / 60:,.1f} min")
@@ -0,0 +1,71 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Uso (na pasta backend): python -m benchmarks.bench_inicializacao [rodadas]
+# Partida a frio de um worker: cada rodada é um interpretador novo que mede o import de app,
+# create_app() e a primeira requisição (/health e uma rota autenticada com banco), com e sem
+# CRIAR_TABELAS=1, contra um banco que já tem as tabelas.
+RODADAS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+FILHO = r"""
+import json, sys, time
+inicio = time.perf_counter()
+import app as modulo
+importado = time.perf_counter()
+app = modulo.create_app()
+criado = time.perf_counter()
+from flask_jwt_extended import create_access_token
+with app.app_context():
+    token = create_access_token(identity="1", additional_claims={"tipo": "paciente"})
+cliente = app.test_client()
+antes = time.perf_counter()
+assert cliente.get("/health").status_code == 200
+saude = time.perf_counter()
+r = cliente.get("/auth/paciente/atendimentos", headers={"Authorization": f"Bearer {token}"})
+assert r.status_code == 200, r.status_code
+fim = time.perf_counter()
+print(json.dumps({
+    "import": importado - inicio,
+    "create_app": criado - importado,
+    "1a /health": saude - antes,
+    "1a rota com banco": fim - saude,
+    "modulos carregados": len(sys.modules),
+    "email carregado": "utils.email_utils" in sys.modules,
+}))
+"""
+
+
+def rodar(ambiente):
+    saida = subprocess.run(
+        [sys.executable, "-c", FILHO], env=ambiente, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def preparar_banco(ambiente):
+    subprocess.run(
+        [sys.executable, "-c", "from app import create_app; from database import db\n"
+         "app = create_app()\nwith app.app_context(): db.create_all()"],
+        env=ambiente, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+
+
+if __name__ == "__main__":
+    base = dict(os.environ)
+    base["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')}"
+    base.pop("CRIAR_TABELAS", None)
+    preparar_banco(base)
+
+    print(f"mediana de {RODADAS} partidas a frio (ms)")
+    for nome, extra in (("CRIAR_TABELAS=1", {"CRIAR_TABELAS": "1"}), ("padrão", {})):
+        medidas = [rodar({**base, **extra}) for _ in range(RODADAS)]
+        fases = ("import", "create_app", "1a /health", "1a rota com banco")
+        valores = {f: statistics.median(m[f] for m in medidas) * 1000 for f in fases}
+        total = sum(valores.values())
+        print(f"{nome:<16} " + "  ".join(f"{f} {v:7.1f}" for f, v in valores.items()) + f"  total {total:7.1f}"
+              f"  módulos {medidas[-1]['modulos carregados']}  email {'sim' if medidas[-1]['email carregado'] else 'não'}")
@@ -0,0 +1,76 @@
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Uso (na pasta backend): python -m benchmarks.bench_invalidacao [workers] [segundos]
+# Coerência entre workers: um gunicorn com `workers` processos carrega a lista de regiões
+# atendidas em todos eles; cadastra-se um profissional numa região nova e GET /auth/regioes-atendidas
+# é repetido (conexões novas, caindo em workers variados) por `segundos`, contando respostas
+# sem a região nova. Com INVALIDACAO_BACKEND=local só a recarga periódica (60 s) corrige os
+# outros workers; com =banco eles recebem o aviso no próximo request depois de ~1 s.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from app import create_app
+from database import db
+from benchmarks.bench_servidor import esperar, porta_livre
+
+WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+SEGUNDOS = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+PASTA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def requisicao(porta, metodo, caminho, corpo=None):
+    conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=30)
+    conexao.request(metodo, caminho, body=json.dumps(corpo) if corpo else None,
+                    headers={"Content-Type": "application/json", "Connection": "close"})
+    r = conexao.getresponse()
+    dados = r.read()
+    conexao.close()
+    return r.status, dados
+
+
+def profissional(n):
+    return {"email": f"prof{n}@example.com", "senha": "x", "nome": f"Prof {n}", "cep": "01001000",
+            "endereco": "Rua", "estado": "SP", "municipio": f"Município {n}", "especialidade": "Cardiologia",
+            "local_atendimento": "Clínica", "registro_conselho": f"CRM{n}", "uf_registro": "SP", "cidade": "X"}
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+
+    print(f"{WORKERS} workers, {SEGUNDOS:.0f}s de observação depois de cada cadastro")
+    for n, backend in enumerate(("local", "banco")):
+        porta = porta_livre()
+        ambiente = {**os.environ, "PORT": str(porta), "HOST": "127.0.0.1", "WEB_ACCESS_LOG": "",
+                    "WEB_WORKERS": str(WORKERS), "WEB_THREADS": "1", "INVALIDACAO_BACKEND": backend}
+        processo = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                                    cwd=PASTA, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            esperar(porta)
+            for _ in range(WORKERS * 10):  # carrega a cópia em todos os workers
+                requisicao(porta, "GET", "/auth/regioes-atendidas")
+
+            status, _ = requisicao(porta, "POST", "/auth/register/profissional", profissional(n))
+            assert status == 201, status
+            inicio = time.monotonic()
+            total = velhas = 0
+            ultima_velha = None
+            while time.monotonic() - inicio < SEGUNDOS:
+                _, dados = requisicao(porta, "GET", "/auth/regioes-atendidas?uf=SP")
+                total += 1
+                if f"Município {n}" not in dados.decode():
+                    velhas += 1
+                    ultima_velha = time.monotonic() - inicio
+            fim = f"{ultima_velha:.2f}s" if ultima_velha is not None else "-"
+            print(f"INVALIDACAO_BACKEND={backend:<6} {total:5d} respostas, {velhas:5d} sem a região nova "
+                  f"({velhas / total:6.1%}), última desatualizada em {fim}  ({total / SEGUNDOS:.0f} req/s)")
+        finally:
+            processo.terminate()
+            processo.wait(timeout=30)
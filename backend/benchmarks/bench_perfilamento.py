@@ -0,0 +1,83 @@
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Uso (na pasta backend): python -m benchmarks.bench_perfilamento [requisicoes]
+# Custo do gancho de perfilamento em GET /auth/profissional/atendimentos (cliente de teste, sem
+# rede): gancho não registrado (PERFILAMENTO=0), registrado e desligado, e perfilando toda
+# requisição (X-Perfilamento com a chave). Mostra também o resumo de um perfil gravado.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+os.environ["PERFILAMENTO_PASTA"] = os.path.join(_tmp, "perfis")
+os.environ["PERFILAMENTO_CHAVE"] = "bench"
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+
+from app import create_app
+from database import db
+from models import Paciente, Profissional, Atendimento
+
+REQUISICOES = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+
+def popular():
+    agora = datetime.utcnow()
+    db.session.execute(insert(Profissional), [
+        {"tipo": "profissional", "email": "prof@example.com", "senha_hash": "-", "nome": "Prof"},
+    ])
+    db.session.execute(insert(Paciente), [
+        {"tipo": "paciente", "email": f"pac{i}@example.com", "senha_hash": "-", "nome": f"Paciente {i}"}
+        for i in range(200)
+    ])
+    db.session.execute(insert(Atendimento), [
+        {"paciente_id": 2 + i % 200, "profissional_id": 1, "especialidade": "Cardiologia",
+         "status": "finalizado_confirmado", "data_inicio": agora - timedelta(hours=i), "data_fim": agora}
+        for i in range(2000)
+    ])
+    db.session.commit()
+
+
+def medir(app, cabecalhos):
+    cliente = app.test_client()
+    tempos = []
+    for _ in range(REQUISICOES):
+        inicio = time.perf_counter()
+        r = cliente.get("/auth/profissional/atendimentos", headers=cabecalhos)
+        tempos.append(time.perf_counter() - inicio)
+        assert r.status_code == 200, r.status_code
+    return statistics.median(tempos) * 1000, r
+
+
+if __name__ == "__main__":
+    os.environ["PERFILAMENTO"] = "0"
+    sem_gancho = create_app()
+    with sem_gancho.app_context():
+        db.create_all()
+        popular()
+        token = create_access_token(identity="1", additional_claims={"tipo": "profissional"})
+    cabecalhos = {"Authorization": f"Bearer {token}"}
+
+    print(f"GET /auth/profissional/atendimentos (2000 atendimentos), mediana de {REQUISICOES} requisições")
+    base, _ = medir(sem_gancho, cabecalhos)
+    print(f"sem gancho (PERFILAMENTO=0)   {base:7.2f} ms")
+
+    os.environ["PERFILAMENTO"] = "1"
+    com_gancho = create_app()
+    desligado, _ = medir(com_gancho, cabecalhos)
+    print(f"gancho desligado              {desligado:7.2f} ms  ({(desligado / base - 1) * 100:+.1f}%)")
+    perfilado, resposta = medir(com_gancho, {**cabecalhos, "X-Perfilamento": "bench"})
+    print(f"perfilando toda requisição    {perfilado:7.2f} ms  ({(perfilado / base - 1) * 100:+.1f}%)")
+
+    nome = resposta.headers["X-Perfilamento"]
+    pasta = os.environ["PERFILAMENTO_PASTA"]
+    print(f"\n{len(os.listdir(pasta))} arquivos em {pasta}; último perfil, {nome}.sql.txt:")
+    with open(os.path.join(pasta, f"{nome}.sql.txt"), encoding="utf-8") as f:
+        for linha in f.read().splitlines()[:6]:
+            print(f"  {linha[:150]}")
+    with open(os.path.join(pasta, f"{nome}.folded"), encoding="utf-8") as f:
+        folhas = sorted(((int(l.rsplit(" ", 1)[1]), l.rsplit(" ", 1)[0].split(";")[-1]) for l in f), reverse=True)
+    print("  funções com mais amostras (topo da pilha):", ", ".join(f"{n} x{c}" for c, n in folhas[:3]))
@@ -0,0 +1,100 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# Uso (na pasta backend): python -m benchmarks.bench_projecoes [total_inscricoes]
+# Espera média por município/especialidade: reconstrução a partir das tabelas operacionais
+# (vivas + arquivo) contra a leitura da projeção alimentada pelo log de eventos.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+os.environ["PROJECAO_ATRASO_SEGUNDOS"] = "0"
+
+from sqlalchemy import insert, select
+
+from app import create_app
+from database import db
+from models import Paciente, SorteioAtendimento, EventoDominio
+from arquivamento import uniao_com_arquivo
+from eventos import INSCRICAO_CRIADA, INSCRICAO_SORTEADA
+from projecoes import projetar, listar_projecao
+
+TOTAL = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+MUNICIPIOS = [(uf, f"Município {i}") for uf in ("SP", "RJ", "MG", "BA") for i in range(50)]
+ESPECIALIDADES = [f"Especialidade {i}" for i in range(10)]
+RODADAS = 5
+
+
+def popular():
+    rnd = random.Random(42)
+    inicio = datetime.utcnow() - timedelta(days=400)
+    db.session.execute(insert(Paciente), [{"tipo": "paciente", "email": "b@example.com", "senha_hash": "-", "nome": "B"}])
+    inscricoes, eventos = [], []
+    for i in range(1, TOTAL + 1):
+        uf, municipio = rnd.choice(MUNICIPIOS)
+        especialidade = rnd.choice(ESPECIALIDADES)
+        inscrito = inicio + timedelta(minutes=rnd.randrange(500_000))
+        sorteado = inscrito + timedelta(hours=rnd.expovariate(1 / 72)) if rnd.random() < 0.7 else None
+        inscricoes.append({
+            "id": i, "paciente_id": 1, "especialidade": especialidade, "estado": uf, "municipio": municipio,
+            "status": "sorteado_em_atendimento" if sorteado else "aguardando_sorteio",
+            "data_inscricao": inscrito, "data_sorteio": sorteado,
+        })
+        comum = {"inscricao_id": i, "paciente_id": 1, "especialidade": especialidade, "estado": uf,
+                 "municipio": municipio, "data_inscricao": inscrito}
+        eventos.append({"tipo": INSCRICAO_CRIADA, "ocorrido_em": inscrito, **comum})
+        if sorteado:
+            eventos.append({"tipo": INSCRICAO_SORTEADA, "ocorrido_em": sorteado, "profissional_id": 1, **comum})
+        if len(inscricoes) == 10_000:
+            db.session.execute(insert(SorteioAtendimento), inscricoes)
+            db.session.execute(insert(EventoDominio), eventos)
+            inscricoes, eventos = [], []
+    if inscricoes:
+        db.session.execute(insert(SorteioAtendimento), inscricoes)
+        db.session.execute(insert(EventoDominio), eventos)
+    db.session.commit()
+
+
+def reconstruir():
+    s = uniao_com_arquivo(SorteioAtendimento)
+    soma, n = defaultdict(float), defaultdict(int)
+    linhas = db.session.execute(
+        select(s.c.estado, s.c.municipio, s.c.especialidade, s.c.data_inscricao, s.c.data_sorteio)
+        .where(s.c.data_sorteio != None)
+    )
+    for uf, municipio, especialidade, inscrito, sorteado in linhas:
+        chave = (uf, municipio, especialidade)
+        soma[chave] += (sorteado - inscrito).total_seconds()
+        n[chave] += 1
+    return {k: soma[k] / n[k] / 3600 for k in n}
+
+
+def medir(nome, funcao):
+    inicio = time.perf_counter()
+    for _ in range(RODADAS):
+        resultado = funcao()
+    ms = (time.perf_counter() - inicio) * 1000 / RODADAS
+    print(f"{nome:<38} {ms:10.2f} ms   {len(resultado)} grupos")
+    return resultado
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        popular()
+        print(f"{TOTAL} inscrições, {db.session.query(EventoDominio).count()} eventos")
+
+        inicio = time.perf_counter()
+        aplicados = projetar("regiao", lote=5000)
+        print(f"{'projeção inicial (replay do log)':<38} {(time.perf_counter() - inicio) * 1000:10.2f} ms   {aplicados} eventos")
+
+        operacional = medir("reconstrução nas tabelas operacionais", reconstruir)
+        projetada = medir("leitura da projeção", lambda: listar_projecao("regiao"))
+
+        diferenca = max(abs(operacional[(p["estado"], p["municipio"], p["especialidade"])] - p["espera_media_horas"])
+                        for p in projetada if p["sorteios"])
+        print(f"maior diferença entre as médias: {diferenca:.3f} h (arredondamento)")
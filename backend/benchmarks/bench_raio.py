@@ -0,0 +1,100 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Uso (na pasta backend): python -m benchmarks.bench_raio [total_inscricoes]
+# Compara a consulta exata por estado/município do sorteio com a busca por raio no índice espacial.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from sqlalchemy import insert, or_
+
+from app import create_app
+from database import db
+from models import Paciente, SorteioAtendimento
+from geo import IndiceEspacial, inscricoes_no_raio
+
+TOTAL = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+ESPECIALIDADES = [f"Especialidade {i}" for i in range(20)]
+RODADAS = 200
+
+
+def popular():
+    rnd = random.Random(42)
+    agora = datetime.utcnow()
+    db.session.execute(insert(Paciente), [{
+        "tipo": "paciente", "email": "bench@example.com", "senha_hash": "-", "nome": "Bench",
+    }])
+    linhas = []
+    for _ in range(TOTAL):
+        # Território aproximado do Brasil; município = célula de ~0.3° (uma "cidade" sintética)
+        lat, lon = rnd.uniform(-33, 5), rnd.uniform(-74, -35)
+        linhas.append({
+            "paciente_id": 1,
+            "especialidade": rnd.choice(ESPECIALIDADES),
+            "estado": "XX",
+            "municipio": f"{int(lat / 0.3)}:{int(lon / 0.3)}",
+            "status": "aguardando_sorteio",
+            "data_inscricao": agora,
+            "data_expiracao": agora + timedelta(days=30),
+            "latitude": lat,
+            "longitude": lon,
+        })
+        if len(linhas) == 10_000:
+            db.session.execute(insert(SorteioAtendimento), linhas)
+            linhas = []
+    if linhas:
+        db.session.execute(insert(SorteioAtendimento), linhas)
+    db.session.commit()
+
+
+def consulta_exata(especialidade, municipio, agora):
+    return (
+        db.session.query(Paciente)
+        .join(SorteioAtendimento, SorteioAtendimento.paciente_id == Paciente.id)
+        .filter(
+            SorteioAtendimento.status == "aguardando_sorteio",
+            SorteioAtendimento.especialidade == especialidade,
+            SorteioAtendimento.estado == "XX",
+            SorteioAtendimento.municipio == municipio,
+            or_(SorteioAtendimento.data_expiracao == None, SorteioAtendimento.data_expiracao > agora),
+        )
+        .all()
+    )
+
+
+def cronometrar(funcao, pontos):
+    inicio = time.perf_counter()
+    total = 0
+    for ponto in pontos:
+        total += len(funcao(*ponto))
+    return (time.perf_counter() - inicio) / len(pontos) * 1000, total / len(pontos)
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        popular()
+        agora = datetime.utcnow()
+        rnd = random.Random(7)
+        pontos = [(rnd.choice(ESPECIALIDADES), rnd.uniform(-30, 0), rnd.uniform(-60, -38)) for _ in range(RODADAS)]
+
+        inicio = time.perf_counter()
+        indice = IndiceEspacial()
+        indice.atualizar()
+        construcao = time.perf_counter() - inicio
+
+        print(f"{TOTAL} inscrições; índice construído em {construcao:.2f}s ({len(indice)} entradas)")
+        ms, media = cronometrar(
+            lambda e, lat, lon: consulta_exata(e, f"{int(lat / 0.3)}:{int(lon / 0.3)}", agora), pontos
+        )
+        print(f"consulta exata (estado+município)  {ms:8.3f} ms/consulta  {media:6.1f} candidatos")
+        for raio in (5, 20, 50):
+            ms, media = cronometrar(lambda e, lat, lon: indice.buscar(e, lat, lon, raio), pontos)
+            print(f"índice espacial, raio {raio:>3} km       {ms:8.3f} ms/consulta  {media:6.1f} candidatos")
+        ms, media = cronometrar(lambda e, lat, lon: inscricoes_no_raio(e, lat, lon, 20, agora), pontos)
+        print(f"índice + confirmação no banco, 20 km {ms:6.3f} ms/consulta  {media:6.1f} candidatos")
@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Uso (na pasta backend): python -m benchmarks.bench_serializacao [linhas]
+# Histórico do profissional com N atendimentos: montagem antiga (objetos ORM, consulta da
+# inscrição por linha, dict campo a campo) x select de colunas + mapeador, com JSON padrão e orjson.
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+
+from app import create_app
+from database import db
+from models import Paciente, Profissional, SorteioAtendimento, Atendimento
+from serializacao import OrjsonProvider, orjson, status_amigavel
+
+LINHAS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+STATUS = ["Em atendimento", "finalizado_profissional", "finalizado_confirmado", "cancelado_profissional"]
+
+
+def popular():
+    agora = datetime.utcnow()
+    db.session.execute(insert(Profissional), [
+        {"tipo": "profissional", "email": "prof@example.com", "senha_hash": "-", "nome": "Profissional"},
+    ])
+    db.session.execute(insert(Paciente), [
+        {"tipo": "paciente", "email": f"p{i}@example.com", "senha_hash": "-", "nome": f"Paciente {i}"}
+        for i in range(LINHAS)
+    ])
+    db.session.execute(insert(SorteioAtendimento), [
+        {"paciente_id": i + 2, "profissional_id": 1, "especialidade": "Cardiologia", "estado": "SP",
+         "municipio": "São Paulo", "status": "sorteado_em_atendimento", "data_inscricao": agora}
+        for i in range(LINHAS)
+    ])
+    db.session.execute(insert(Atendimento), [
+        {"paciente_id": i + 2, "profissional_id": 1, "especialidade": "Cardiologia",
+         "status": STATUS[i % len(STATUS)], "data_inicio": agora - timedelta(minutes=i),
+         "data_fim": agora + timedelta(days=30)}
+        for i in range(LINHAS)
+    ])
+    db.session.commit()
+
+
+def historico_antigo(profissional_id):
+    # Montagem como era antes da camada de serialização
+    atendimentos = Atendimento.query.filter_by(profissional_id=profissional_id) \
+        .order_by(Atendimento.data_inicio.desc()).all()
+    resultado = []
+    for a in atendimentos:
+        inscricao = (
+            SorteioAtendimento.query
+            .filter(
+                SorteioAtendimento.paciente_id == a.paciente_id,
+                SorteioAtendimento.profissional_id == a.profissional_id,
+                SorteioAtendimento.especialidade == a.especialidade,
+            )
+            .order_by(SorteioAtendimento.id.desc())
+            .first()
+        )
+        resultado.append({
+            "id": a.id,
+            "especialidade": a.especialidade,
+            "status": a.status,
+            "status_legivel": status_amigavel(a.status),
+            "paciente": a.paciente.nome if a.paciente else None,
+            "data_inicio": a.data_inicio.isoformat() if a.data_inicio else None,
+            "data_fim": a.data_fim.isoformat() if a.data_fim else None,
+            "local_inscricao_municipio": inscricao.municipio if inscricao else None,
+            "local_inscricao_estado": inscricao.estado if inscricao else None,
+        })
+    return json.dumps(resultado).encode()
+
+
+def medir(nome, funcao):
+    tracemalloc.start()
+    cpu, parede = time.process_time(), time.perf_counter()
+    corpo = funcao()
+    cpu, parede = time.process_time() - cpu, time.perf_counter() - parede
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{nome:<38} cpu {cpu * 1000:8.1f} ms  parede {parede * 1000:8.1f} ms  "
+          f"pico {pico / 1e6:7.1f} MB  {len(corpo) / 1e6:5.2f} MB")
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        popular()
+        token = create_access_token(identity="1", additional_claims={"tipo": "profissional"})
+    cliente = app.test_client()
+    cabecalhos = {"Authorization": f"Bearer {token}"}
+
+    print(f"histórico do profissional com {LINHAS} atendimentos")
+    with app.test_request_context():
+        medir("antes: ORM + consulta por linha", lambda: historico_antigo(1))
+
+    provedores = [("JSON padrão", DefaultJSONProvider(app))]
+    if orjson:
+        provedores.append(("orjson", OrjsonProvider(app)))
+    for nome, provedor in provedores:
+        app.json = provedor
+        cliente.get("/auth/profissional/atendimentos", headers=cabecalhos)  # aquecimento
+        medir(f"depois: colunas + mapeador, {nome}",
+              lambda: cliente.get("/auth/profissional/atendimentos", headers=cabecalhos).data)
@@ -0,0 +1,136 @@
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Uso (na pasta backend): python -m benchmarks.bench_servidor [conexoes] [segundos]
+# Vazão (req/s) do servidor de desenvolvimento (como em python app.py) contra o gunicorn com
+# gunicorn.conf.py (e o waitress, se instalado), com `conexoes` clientes keep-alive alternando
+# /health e o histórico do paciente (consulta ao banco + JSON).
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+
+from app import create_app
+from database import db
+from models import Paciente, Profissional, Atendimento
+
+CONEXOES = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+SEGUNDOS = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+PASTA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVIDORES = {
+    "dev (app.run debug)": [sys.executable, "-c",
+                            "import os; from app import create_app\n"
+                            "create_app().run(port=int(os.environ['PORT']), debug=True, use_reloader=False)"],
+    "gunicorn.conf.py": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+    "waitress (wsgi.py)": [sys.executable, "wsgi.py"],
+}
+
+
+def popular():
+    agora = datetime.utcnow()
+    db.session.execute(insert(Paciente), [
+        {"tipo": "paciente", "email": "pac@example.com", "senha_hash": "-", "nome": "Paciente"},
+    ])
+    db.session.execute(insert(Profissional), [
+        {"tipo": "profissional", "email": "prof@example.com", "senha_hash": "-", "nome": "Profissional"},
+    ])
+    db.session.execute(insert(Atendimento), [
+        {"paciente_id": 1, "profissional_id": 2, "especialidade": "Cardiologia",
+         "status": "finalizado_confirmado", "data_inicio": agora - timedelta(hours=i),
+         "data_fim": agora - timedelta(hours=i - 1)}
+        for i in range(50)
+    ])
+    db.session.commit()
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def esperar(porta, limite=30):
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=1)
+            conexao.request("GET", "/health")
+            if conexao.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"servidor não respondeu na porta {porta}")
+
+
+def carga(porta, cabecalhos):
+    parar = time.monotonic() + SEGUNDOS
+    contagem, erros = [0] * CONEXOES, [0] * CONEXOES
+
+    def cliente(i):
+        conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=30)
+        caminhos = ("/health", "/auth/paciente/atendimentos")
+        while time.monotonic() < parar:
+            try:
+                conexao.request("GET", caminhos[contagem[i] % 2], headers=cabecalhos)
+                r = conexao.getresponse()
+                r.read()
+                if r.status != 200:
+                    erros[i] += 1
+                if r.will_close:
+                    conexao.close()
+                    conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=30)
+            except (OSError, http.client.HTTPException):
+                erros[i] += 1
+                conexao.close()
+                conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=30)
+            contagem[i] += 1
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(CONEXOES)]
+    inicio = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(contagem) / (time.monotonic() - inicio), sum(erros)
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        popular()
+        token = create_access_token(identity="1", additional_claims={"tipo": "paciente"})
+    cabecalhos = {"Authorization": f"Bearer {token}"}
+
+    print(f"{CONEXOES} conexões, {SEGUNDOS:.0f}s por servidor, {os.cpu_count()} CPUs")
+    for nome, comando in SERVIDORES.items():
+        if nome.startswith("gunicorn") and not shutil.which("gunicorn"):
+            print(f"{nome:<22} gunicorn não instalado")
+            continue
+        if nome.startswith("waitress"):
+            try:
+                import waitress  # noqa: F401
+            except ImportError:
+                print(f"{nome:<22} waitress não instalado")
+                continue
+        porta = porta_livre()
+        ambiente = {**os.environ, "PORT": str(porta), "HOST": "127.0.0.1", "WEB_ACCESS_LOG": ""}
+        processo = subprocess.Popen(comando, cwd=PASTA, env=ambiente,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            esperar(porta)
+            vazao, erros = carga(porta, cabecalhos)
+            print(f"{nome:<22} {vazao:8.0f} req/s  erros {erros}")
+        finally:
+            processo.terminate()
+            processo.wait(timeout=30)
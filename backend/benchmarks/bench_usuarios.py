@@ -0,0 +1,142 @@
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Uso (na pasta backend): python -m benchmarks.bench_usuarios [usuarios] [consultas]
+# Tamanho em disco e latência das consultas de login, de "existe profissional na região" e de
+# uma varredura por UF na tabela user larga (esquema antigo), na mesma tabela com índice em
+# email, e depois de `flask migrar-usuarios` (user + paciente + profissional).
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.sqlite3')}"
+
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, Text, func, insert, select, text
+
+from app import create_app
+from database import db
+from models import User, Paciente, Profissional
+
+USUARIOS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+CONSULTAS = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+ESPECIALIDADES = [f"Especialidade {i}" for i in range(30)]
+MUNICIPIOS = [(uf, f"Município {i}") for uf in ("SP", "RJ", "MG", "BA", "RS") for i in range(100)]
+
+COLUNAS_TIPO = ["cpf", "especialidade_necessaria", "descricao_necessidade", "especialidade",
+                "local_atendimento", "registro_conselho", "uf_registro", "cidade"]
+
+# Tabela user como era antes da separação por tipo
+larga = Table(
+    "user", MetaData(),
+    Column("id", Integer, primary_key=True),
+    *[Column(c.name, c.type) for c in User.__table__.columns if c.name != "id"],
+    Column("cpf", String(11), unique=True),
+    Column("especialidade_necessaria", String(120)),
+    Column("descricao_necessidade", Text),
+    Column("especialidade", String(120)),
+    Column("local_atendimento", String(255)),
+    Column("registro_conselho", String(60)),
+    Column("uf_registro", String(2)),
+    Column("cidade", String(120)),
+)
+Index("ix_user_atualizado_em", larga.c.atualizado_em)
+
+
+def popular():
+    rnd = random.Random(42)
+    linhas = []
+    for i in range(1, USUARIOS + 1):
+        uf, municipio = rnd.choice(MUNICIPIOS)
+        comum = {
+            "id": i, "email": f"u{i}@example.com", "senha_hash": "pbkdf2:sha256:600000$" + "x" * 80,
+            "nome": f"Usuário {i}", "telefone": "11999990000", "cep": "01001000",
+            "endereco": "Rua Exemplo, 123", "bairro": "Centro", "estado": uf, "municipio": municipio,
+            "latitude": rnd.uniform(-33, 5), "longitude": rnd.uniform(-74, -35),
+        }
+        comum.update(dict.fromkeys(COLUNAS_TIPO))
+        if i % 10:
+            comum.update(tipo="paciente", cpf=f"{i:011d}", especialidade_necessaria=rnd.choice(ESPECIALIDADES),
+                         descricao_necessidade="Descrição da necessidade do paciente. " * 5)
+        else:
+            comum.update(tipo="profissional", especialidade=rnd.choice(ESPECIALIDADES),
+                         local_atendimento="Clínica Exemplo", registro_conselho=f"CRM{i}",
+                         uf_registro=uf, cidade=municipio)
+        linhas.append(comum)
+        if len(linhas) == 10_000:
+            db.session.execute(insert(larga), linhas)
+            linhas = []
+    if linhas:
+        db.session.execute(insert(larga), linhas)
+    db.session.commit()
+
+
+def tamanho(*tabelas):
+    # Páginas da tabela e dos seus índices, pelo dbstat
+    return db.session.execute(text(
+        "SELECT sum(pgsize) FROM dbstat WHERE name IN (SELECT value FROM json_each(:nomes)) "
+        "OR name IN (SELECT name FROM sqlite_master WHERE type = 'index' "
+        "AND tbl_name IN (SELECT value FROM json_each(:nomes)))"
+    ), {"nomes": json.dumps(tabelas)}).scalar()
+
+
+def medir(consulta, chaves):
+    inicio = time.perf_counter()
+    for chave in chaves:
+        db.session.execute(consulta(chave)).first()
+    return (time.perf_counter() - inicio) / len(chaves) * 1e6
+
+
+def consultas_larga():
+    t = larga.c
+    return {
+        "login (email + tipo)": lambda i: select(larga).where(t.email == f"u{i}@example.com", t.tipo == "paciente"),
+        "existe profissional": lambda m: select(larga).where(
+            t.tipo == "profissional", t.especialidade == m[2], t.estado == m[0], t.municipio == m[1]).limit(1),
+        "varredura por UF": lambda _: select(t.estado, func.count()).group_by(t.estado),
+    }
+
+
+def consultas_separadas():
+    u, prof = User.__table__.c, Profissional.__table__.c
+    pacientes = Paciente.__mapper__.persist_selectable
+    profissionais = Profissional.__mapper__.persist_selectable
+    return {
+        "login (email + tipo)": lambda i: select(pacientes).where(u.email == f"u{i}@example.com", u.tipo == "paciente"),
+        "existe profissional": lambda m: select(profissionais).where(
+            prof.especialidade == m[2], u.estado == m[0], u.municipio == m[1]).limit(1),
+        "varredura por UF": lambda _: select(u.estado, func.count()).group_by(u.estado),
+    }
+
+
+def relatorio(rotulo, consultas, tabelas, chaves):
+    db.session.execute(func.count().select())  # conexão aberta fora da medição
+    partes = [f"{rotulo:<26} {tamanho(*tabelas) / 2**20:7.1f} MB"]
+    for nome, consulta in consultas.items():
+        amostra = chaves[nome][:CONSULTAS if nome != "varredura por UF" else 20]
+        partes.append(f"{nome} {medir(consulta, amostra):9.1f} µs")
+    print("  ".join(partes))
+
+
+if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        larga.create(db.engine)
+        db.create_all()
+        popular()
+        rnd = random.Random(7)
+        chaves = {
+            "login (email + tipo)": [i for i in rnd.sample(range(1, USUARIOS + 1), CONSULTAS * 2) if i % 10][:CONSULTAS],
+            "existe profissional": [(*rnd.choice(MUNICIPIOS), rnd.choice(ESPECIALIDADES)) for _ in range(CONSULTAS)],
+            "varredura por UF": [None] * 20,
+        }
+        print(f"{USUARIOS} usuários (90% pacientes), {CONSULTAS} consultas por tipo")
+        relatorio("antes (user larga)", consultas_larga(), ["user"], chaves)
+        Index("ix_user_email_bench", larga.c.email).create(db.engine)
+        relatorio("antes + índice em email", consultas_larga(), ["user"], chaves)
+        db.session.commit()
+
+    resultado = app.test_cli_runner().invoke(args=["migrar-usuarios"])
+    print(resultado.output.strip())
+    with app.app_context():
+        relatorio("depois (por tipo)", consultas_separadas(), ["user", "paciente", "profissional"], chaves)
@@ -0,0 +1,205 @@
+import os
+import re
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, select, text
+
+from database import db
+from models import User, Paciente, usuarios_completos
+from serializacao import mapeador_linhas
+
+# Índice de texto de nome, e-mail e descrição da necessidade (pacientes), para a busca do admin.
+# SQLite: tabela FTS5; PostgreSQL: tabela com tsvector + índice GIN. Nos dois, gatilhos no banco
+# mantêm o índice em dia, inclusive nas inserções em lote (importação, migração), que não passam
+# pelos eventos do ORM.
+POR_PAGINA_MAXIMO = 100
+TERMOS_MAXIMO = 8
+# Por padrão a relevância ordena todos os usuários que casam. Com N > 0 (opção com perda), só os
+# N mais recentes que casam entram na ordenação: termos muito comuns ficam mais baratos, mas um
+# resultado mais relevante e mais antigo que esses N não aparece
+CANDIDATOS = int(os.getenv("BUSCA_CANDIDATOS", 0))
+
+COLUNAS_RESULTADO = [
+    usuarios_completos.c[c] for c in (
+        "id", "tipo", "nome", "email", "estado", "municipio", "especialidade_necessaria",
+        "descricao_necessidade", "especialidade", "criado_em",
+    )
+]
+
+DDL_SQLITE = [
+    # Acentos removidos na indexação e na consulta. Sem índices de prefixo (prefix=): dobravam o
+    # tamanho do índice sem ganho medível (benchmarks/bench_busca.py)
+    """CREATE VIRTUAL TABLE IF NOT EXISTS busca_usuario USING fts5(
+        nome, email, descricao, tokenize = 'unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS busca_user_ai AFTER INSERT ON "user" BEGIN
+        INSERT INTO busca_usuario (rowid, nome, email, descricao) VALUES (new.id, new.nome, new.email, '');
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS busca_user_au AFTER UPDATE OF nome, email ON "user" BEGIN
+        UPDATE busca_usuario SET nome = new.nome, email = new.email WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS busca_user_ad AFTER DELETE ON "user" BEGIN
+        DELETE FROM busca_usuario WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS busca_paciente_ai AFTER INSERT ON paciente BEGIN
+        UPDATE busca_usuario SET descricao = coalesce(new.descricao_necessidade, '') WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS busca_paciente_au AFTER UPDATE OF descricao_necessidade ON paciente BEGIN
+        UPDATE busca_usuario SET descricao = coalesce(new.descricao_necessidade, '') WHERE rowid = new.id;
+    END""",
+]
+
+REINDEXAR_SQLITE = [
+    "DELETE FROM busca_usuario",
+    """INSERT INTO busca_usuario (rowid, nome, email, descricao)
+       SELECT u.id, u.nome, u.email, coalesce(p.descricao_necessidade, '')
+       FROM "user" u LEFT JOIN paciente p ON p.id = u.id""",
+    "INSERT INTO busca_usuario (busca_usuario) VALUES ('optimize')",
+]
+
+# Configuração 'simple' (sem radicais), como no SQLite: nomes e e-mails não têm flexão.
+# Pesos: nome (A) > e-mail (B) > descrição (C)
+DOCUMENTO_PG = """
+    setweight(to_tsvector('simple', coalesce(u.nome, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(u.email, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(p.descricao_necessidade, '')), 'C')
+"""
+
+DDL_POSTGRES = [
+    """CREATE TABLE IF NOT EXISTS busca_usuario (
+        id INTEGER PRIMARY KEY REFERENCES "user" (id) ON DELETE CASCADE,
+        documento TSVECTOR NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS ix_busca_usuario_documento ON busca_usuario USING GIN (documento)",
+    f"""CREATE OR REPLACE FUNCTION busca_usuario_atualizar() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO busca_usuario (id, documento)
+        SELECT u.id, {DOCUMENTO_PG} FROM "user" u LEFT JOIN paciente p ON p.id = u.id WHERE u.id = NEW.id
+        ON CONFLICT (id) DO UPDATE SET documento = EXCLUDED.documento;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    'DROP TRIGGER IF EXISTS busca_user ON "user"',
+    """CREATE TRIGGER busca_user AFTER INSERT OR UPDATE OF nome, email ON "user"
+        FOR EACH ROW EXECUTE FUNCTION busca_usuario_atualizar()""",
+    "DROP TRIGGER IF EXISTS busca_paciente ON paciente",
+    """CREATE TRIGGER busca_paciente AFTER INSERT OR UPDATE OF descricao_necessidade ON paciente
+        FOR EACH ROW EXECUTE FUNCTION busca_usuario_atualizar()""",
+]
+
+REINDEXAR_POSTGRES = [
+    "TRUNCATE busca_usuario",
+    f"""INSERT INTO busca_usuario (id, documento)
+        SELECT u.id, {DOCUMENTO_PG} FROM "user" u LEFT JOIN paciente p ON p.id = u.id""",
+]
+
+COMANDOS = {
+    "sqlite": (DDL_SQLITE, REINDEXAR_SQLITE),
+    "postgresql": (DDL_POSTGRES, REINDEXAR_POSTGRES),
+}
+
+
+def criar_indice(conexao, reindexar=True):
+    """Cria (se faltar) o índice e os gatilhos e, com `reindexar`, refaz o conteúdo a partir das tabelas."""
+    ddl, reindexacao = COMANDOS.get(conexao.dialect.name, ((), ()))
+    for comando in ddl + (reindexacao if reindexar else []):
+        conexao.execute(text(comando))
+
+
+# Bancos novos (create_all, db_reset/seed): índice criado junto com a tabela paciente
+@event.listens_for(Paciente.__table__, "after_create")
+def _criar_com_tabelas(tabela, conexao, **kw):
+    criar_indice(conexao)
+
+
+@event.listens_for(User.__table__, "before_drop")
+def _remover_com_tabelas(tabela, conexao, **kw):
+    if conexao.dialect.name in COMANDOS:
+        conexao.execute(text("DROP TABLE IF EXISTS busca_usuario"))
+
+
+@click.command("indexar-busca")
+@with_appcontext
+def indexar_busca_command():
+    """Cria o índice de busca de usuários (e os gatilhos) e o preenche com os dados atuais."""
+    conexao = db.session.connection()
+    if conexao.dialect.name not in COMANDOS:
+        click.echo(f"Busca de texto não disponível para {conexao.dialect.name}.")
+        return
+    criar_indice(conexao)
+    db.session.commit()
+    click.echo("Índice de busca atualizado.")
+
+
+# ------------------------
+# Consulta (admin)
+# ------------------------
+def _termos(consulta):
+    # Só letras/dígitos: nenhum operador da sintaxe de busca chega ao banco
+    return re.findall(r"\w+", consulta.lower())[:TERMOS_MAXIMO]
+
+
+def _candidatos(consulta, chave):
+    # Com CANDIDATOS, só os mais recentes que casam chegam à ordenação por relevância
+    if not CANDIDATOS:
+        return consulta
+    return f"SELECT * FROM ({consulta} ORDER BY {chave} DESC LIMIT {CANDIDATOS:d}) AS candidatos"
+
+
+def _ids_sqlite(termos, limite, deslocamento):
+    # Todos os termos (E), cada um como prefixo; bm25 com pesos nome > e-mail > descrição
+    casam = (
+        "SELECT rowid, bm25(busca_usuario, 10.0, 5.0, 1.0) AS relevancia FROM busca_usuario"
+        " WHERE busca_usuario MATCH :consulta"
+    )
+    return db.session.execute(text(
+        f"SELECT rowid FROM ({_candidatos(casam, 'rowid')}) AS casam"
+        " ORDER BY relevancia, rowid DESC LIMIT :limite OFFSET :deslocamento"
+    ), {
+        "consulta": " ".join(f'"{t}"*' for t in termos), "limite": limite, "deslocamento": deslocamento,
+    }).scalars().all()
+
+
+def _ids_postgres(termos, limite, deslocamento):
+    casam = (
+        "SELECT id, ts_rank(documento, q) AS relevancia FROM busca_usuario, to_tsquery('simple', :consulta) AS q"
+        " WHERE documento @@ q"
+    )
+    return db.session.execute(text(
+        f"SELECT id FROM ({_candidatos(casam, 'id')}) AS casam"
+        " ORDER BY relevancia DESC, id DESC LIMIT :limite OFFSET :deslocamento"
+    ), {
+        "consulta": " & ".join(f"{t}:*" for t in termos), "limite": limite, "deslocamento": deslocamento,
+    }).scalars().all()
+
+
+BUSCAS = {"sqlite": _ids_sqlite, "postgresql": _ids_postgres}
+
+
+def buscar_usuarios(consulta, pagina=1, por_pagina=20):
+    """Usuários que contêm todos os termos (prefixos) em nome, e-mail ou descrição, por relevância.
+
+    Devolve None se o banco não tiver busca de texto.
+    """
+    buscar = BUSCAS.get(db.engine.dialect.name)
+    if buscar is None:
+        return None
+    termos = _termos(consulta or "")
+    por_pagina = max(1, min(por_pagina, POR_PAGINA_MAXIMO))
+    pagina = max(1, pagina)
+    if not termos:
+        return {"resultados": [], "pagina": pagina, "proxima_pagina": None}
+
+    # Um a mais para saber se há próxima página sem contar todos os resultados
+    ids = buscar(termos, por_pagina + 1, (pagina - 1) * por_pagina)
+    tem_proxima = len(ids) > por_pagina
+    ids = ids[:por_pagina]
+
+    linhas = db.session.execute(
+        select(*COLUNAS_RESULTADO).where(usuarios_completos.c.id.in_(ids))
+    ).all() if ids else []
+    mapear = mapeador_linhas([c.name for c in COLUNAS_RESULTADO], datas=["criado_em"])
+    por_id = {linha.id: mapear(linha) for linha in linhas}
+    return {
+        "resultados": [por_id[i] for i in ids if i in por_id],
+        "pagina": pagina,
+        "proxima_pagina": pagina + 1 if tem_proxima else None,
+    }
@@ -0,0 +1,103 @@
+import gzip
+import hashlib
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+try:
+    import brotli
+except ImportError:  # dependência opcional: sem ela só gzip
+    brotli = None
+
+COMPRESSIVEIS = ("application/json", "text/csv", "text/plain", "text/html", "application/x-ndjson")
+
+
+# ------------------------
+# Compressão (gzip / brotli) acima de um tamanho mínimo
+# ------------------------
+def registrar_compressao(app):
+    minimo = int(os.getenv("COMPRESSAO_MINIMO_BYTES", 1024))
+    nivel_gzip = int(os.getenv("COMPRESSAO_NIVEL_GZIP", 6))
+    nivel_brotli = int(os.getenv("COMPRESSAO_NIVEL_BROTLI", 5))
+
+    @app.after_request
+    def comprimir(response):
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIVEIS
+        ):
+            return response
+
+        aceitos = request.accept_encodings
+        if brotli and aceitos["br"]:
+            codificacao = "br"
+        elif aceitos["gzip"]:
+            codificacao = "gzip"
+        else:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        corpo = response.get_data()
+        if len(corpo) < minimo:
+            return response
+
+        if codificacao == "br":
+            corpo = brotli.compress(corpo, quality=nivel_brotli)
+        else:
+            corpo = gzip.compress(corpo, compresslevel=nivel_gzip)
+        response.set_data(corpo)
+        response.headers["Content-Encoding"] = codificacao
+        return response
+
+
+def identidade_atual():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:  # rota pública, sem JWT verificado
+        return None
+
+
+# ------------------------
+# GET condicional (ETag / Last-Modified) a partir da versão dos dados
+# ------------------------
+def etag_por_versao(versao):
+    """Responde 304 sem executar a view quando a versão dos dados não mudou.
+
+    `versao()` roda antes da view e devolve uma tupla barata de calcular (maior atualizado_em,
+    contagem, maior id...) ou None para não usar cache. Se o primeiro elemento for um
+    datetime, ele também é enviado como Last-Modified.
+    """
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            marca = versao(*args, **kwargs)
+            if marca is None:
+                return view(*args, **kwargs)
+
+            base = repr((request.full_path, identidade_atual(), marca)).encode()
+            etag = hashlib.blake2b(base, digest_size=12).hexdigest()
+            ultima = marca[0] if marca and isinstance(marca[0], datetime) else None
+
+            # Só o ETag decide o 304: Last-Modified tem resolução de segundos
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if ultima:
+                response.last_modified = ultima
+            # Dados por usuário: o navegador guarda, mas sempre revalida
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorador
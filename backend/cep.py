@@ -0,0 +1,204 @@
+import csv
+import mmap
+import os
+import re
+import struct
+import threading
+from functools import lru_cache
+
+from flask import Blueprint, jsonify
+
+cep_bp = Blueprint("cep", __name__, url_prefix="/cep")
+
+# ------------------------
+# Formato da base local de CEPs (arquivo binário mapeado em memória)
+# ------------------------
+# Cabeçalho: assinatura + quantidade de registros.
+# Registros de tamanho fixo ordenados por CEP: cep, código IBGE, latitude, longitude e
+# deslocamento dos textos (logradouro, bairro, município, UF) na área de textos ao final.
+_ASSINATURA = b"CEP1"
+_CABECALHO = struct.Struct("<4sI")
+_REGISTRO = struct.Struct("<IIffI")
+_SEPARADOR = "\x1f"
+
+# Nomes de colunas aceitos nos dumps públicos (CEP Aberto, cep-brasil etc.)
+_COLUNAS = {
+    "cep": ("cep",),
+    "logradouro": ("logradouro", "endereco", "rua"),
+    "bairro": ("bairro",),
+    "municipio": ("municipio", "cidade", "localidade"),
+    "codigo_municipio": ("codigo_municipio", "ibge", "cod_ibge", "codigo_ibge"),
+    "estado": ("estado", "uf"),
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lon", "lng"),
+}
+
+
+def normalizar_cep(cep):
+    num = re.sub(r"\D", "", cep or "")
+    return num if len(num) == 8 else None
+
+
+def _coluna(linha, campo):
+    for nome in _COLUNAS[campo]:
+        valor = linha.get(nome)
+        if valor not in (None, ""):
+            return valor.strip()
+    return ""
+
+
+def _numero(valor):
+    try:
+        return float(valor.replace(",", "."))
+    except (AttributeError, ValueError):
+        return float("nan")
+
+
+def gerar_base_cep(origem, destino):
+    """Converte um dump CSV de CEPs no arquivo binário lido por BaseCep. Retorna o total importado."""
+    with open(origem, newline="", encoding="utf-8") as f:
+        amostra = f.read(4096)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t|")
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.DictReader(f, dialect=dialeto)
+        leitor.fieldnames = [c.strip().lower() for c in leitor.fieldnames]
+
+        por_cep = {}
+        for linha in leitor:
+            cep = normalizar_cep(_coluna(linha, "cep"))
+            if not cep:
+                continue
+            ibge = re.sub(r"\D", "", _coluna(linha, "codigo_municipio"))
+            por_cep[int(cep)] = (
+                int(ibge) if ibge else 0,
+                _numero(_coluna(linha, "latitude")),
+                _numero(_coluna(linha, "longitude")),
+                _SEPARADOR.join([
+                    _coluna(linha, "logradouro"),
+                    _coluna(linha, "bairro"),
+                    _coluna(linha, "municipio"),
+                    _coluna(linha, "estado").upper(),
+                ]).encode("utf-8"),
+            )
+
+    registros = bytearray()
+    textos = bytearray()
+    for cep in sorted(por_cep):
+        ibge, lat, lon, texto = por_cep[cep]
+        registros += _REGISTRO.pack(cep, ibge, lat, lon, len(textos))
+        textos += struct.pack("<H", len(texto)) + texto
+
+    temporario = f"{destino}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(_CABECALHO.pack(_ASSINATURA, len(por_cep)))
+        f.write(registros)
+        f.write(textos)
+    os.replace(temporario, destino)
+    return len(por_cep)
+
+
+class BaseCep:
+    def __init__(self, caminho, tamanho_cache=65536):
+        self._arquivo = open(caminho, "rb")
+        self._mm = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        assinatura, self.total = _CABECALHO.unpack_from(self._mm, 0)
+        if assinatura != _ASSINATURA:
+            raise ValueError(f"Arquivo de CEPs inválido: {caminho}")
+        self._inicio_textos = _CABECALHO.size + self.total * _REGISTRO.size
+        self.consultar = lru_cache(maxsize=tamanho_cache)(self._consultar)
+
+    def _cep_na_posicao(self, i):
+        return struct.unpack_from("<I", self._mm, _CABECALHO.size + i * _REGISTRO.size)[0]
+
+    def _consultar(self, cep):
+        alvo = int(cep)
+        baixo, alto = 0, self.total
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if self._cep_na_posicao(meio) < alvo:
+                baixo = meio + 1
+            else:
+                alto = meio
+        if baixo == self.total or self._cep_na_posicao(baixo) != alvo:
+            return None
+
+        _, ibge, lat, lon, deslocamento = _REGISTRO.unpack_from(
+            self._mm, _CABECALHO.size + baixo * _REGISTRO.size
+        )
+        inicio = self._inicio_textos + deslocamento
+        (tamanho,) = struct.unpack_from("<H", self._mm, inicio)
+        logradouro, bairro, municipio, estado = (
+            self._mm[inicio + 2:inicio + 2 + tamanho].decode("utf-8").split(_SEPARADOR)
+        )
+        return {
+            "cep": cep,
+            "logradouro": logradouro or None,
+            "bairro": bairro or None,
+            "municipio": municipio or None,
+            "codigo_municipio": str(ibge) if ibge else None,
+            "estado": estado or None,
+            # float32 guarda ~1 m de precisão, suficiente para coordenada aproximada
+            "latitude": round(lat, 5) if lat == lat else None,
+            "longitude": round(lon, 5) if lon == lon else None,
+        }
+
+
+_base = None
+_base_lock = threading.Lock()
+
+
+def base_cep():
+    """Abre a base local na primeira consulta; retorna None se o arquivo não foi importado."""
+    global _base
+    if _base is None:
+        caminho = os.getenv("CEP_BASE_ARQUIVO", os.path.join(os.path.dirname(__file__), "instance", "ceps.bin"))
+        if not os.path.exists(caminho):
+            return None
+        with _base_lock:
+            if _base is None:
+                _base = BaseCep(caminho, int(os.getenv("CEP_CACHE_TAMANHO", 65536)))
+    return _base
+
+
+def consultar_cep(cep):
+    cep = normalizar_cep(cep)
+    base = base_cep()
+    if not cep or not base:
+        return None
+    return base.consultar(cep)
+
+
+def enriquecer_endereco(user):
+    """Normaliza o CEP do usuário e completa endereço/coordenadas a partir da base local."""
+    user.cep = normalizar_cep(user.cep) or user.cep
+    info = consultar_cep(user.cep)
+    if not info:
+        if base_cep():
+            # CEP fora da base: não manter coordenadas do endereço anterior
+            user.codigo_municipio = user.latitude = user.longitude = None
+        return
+    user.endereco = user.endereco or info["logradouro"]
+    user.bairro = user.bairro or info["bairro"]
+    user.estado = user.estado or info["estado"]
+    user.municipio = user.municipio or info["municipio"]
+    user.codigo_municipio = info["codigo_municipio"]
+    user.latitude = info["latitude"]
+    user.longitude = info["longitude"]
+
+
+# ------------------------
+# Consulta de CEP
+# ------------------------
+@cep_bp.get("/<string:cep>")
+def buscar_cep(cep):
+    if not normalizar_cep(cep):
+        return jsonify({"message": "CEP inválido. Informe 8 dígitos."}), 400
+    if not base_cep():
+        return jsonify({"message": "Base de CEPs não carregada."}), 503
+    info = consultar_cep(cep)
+    if not info:
+        return jsonify({"message": "CEP não encontrado."}), 404
+    return jsonify(info), 200
@@ -0,0 +1,189 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import PasswordReset
+
+VALIDADE = timedelta(minutes=int(os.getenv("RESET_CODIGO_MINUTOS", 10)))
+# Erros permitidos por código: depois disso só pedindo um novo
+TENTATIVAS = int(os.getenv("RESET_CODIGO_TENTATIVAS", 5))
+# "banco" (padrão, vale para vários processos/servidores) ou "memoria" (um único processo)
+BACKEND = os.getenv("RESET_CODIGO_BACKEND", "banco")
+TAMANHO_MEMORIA = int(os.getenv("RESET_CODIGO_MEMORIA_TAMANHO", 10000))
+VARREDURA_SEGUNDOS = 60
+
+VALIDO, INVALIDO, EXPIRADO, ESGOTADO = "valido", "invalido", "expirado", "esgotado"
+
+Registro = namedtuple("Registro", "codigo_hash expira_em tentativas")
+
+
+def _hash(email, codigo):
+    # HMAC com o segredo do servidor: o banco sozinho não permite testar os 10^6 códigos
+    chave = current_app.config["JWT_SECRET_KEY"].encode()
+    return hmac.new(chave, f"{email}:{codigo}".encode(), hashlib.sha256).hexdigest()
+
+
+# ------------------------
+# Backends: um código ativo por e-mail, buscado pela chave
+# ------------------------
+class _Memoria:
+    """Mapa em memória limitado a `tamanho` e-mails; os mais antigos saem primeiro."""
+
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def guardar(self, email, registro):
+        with self._lock:
+            self._itens.pop(email, None)
+            self._itens[email] = registro
+            # Validade igual para todos: os vencidos estão sempre no começo
+            agora = datetime.utcnow()
+            while self._itens and (
+                len(self._itens) > self.tamanho or next(iter(self._itens.values())).expira_em < agora
+            ):
+                self._itens.popitem(last=False)
+
+    def obter(self, email):
+        with self._lock:
+            return self._itens.get(email)
+
+    def reservar(self, email, maximo):
+        with self._lock:
+            registro = self._itens.get(email)
+            if registro is None or registro.tentativas >= maximo:
+                return False
+            self._itens[email] = registro._replace(tentativas=registro.tentativas + 1)
+            return True
+
+    def devolver(self, email):
+        with self._lock:
+            registro = self._itens.get(email)
+            if registro and registro.tentativas:
+                self._itens[email] = registro._replace(tentativas=registro.tentativas - 1)
+
+    def remover(self, email):
+        with self._lock:
+            self._itens.pop(email, None)
+
+    def commit(self):
+        pass
+
+
+class _Banco:
+    """Tabela codigo_reset: e-mail único, vencidos apagados de tempos em tempos ao emitir."""
+
+    def __init__(self):
+        self._ultima_varredura = 0.0
+
+    def guardar(self, email, registro):
+        valores = dict(registro._asdict(), criado_em=datetime.utcnow())
+        if self._atualizar(email, valores):
+            return
+        db.session.add(PasswordReset(email=email, **valores))
+        try:
+            db.session.flush()
+        except IntegrityError:  # pedido simultâneo para o mesmo e-mail criou a linha antes
+            db.session.rollback()
+            self._atualizar(email, valores)
+
+    def _atualizar(self, email, valores):
+        return db.session.execute(
+            update(PasswordReset).where(PasswordReset.email == email).values(**valores)
+        ).rowcount
+
+    def obter(self, email):
+        linha = db.session.execute(
+            select(PasswordReset.codigo_hash, PasswordReset.expira_em, PasswordReset.tentativas)
+            .where(PasswordReset.email == email)
+        ).first()
+        return Registro(*linha) if linha else None
+
+    def reservar(self, email, maximo):
+        # Condição e incremento no mesmo UPDATE: a linha fica travada até o commit
+        return db.session.execute(
+            update(PasswordReset)
+            .where(PasswordReset.email == email, PasswordReset.tentativas < maximo)
+            .values(tentativas=PasswordReset.tentativas + 1)
+        ).rowcount == 1
+
+    def devolver(self, email):
+        db.session.execute(
+            update(PasswordReset).where(PasswordReset.email == email, PasswordReset.tentativas > 0)
+            .values(tentativas=PasswordReset.tentativas - 1)
+        )
+
+    def remover(self, email):
+        db.session.execute(delete(PasswordReset).where(PasswordReset.email == email))
+
+    def varrer(self):
+        if time.monotonic() - self._ultima_varredura < VARREDURA_SEGUNDOS:
+            return
+        self._ultima_varredura = time.monotonic()
+        db.session.execute(delete(PasswordReset).where(PasswordReset.expira_em < datetime.utcnow()))
+
+    def commit(self):
+        db.session.commit()
+
+
+_backend = _Memoria(TAMANHO_MEMORIA) if BACKEND == "memoria" else _Banco()
+
+
+# ------------------------
+# Operações usadas pelas rotas de recuperação de senha
+# ------------------------
+def emitir(email):
+    """Gera um novo código para `email` (invalida o anterior) e devolve o código em claro."""
+    codigo = f"{secrets.randbelow(900000) + 100000}"
+    if hasattr(_backend, "varrer"):
+        _backend.varrer()
+    _backend.guardar(email, Registro(_hash(email, codigo), datetime.utcnow() + VALIDADE, 0))
+    _backend.commit()
+    return codigo
+
+
+def _conferir(email, codigo):
+    registro = _backend.obter(email) if email and codigo else None
+    if registro is None:
+        return INVALIDO
+    if registro.expira_em < datetime.utcnow():
+        return EXPIRADO
+    # A tentativa é reservada antes da comparação, num passo só: palpites simultâneos não
+    # passam do limite; um acerto devolve a reserva
+    if not _backend.reservar(email, TENTATIVAS):
+        return ESGOTADO
+    if not hmac.compare_digest(registro.codigo_hash, _hash(email, str(codigo))):
+        return INVALIDO
+    _backend.devolver(email)
+    return VALIDO
+
+
+def verificar(email, codigo):
+    """VALIDO, INVALIDO, EXPIRADO ou ESGOTADO (erros demais). Erros contam uma tentativa."""
+    resultado = _conferir(email, codigo)
+    _backend.commit()
+    return resultado
+
+
+def consumir(email, codigo):
+    """Como verificar, mas um código válido é apagado.
+
+    No backend de banco a remoção fica na transação de quem chamou, junto com a troca de senha.
+    """
+    resultado = _conferir(email, codigo)
+    if resultado == VALIDO:
+        _backend.remover(email)
+    else:
+        _backend.commit()
+    return resultado
@@ -1,3 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
\ No newline at end of file
+from fragmentos import SessaoFragmentada
+
+db = SQLAlchemy(session_options={"class_": SessaoFragmentada})
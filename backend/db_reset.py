@@ -1,12 +1,15 @@
 from app import create_app
 from database import db
 from models import SorteioAtendimento, Atendimento
+import fragmentos
 
 app = create_app()
 
 with app.app_context():
-    num1 = SorteioAtendimento.query.delete()
-    num2 = Atendimento.query.delete()
+    num1 = num2 = 0
+    for fragmento in fragmentos.todos():
+        num1 += SorteioAtendimento.query.execution_options(fragmento=fragmento).delete()
+        num2 += Atendimento.query.execution_options(fragmento=fragmento).delete()
     db.session.commit()
     print(f"Registros de sorteio deletados: {num1}")
     print(f"Registros de atendimento deletados: {num2}")
@@ -15,7 +18,7 @@ with app.app_context():
 from werkzeug.security import generate_password_hash
 from app import create_app
 from database import db
-from models import User
+from models import User, Paciente, Profissional
 
 app = create_app()
 
@@ -25,8 +28,7 @@ with app.app_context():
     db.create_all()
 
     # ====== Profissionais ======
-    prof1 = User(
-        tipo="profissional",
+    prof1 = Profissional(
         email="dr.joao@example.com",
         senha_hash=generate_password_hash("123456"),
         nome="Dr. João Silva",
@@ -43,8 +45,7 @@ with app.app_context():
         uf_registro="SP"
     )
 
-    prof2 = User(
-        tipo="profissional",
+    prof2 = Profissional(
         email="dra.maria@example.com",
         senha_hash=generate_password_hash("123456"),
         nome="Dra. Maria Oliveira",
@@ -62,8 +63,7 @@ with app.app_context():
     )
 
     # ====== Pacientes ======
-    pac1 = User(
-        tipo="paciente",
+    pac1 = Paciente(
         cpf="12345678901",
         email="ana@example.com",
         senha_hash=generate_password_hash("123456"),
@@ -77,8 +77,7 @@ with app.app_context():
         especialidade_necessaria="Cardiologia"
     )
 
-    pac2 = User(
-        tipo="paciente",
+    pac2 = Paciente(
         cpf="23456789012",
         email="carlos@example.com",
         senha_hash=generate_password_hash("123456"),
@@ -92,8 +91,7 @@ with app.app_context():
         especialidade_necessaria="Dermatologia"
     )
 
-    pac3 = User(
-        tipo="paciente",
+    pac3 = Paciente(
         cpf="34567890123",
         email="beatriz@example.com",
         senha_hash=generate_password_hash("123456"),
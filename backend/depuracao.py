@@ -0,0 +1,33 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+
+from models import Paciente, Profissional
+
+# Rotas de diagnóstico: registradas só em desenvolvimento (FLASK_DEBUG=1) ou com ROTAS_DEPURACAO=1
+depuracao_bp = Blueprint("depuracao", __name__, url_prefix="/auth")
+
+
+@depuracao_bp.get("/depurar/pacientes-candidatos/<int:profissional_id>")
+@jwt_required()
+def depurar_pacientes_candidatos(profissional_id):
+    profissional = Profissional.query.get(profissional_id)
+    if not profissional:
+        return jsonify({"message": "Profissional não encontrado."}), 404
+
+    candidatos = Paciente.query.filter(
+        Paciente.especialidade_necessaria == profissional.especialidade,
+        Paciente.estado == profissional.estado,
+        Paciente.municipio == profissional.municipio
+    ).all()
+
+    resultados = []
+    for c in candidatos:
+        resultados.append({
+            "id": c.id,
+            "nome": c.nome,
+            "especialidade_necessaria": c.especialidade_necessaria,
+            "estado": c.estado,
+            "municipio": c.municipio
+        })
+
+    return jsonify(resultados), 200
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import func, select
+
+from database import db
+import invalidacao
+from models import Profissional
+
+# Regiões atendidas: (especialidade, UF, município) -> profissionais cadastrados ali. Cada worker
+# guarda a sua cópia, carregada na primeira consulta e atualizada pelas rotas de cadastro e
+# atualização de profissional deste processo. Os outros processos recebem um aviso no CANAL
+# (invalidacao.py) e recarregam; sem barramento entre processos, a recarga periódica limita a
+# defasagem a RECARGA_SEGUNDOS.
+RECARGA_SEGUNDOS = int(os.getenv("ELEGIBILIDADE_RECARGA_SEGUNDOS", 60))
+CANAL = "regioes"
+
+_contagem = None
+_carregado_em = 0.0
+_geracao = 0  # muda a cada recarga ou descarte da cópia
+_lock = threading.Lock()
+
+
+def regiao(profissional):
+    """Chave da região de um profissional, ou None se faltar especialidade ou endereço."""
+    chave = (profissional.especialidade, profissional.estado, profissional.municipio)
+    return chave if all(chave) else None
+
+
+def _regioes():
+    global _contagem, _carregado_em, _geracao
+    with _lock:
+        if _contagem is None or time.monotonic() - _carregado_em > RECARGA_SEGUNDOS:
+            colunas = (Profissional.especialidade, Profissional.estado, Profissional.municipio)
+            _contagem = Counter({
+                (especialidade, estado, municipio): total
+                for especialidade, estado, municipio, total in db.session.execute(
+                    select(*colunas, func.count()).where(*(c.isnot(None) for c in colunas)).group_by(*colunas)
+                )
+            })
+            _carregado_em = time.monotonic()
+            _geracao += 1
+        return _contagem
+
+
+def atendida(especialidade, estado, municipio):
+    """Há profissional cadastrado com esta especialidade neste município?"""
+    return _regioes()[(especialidade, estado, municipio)] > 0
+
+
+def geracao():
+    """Marca da cópia atual, para profissional_mudou (pegue antes do commit)."""
+    with _lock:
+        return _geracao
+
+
+def profissional_mudou(antes, depois, marca):
+    """Atualiza as contagens depois do commit: `antes`/`depois` são regiões (ou None).
+
+    `marca` é geracao() de antes do commit: se a cópia foi recarregada depois disso, não dá para
+    saber se a recarga já viu a mudança, e a cópia é descartada (a próxima consulta recarrega).
+    """
+    global _contagem, _geracao
+    if antes == depois:
+        return
+    with _lock:
+        if _contagem is None:
+            return
+        if _geracao != marca:
+            _contagem = None
+            _geracao += 1
+            return
+        if antes:
+            _contagem[antes] -= 1
+            if _contagem[antes] <= 0:
+                del _contagem[antes]
+        if depois:
+            _contagem[depois] += 1
+
+
+def invalidar():
+    """Descarta a cópia deste processo (ex.: depois de uma importação em lote)."""
+    global _contagem, _geracao
+    with _lock:
+        _contagem = None
+        _geracao += 1
+
+
+invalidacao.ouvir(CANAL, lambda chave: invalidar())
+
+
+def listar_regioes(estado=None, especialidade=None):
+    contagem = _regioes()
+    with _lock:
+        chaves = list(contagem)
+    regioes = [
+        chave for chave in chaves
+        if (estado is None or chave[1] == estado) and (especialidade is None or chave[0] == especialidade)
+    ]
+    return [
+        {"especialidade": esp, "estado": uf, "municipio": municipio}
+        for esp, uf, municipio in sorted(regioes, key=lambda c: (c[1], c[2], c[0]))
+    ]
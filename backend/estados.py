@@ -0,0 +1,276 @@
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Integer, SmallInteger, func, select, text, update
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.types import TypeDecorator
+
+import fragmentos
+from database import db
+from eventos import (
+    registrar_evento, INSCRICAO_SORTEADA, INSCRICAO_CANCELADA, ATENDIMENTO_CONCLUIDO,
+    ATENDIMENTO_CONFIRMADO, ATENDIMENTO_CANCELADO_PACIENTE, ATENDIMENTO_CANCELADO_PROFISSIONAL,
+    ATENDIMENTO_NAO_CONFIRMADO,
+)
+
+AGUARDANDO_SORTEIO = "aguardando_sorteio"
+SORTEADO = "sorteado_em_atendimento"
+EM_ATENDIMENTO = "Em atendimento"
+FINALIZADO_PROFISSIONAL = "finalizado_profissional"
+FINALIZADO_CONFIRMADO = "finalizado_confirmado"
+FINALIZADO_NAO_CONFIRMADO = "finalizado_nao_confirmado"
+CANCELADO_PACIENTE = "cancelado_paciente"
+CANCELADO_PROFISSIONAL = "cancelado_profissional"
+INSCRICAO_EXPIRADA = "inscricao_expirada"
+# Status de versões anteriores: não são mais gravados, mas ainda aparecem em linhas antigas
+ATENDIMENTO_EXPIRADO_ANTIGO = "atendimento_expirado"
+ATENDIMENTO_CONCLUIDO_ANTIGO = "atendimento_concluido"
+CONCLUIDO_ANTIGO = "Concluído"
+EXPIRADO_ANTIGO = "Expirado"
+
+# Código gravado no banco para cada status. Só acrescente no fim: códigos gravados não mudam
+CODIGOS = {
+    AGUARDANDO_SORTEIO: 1,
+    SORTEADO: 2,
+    EM_ATENDIMENTO: 3,
+    FINALIZADO_PROFISSIONAL: 4,
+    FINALIZADO_CONFIRMADO: 5,
+    FINALIZADO_NAO_CONFIRMADO: 6,
+    CANCELADO_PACIENTE: 7,
+    CANCELADO_PROFISSIONAL: 8,
+    INSCRICAO_EXPIRADA: 9,
+    ATENDIMENTO_EXPIRADO_ANTIGO: 10,
+    ATENDIMENTO_CONCLUIDO_ANTIGO: 11,
+    CONCLUIDO_ANTIGO: 12,
+    EXPIRADO_ANTIGO: 13,
+}
+NOMES = {codigo: nome for nome, codigo in CODIGOS.items()}
+
+
+class StatusCodigo(TypeDecorator):
+    """Status gravado como inteiro pequeno; no Python (consultas, JSON, STATUS_LABELS) continua texto."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return CODIGOS[value]
+        except KeyError:
+            raise ValueError(f"Status desconhecido: {value!r}") from None
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            # Coluna ainda em texto (banco anterior ao `flask migrar-status`)
+            return NOMES.get(int(value), value) if value.isdigit() else value
+        return NOMES.get(value, str(value))
+
+
+# ------------------------
+# Transições permitidas
+# ------------------------
+# origens: status de onde a ação parte; campos(tabela, agora): colunas gravadas junto com o status
+Regra = namedtuple("Regra", "origens destino campos")
+
+ATIVOS = (EM_ATENDIMENTO, SORTEADO)
+
+# Política da fila, usada pelas rotas e pelo simulador (simulador.py)
+PRAZO_INSCRICAO = timedelta(days=int(os.getenv("INSCRICAO_PRAZO_DIAS", 30)))  # inscrição e renovação
+REENTRADA = ("cancelar_profissional",)  # cancelamentos de atendimento que devolvem o paciente à fila
+
+TRANSICOES = {
+    "sortear": {
+        "sorteio_atendimento": Regra((AGUARDANDO_SORTEIO,), SORTEADO,
+                                     lambda t, agora: {"data_sorteio": agora}),
+    },
+    "cancelar_inscricao": {
+        "sorteio_atendimento": Regra((AGUARDANDO_SORTEIO, INSCRICAO_EXPIRADA), CANCELADO_PACIENTE,
+                                     lambda t, agora: {"data_cancelamento_paciente": agora}),
+    },
+    "concluir": {
+        "atendimento": Regra(ATIVOS, FINALIZADO_PROFISSIONAL,
+                             lambda t, agora: {"data_fim": agora}),
+        "sorteio_atendimento": Regra((SORTEADO,), FINALIZADO_PROFISSIONAL,
+                                     lambda t, agora: {"data_finalizacao": agora}),
+    },
+    "confirmar": {
+        "atendimento": Regra((FINALIZADO_PROFISSIONAL,), FINALIZADO_CONFIRMADO,
+                             lambda t, agora: {"data_confirmacao": agora}),
+        "sorteio_atendimento": Regra((FINALIZADO_PROFISSIONAL,), FINALIZADO_CONFIRMADO,
+                                     lambda t, agora: {"data_finalizacao": func.coalesce(t.c.data_finalizacao, agora)}),
+    },
+    "cancelar_paciente": {
+        "atendimento": Regra(ATIVOS, CANCELADO_PACIENTE,
+                             lambda t, agora: {"data_fim": agora}),
+        "sorteio_atendimento": Regra((SORTEADO,), CANCELADO_PACIENTE,
+                                     lambda t, agora: {"data_cancelamento_paciente": agora}),
+    },
+    "cancelar_profissional": {
+        "atendimento": Regra(ATIVOS, CANCELADO_PROFISSIONAL,
+                             lambda t, agora: {"data_fim": agora}),
+        "sorteio_atendimento": Regra((SORTEADO,), CANCELADO_PROFISSIONAL,
+                                     lambda t, agora: {"data_cancelamento_profissional": agora}),
+    },
+    "expirar_confirmacao": {
+        "atendimento": Regra((FINALIZADO_PROFISSIONAL,), FINALIZADO_NAO_CONFIRMADO, None),
+    },
+}
+
+# Evento gravado no log a cada transição (mesma transação)
+EVENTOS = {
+    "sortear": INSCRICAO_SORTEADA,
+    "cancelar_inscricao": INSCRICAO_CANCELADA,
+    "concluir": ATENDIMENTO_CONCLUIDO,
+    "confirmar": ATENDIMENTO_CONFIRMADO,
+    "cancelar_paciente": ATENDIMENTO_CANCELADO_PACIENTE,
+    "cancelar_profissional": ATENDIMENTO_CANCELADO_PROFISSIONAL,
+    "expirar_confirmacao": ATENDIMENTO_NAO_CONFIRMADO,
+}
+
+
+class TransicaoInvalida(Exception):
+    def __init__(self, acao, status):
+        super().__init__(f"Ação '{acao}' não permitida no status '{status}'.")
+        self.acao = acao
+        self.status = status
+
+
+def _update(tabela, regra, agora, criterios, valores):
+    campos = regra.campos(tabela, agora) if regra.campos else {}
+    return (
+        update(tabela)
+        .where(*criterios, tabela.c.status.in_(regra.origens))
+        .values(status=regra.destino, versao=tabela.c.versao + 1, **campos, **valores)
+    )
+
+
+def _inscricao_legada(atendimento, origens):
+    # Atendimentos anteriores a atendimento.inscricao_id: mesma busca que os handlers faziam
+    t = db.metadata.tables["sorteio_atendimento"]
+    return db.session.execute(
+        select(t.c.id)
+        .where(
+            t.c.paciente_id == atendimento.paciente_id,
+            t.c.profissional_id == atendimento.profissional_id,
+            t.c.especialidade == atendimento.especialidade,
+            t.c.status.in_(origens),
+        )
+        .order_by(t.c.id.desc())
+        .limit(1)
+        .execution_options(fragmento=fragmentos.do_id(atendimento.id))  # legadas: no fragmento do atendimento
+    ).scalar()
+
+
+def _campos_evento(registro):
+    if registro.__table__.name == "sorteio_atendimento":
+        return {"inscricao_id": registro.id}
+    return {
+        "atendimento_id": registro.id,
+        "inscricao_id": registro.inscricao_id,
+        "paciente_id": registro.paciente_id,
+        "profissional_id": registro.profissional_id,
+        "especialidade": registro.especialidade,
+    }
+
+
+# ------------------------
+# Motor de transições
+# ------------------------
+def permitido(acao, registro):
+    return registro.status in TRANSICOES[acao][type(registro).__table__.name].origens
+
+
+def transicionar(acao, registro, agora=None, **valores):
+    """Aplica `acao` a `registro` (Atendimento ou SorteioAtendimento) e à inscrição pareada.
+
+    Um UPDATE por tabela, condicionado ao status de origem e, no registro principal, à versão
+    lida. Levanta TransicaoInvalida se o status atual não permite a ação e StaleDataError se outra
+    operação alterou o registro depois da leitura (409 em create_app). `valores` são colunas extras
+    do registro principal. O evento da ação vai para o log na mesma transação. Devolve o id da
+    inscrição pareada atualizada, se houver.
+    """
+    tabela = type(registro).__table__
+    regras = TRANSICOES[acao]
+    regra = regras[tabela.name]
+    if not permitido(acao, registro):
+        raise TransicaoInvalida(acao, registro.status)
+    agora = agora or datetime.utcnow()
+
+    par = regras.get("sorteio_atendimento") if tabela.name == "atendimento" else None
+    inscricao_id = None
+    if par:
+        inscricao_id = registro.inscricao_id or _inscricao_legada(registro, par.origens)
+    evento = _campos_evento(registro)
+
+    alteradas = db.session.execute(
+        _update(tabela, regra, agora, [tabela.c.id == registro.id, tabela.c.versao == registro.versao], valores)
+    ).rowcount
+    if alteradas != 1:
+        raise StaleDataError(f"{tabela.name} {registro.id} foi alterado por outra operação.")
+    db.session.expire(registro)
+
+    if inscricao_id:
+        inscricoes = db.metadata.tables["sorteio_atendimento"]
+        if not db.session.execute(_update(inscricoes, par, agora, [inscricoes.c.id == inscricao_id], {})).rowcount:
+            inscricao_id = None
+    if inscricao_id:
+        evento["inscricao_id"] = inscricao_id
+
+    registrar_evento(EVENTOS[acao], agora, **evento)
+    return inscricao_id
+
+
+def transicionar_em_lote(acao, modelo, *criterios, agora=None):
+    """Aplica `acao` a todas as linhas de `modelo` que atendem `criterios` (sem linha pareada)."""
+    tabela = modelo.__table__
+    regra = TRANSICOES[acao][tabela.name]
+    agora = agora or datetime.utcnow()
+    registros = db.session.execute(
+        select(modelo).where(*criterios, tabela.c.status.in_(regra.origens))
+    ).scalars().all()
+    if not registros:
+        return 0
+    eventos = [_campos_evento(r) for r in registros]
+    alteradas = sum(
+        db.session.execute(_update(tabela, regra, agora, [tabela.c.id.in_(ids)], {})).rowcount
+        for ids in fragmentos.agrupar_ids([r.id for r in registros]).values()
+    )
+    for evento in eventos:
+        registrar_evento(EVENTOS[acao], agora, **evento)
+    return alteradas
+
+
+# ------------------------
+# Conversão de bancos com status em texto
+# ------------------------
+@click.command("migrar-status")
+@with_appcontext
+def migrar_status_command():
+    """Converte status gravados como texto para os códigos inteiros."""
+    inspetor = sa_inspect(db.engine)
+    for nome in ("sorteio_atendimento", "atendimento", "sorteio_atendimento_arquivo", "atendimento_arquivo"):
+        if not inspetor.has_table(nome):
+            continue
+        tipo = next(c["type"] for c in inspetor.get_columns(nome) if c["name"] == "status")
+        if db.engine.dialect.name != "sqlite" and isinstance(tipo, Integer):
+            continue  # já convertida
+        total = 0
+        for status, codigo in CODIGOS.items():
+            # SQL textual: o tipo da coluna converteria o parâmetro de novo
+            total += db.session.execute(
+                text(f"UPDATE {nome} SET status = :codigo WHERE status = :status"),
+                {"codigo": str(codigo), "status": status},
+            ).rowcount
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute(text(
+                f"ALTER TABLE {nome} ALTER COLUMN status TYPE SMALLINT USING status::smallint"
+            ))
+        click.echo(f"{nome}: {total} linhas convertidas")
+    db.session.commit()
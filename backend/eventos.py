@@ -0,0 +1,48 @@
+from datetime import datetime
+
+from sqlalchemy import insert, literal, select
+
+import fragmentos
+from database import db
+
+# Tipos de evento do log (evento_dominio)
+INSCRICAO_CRIADA = "inscricao_criada"
+INSCRICAO_RENOVADA = "inscricao_renovada"
+INSCRICAO_SORTEADA = "inscricao_sorteada"
+INSCRICAO_CANCELADA = "inscricao_cancelada"
+ATENDIMENTO_CONCLUIDO = "atendimento_concluido"
+ATENDIMENTO_CONFIRMADO = "atendimento_confirmado"
+ATENDIMENTO_CANCELADO_PACIENTE = "atendimento_cancelado_paciente"
+ATENDIMENTO_CANCELADO_PROFISSIONAL = "atendimento_cancelado_profissional"
+ATENDIMENTO_NAO_CONFIRMADO = "atendimento_nao_confirmado"
+
+# Colunas que, faltando, são copiadas da inscrição no próprio INSERT
+COPIADAS_DA_INSCRICAO = ("paciente_id", "profissional_id", "especialidade", "estado", "municipio", "data_inscricao")
+
+
+def registrar_evento(tipo, agora=None, dados=None, **campos):
+    """Acrescenta um evento ao log na transação corrente (grava junto com a mudança de estado).
+
+    `campos` são colunas do evento (inscricao_id, atendimento_id, paciente_id, municipio...). Com
+    inscricao_id, o que faltar é lido da inscrição no mesmo comando (INSERT ... SELECT).
+    """
+    eventos = db.metadata.tables["evento_dominio"]
+    valores = {"tipo": tipo, "ocorrido_em": agora or datetime.utcnow(), "dados": dados, **campos}
+    faltando = [c for c in COPIADAS_DA_INSCRICAO if valores.get(c) is None]
+    # Com FRAGMENTOS, o evento fica no fragmento da inscrição/atendimento (mesma transação)
+    opcoes = {"fragmento": fragmentos.do_id(campos.get("inscricao_id") or campos.get("atendimento_id")) or 0}
+
+    if not campos.get("inscricao_id") or not faltando:
+        db.session.execute(insert(eventos).values(**valores), execution_options=opcoes)
+        return
+
+    inscricoes = db.metadata.tables["sorteio_atendimento"]
+    for c in faltando:
+        valores.pop(c, None)
+    consulta = (
+        select(*[literal(v, eventos.c[k].type) for k, v in valores.items()],
+               *[inscricoes.c[c] for c in faltando])
+        .where(inscricoes.c.id == campos["inscricao_id"])
+    )
+    if not db.session.execute(insert(eventos).from_select([*valores, *faltando], consulta), execution_options=opcoes).rowcount:
+        db.session.execute(insert(eventos).values(**valores), execution_options=opcoes)  # inscrição já arquivada
@@ -0,0 +1,298 @@
+import csv
+import io
+import json
+import os
+import shutil
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask import Response, jsonify, request, stream_with_context
+from flask.cli import with_appcontext
+from sqlalchemy import Boolean, DateTime, Float, Integer, or_, select
+
+import fragmentos
+from database import db
+from estados import CODIGOS, StatusCodigo
+from models import (
+    User, SorteioAtendimento, Atendimento, SorteioAtendimentoArquivo, AtendimentoArquivo, usuarios_completos,
+)
+
+LINHAS_POR_LOTE = 1000
+BYTES_POR_PEDACO = 64 * 1024
+
+# model da URL -> (tabelas lidas em sequência, coluna de data do filtro de período)
+EXPORTAVEIS = {
+    "atendimentos": ((Atendimento, AtendimentoArquivo), "data_inicio"),
+    "sorteios": ((SorteioAtendimento, SorteioAtendimentoArquivo), "data_inscricao"),
+}
+
+
+def _data(valor):
+    if not valor:
+        return None
+    return datetime.fromisoformat(valor)
+
+
+def _consulta(modelo, colunas, coluna_data, de, ate, status, uf):
+    tabela = modelo.__table__
+    consulta = select(*[tabela.c[c] for c in colunas])
+    if de:
+        consulta = consulta.where(tabela.c[coluna_data] >= de)
+    if ate:
+        consulta = consulta.where(tabela.c[coluna_data] < ate)
+    if status:
+        consulta = consulta.where(tabela.c.status.in_(status))
+    if uf:
+        if "estado" in tabela.c:
+            consulta = consulta.where(tabela.c.estado == uf)
+        else:
+            # Atendimento não guarda UF: usa a do profissional
+            consulta = consulta.join(User, User.id == tabela.c.profissional_id).where(User.estado == uf)
+    return consulta.order_by(tabela.c.id).execution_options(stream_results=True, yield_per=LINHAS_POR_LOTE)
+
+
+def _linhas(modelos, colunas, coluna_data, de, ate, status, uf):
+    for modelo in modelos:
+        consulta = _consulta(modelo, colunas, coluna_data, de, ate, status, uf)
+        # Fragmentos em ordem: os ids de cada um vêm depois dos do anterior
+        for fragmento in fragmentos.todos():
+            resultado = db.session.execute(consulta.execution_options(fragmento=fragmento))
+            for lote in resultado.partitions():
+                yield from lote
+
+
+def _valor(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def _gerar_csv(colunas, linhas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(colunas)
+    for linha in linhas:
+        escritor.writerow([_valor(v) for v in linha])
+        if buffer.tell() >= BYTES_POR_PEDACO:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _gerar_ndjson(colunas, linhas):
+    pedaco = []
+    tamanho = 0
+    for linha in linhas:
+        texto = json.dumps(dict(zip(colunas, map(_valor, linha))), ensure_ascii=False)
+        pedaco.append(texto)
+        tamanho += len(texto) + 1
+        if tamanho >= BYTES_POR_PEDACO:
+            yield "\n".join(pedaco) + "\n"
+            pedaco, tamanho = [], 0
+    if pedaco:
+        yield "\n".join(pedaco) + "\n"
+
+
+def resposta_exportacao(model):
+    if model.lower() not in EXPORTAVEIS:
+        return jsonify({"message": f"Model '{model}' não encontrado"}), 404
+    modelos, coluna_data = EXPORTAVEIS[model.lower()]
+
+    formato = request.args.get("formato", "csv").lower()
+    if formato not in ("csv", "ndjson"):
+        return jsonify({"message": "Formato inválido. Use csv ou ndjson."}), 400
+    try:
+        de, ate = _data(request.args.get("de")), _data(request.args.get("ate"))
+    except ValueError:
+        return jsonify({"message": "Datas devem estar no formato AAAA-MM-DD."}), 400
+    status = [s for s in request.args.get("status", "").split(",") if s]
+    desconhecidos = [s for s in status if s not in CODIGOS]
+    if desconhecidos:
+        return jsonify({"message": f"Status desconhecido: {', '.join(desconhecidos)}"}), 400
+    uf = (request.args.get("uf") or "").upper() or None
+    if request.args.get("incluir_arquivo", "1") == "0":
+        modelos = modelos[:1]
+
+    # Colunas da tabela viva; o arquivo tem as mesmas (mais "arquivado_em", não exportada)
+    colunas = [c.name for c in modelos[0].__table__.columns]
+    linhas = _linhas(modelos, colunas, coluna_data, de, ate, status, uf)
+    if formato == "csv":
+        corpo, mimetype = _gerar_csv(colunas, linhas), "text/csv"
+    else:
+        corpo, mimetype = _gerar_ndjson(colunas, linhas), "application/x-ndjson"
+
+    nome = f"{model.lower()}_{datetime.utcnow():%Y%m%d%H%M%S}.{formato}"
+    return Response(
+        stream_with_context(corpo),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={nome}"},
+    )
+
+
+# ------------------------
+# Exportação analítica: arquivos colunares incrementais (flask exportar-analitico)
+# ------------------------
+# Cada execução acrescenta, em PASTA/<tabela>/mes=AAAA-MM/uf=XX/, as linhas alteradas desde a
+# marca anterior (atualizado_em), em Parquet ou Arrow IPC: ferramentas de análise (DuckDB,
+# pandas, Spark) leem o histórico sem tocar no banco de produção. Uma linha alterada aparece de
+# novo numa parte mais nova; a versão vigente é a de maior atualizado_em (a mesma versão pode
+# aparecer mais de uma vez, ver JANELA_ANALITICA: descarte repetidas por id e atualizado_em). O mês é o da inscrição,
+# do início do atendimento ou do cadastro; a UF do atendimento é a do profissional. Linhas
+# apagadas do banco continuam no histórico (o arquivamento não apaga: as tabelas de arquivo
+# também são lidas).
+PASTA_ANALITICA = os.getenv("ANALITICO_PASTA", os.path.join(os.path.dirname(__file__), "instance", "analitico"))
+# atualizado_em é gravado antes do commit: uma transação que confirma depois da execução tem
+# linhas com atualizado_em anterior à marca. Por isso cada execução relê também o que mudou nessa
+# janela antes da marca (essas linhas saem repetidas). Só se perdem alterações cuja transação
+# levou mais que isso para confirmar; --refazer reconstrói tudo
+JANELA_ANALITICA = timedelta(seconds=int(os.getenv("ANALITICO_JANELA_SEGUNDOS", 3600)))
+ARQUIVO_MARCAS = "_marcas.json"
+FORMATOS = {"parquet": "parquet", "arrow": "arrow"}  # formato -> extensão (arrow: Arrow IPC)
+LINHAS_EM_MEMORIA = int(os.getenv("ANALITICO_LINHAS_EM_MEMORIA", 200_000))
+NULO_HIVE = "__HIVE_DEFAULT_PARTITION__"  # partição de mês/UF vazios, como no Hive
+SEM_EXPORTAR = {"senha_hash", "cpf"}  # não saem do banco de produção
+
+# pyarrow é dependência opcional e pesada: carregado só quando a exportação analítica roda, não
+# na importação (o app importa este módulo para a exportação CSV e para registrar o comando)
+pa = pq = None
+
+# tabela -> (fontes lidas em sequência, coluna do mês, coluna da UF ou None = UF do profissional)
+ANALITICAS = {
+    "user": ((usuarios_completos,), "criado_em", "estado"),
+    "sorteio_atendimento": ((SorteioAtendimento, SorteioAtendimentoArquivo), "data_inscricao", "estado"),
+    "atendimento": ((Atendimento, AtendimentoArquivo), "data_inicio", None),
+}
+
+
+def _carregar_pyarrow():
+    global pa, pq
+    if pa is None:
+        import pyarrow
+        import pyarrow.parquet
+        pa, pq = pyarrow, pyarrow.parquet
+
+
+def _tipo_arrow(tipo):
+    if isinstance(tipo, StatusCodigo):
+        return pa.string()  # exportado pelo nome, como no CSV
+    if isinstance(tipo, DateTime):
+        return pa.timestamp("us")
+    if isinstance(tipo, Boolean):
+        return pa.bool_()
+    if isinstance(tipo, Integer):
+        return pa.int64()
+    if isinstance(tipo, Float):
+        return pa.float64()
+    return pa.string()
+
+
+def _consultas_analiticas(nome, marca, corte):
+    fontes, coluna_mes, coluna_uf = ANALITICAS[nome]
+    nomes = [c.name for c in getattr(fontes[0], "__table__", fontes[0]).c if c.name not in SEM_EXPORTAR]
+    for fonte in fontes:
+        tabela = getattr(fonte, "__table__", fonte)
+        alterado = tabela.c.atualizado_em
+        uf = tabela.c[coluna_uf] if coluna_uf else User.estado
+        consulta = select(*[tabela.c[n] for n in nomes], tabela.c[coluna_mes].label("mes"), uf.label("uf"))
+        if coluna_uf is None:
+            consulta = consulta.outerjoin(User, User.id == tabela.c.profissional_id)
+        if marca:
+            consulta = consulta.where(alterado > marca - JANELA_ANALITICA, alterado <= corte)
+        else:  # primeira exportação: também as linhas anteriores à coluna atualizado_em
+            consulta = consulta.where(or_(alterado.is_(None), alterado <= corte))
+        consulta = consulta.execution_options(yield_per=LINHAS_POR_LOTE)
+        for fragmento in fragmentos.todos() if tabela.name in fragmentos.TABELAS else [None]:
+            yield consulta.execution_options(fragmento=fragmento)
+
+
+def _gravar_parte(pasta, chave, esquema, linhas, formato, nome_parte):
+    mes, uf = chave
+    destino = os.path.join(pasta, f"mes={mes or NULO_HIVE}", f"uf={uf or NULO_HIVE}")
+    os.makedirs(destino, exist_ok=True)
+    tabela = pa.Table.from_arrays(
+        [pa.array(coluna, type=campo.type) for coluna, campo in zip(zip(*linhas), esquema)], schema=esquema
+    )
+    # Nome com "." até terminar: leitores ignoram arquivos ocultos, não veem parte pela metade
+    caminho = os.path.join(destino, f"{nome_parte}.{FORMATOS[formato]}")
+    temporario = os.path.join(destino, f".{nome_parte}")
+    if formato == "parquet":
+        pq.write_table(tabela, temporario)
+    else:
+        with pa.OSFile(temporario, "wb") as arquivo, pa.ipc.new_file(arquivo, esquema) as escritor:
+            escritor.write_table(tabela)
+    os.replace(temporario, caminho)
+
+
+def exportar_analitico(nome, pasta, formato, marca, corte):
+    """Acrescenta as linhas de `nome` alteradas em (marca - JANELA_ANALITICA, corte]. Devolve quantas."""
+    _carregar_pyarrow()
+    fontes = ANALITICAS[nome][0]
+    tabela = getattr(fontes[0], "__table__", fontes[0])
+    esquema = pa.schema([(c.name, _tipo_arrow(c.type)) for c in tabela.c if c.name not in SEM_EXPORTAR])
+    pasta = os.path.join(pasta, nome)
+    # Linhas agrupadas por (mês, UF) na memória; acima do limite, as maiores partições viram arquivo
+    pendentes = defaultdict(list)
+    em_memoria = total = partes = 0
+
+    def descarregar(chave):
+        nonlocal em_memoria, partes
+        linhas = pendentes.pop(chave)
+        _gravar_parte(pasta, chave, esquema, linhas, formato, f"parte-{corte:%Y%m%dT%H%M%S}-{partes}")
+        em_memoria -= len(linhas)
+        partes += 1
+
+    for consulta in _consultas_analiticas(nome, marca, corte):
+        for lote in db.session.execute(consulta).partitions():
+            for *valores, mes, uf in lote:
+                pendentes[(mes.strftime("%Y-%m") if mes else None, uf)].append(valores)
+            em_memoria += len(lote)
+            total += len(lote)
+            while em_memoria > LINHAS_EM_MEMORIA:
+                descarregar(max(pendentes, key=lambda k: len(pendentes[k])))
+    for chave in list(pendentes):
+        descarregar(chave)
+    return total
+
+
+def _ler_marcas(pasta):
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MARCAS), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _gravar_marcas(pasta, marcas):
+    caminho = os.path.join(pasta, ARQUIVO_MARCAS)
+    with open(f"{caminho}.tmp", "w", encoding="utf-8") as f:
+        json.dump(marcas, f, indent=2)
+    os.replace(f"{caminho}.tmp", caminho)
+
+
+@click.command("exportar-analitico")
+@click.option("--pasta", default=PASTA_ANALITICA, show_default=True, type=click.Path(file_okay=False))
+@click.option("--formato", type=click.Choice(list(FORMATOS)), default="parquet", show_default=True)
+@click.option("--tabela", "tabelas", multiple=True, type=click.Choice(list(ANALITICAS)),
+              help="Só estas tabelas (repita a opção); padrão: todas.")
+@click.option("--refazer", is_flag=True, help="Apaga a exportação da tabela e exporta tudo de novo.")
+@with_appcontext
+def exportar_analitico_command(pasta, formato, tabelas, refazer):
+    """Exporta as linhas alteradas desde a última execução para arquivos colunares."""
+    try:
+        _carregar_pyarrow()
+    except ImportError:
+        raise click.ClickException("A exportação analítica precisa do pyarrow: pip install pyarrow") from None
+    os.makedirs(pasta, exist_ok=True)
+    marcas = _ler_marcas(pasta)
+    corte = datetime.utcnow()
+    for nome in tabelas or ANALITICAS:
+        anterior = marcas.get(nome)
+        if refazer or (anterior and anterior["formato"] != formato):
+            shutil.rmtree(os.path.join(pasta, nome), ignore_errors=True)
+            anterior = None
+        marca = datetime.fromisoformat(anterior["ate"]) if anterior else None
+        total = exportar_analitico(nome, pasta, formato, marca, corte)
+        # A marca só avança depois dos arquivos gravados: se cair no meio, as linhas saem de novo
+        marcas[nome] = {"ate": corte.isoformat(), "formato": formato}
+        _gravar_marcas(pasta, marcas)
+        click.echo(f"{nome}: {total} linhas exportadas")
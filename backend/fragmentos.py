@@ -0,0 +1,312 @@
+import os
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Column, Index, MetaData, Table, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList, Label
+from sqlalchemy.sql.functions import FunctionElement
+
+# Fragmentação das filas por UF (opcional, só SQLite). Com FRAGMENTOS=uf (um arquivo por UF) ou
+# FRAGMENTOS=regiao (um por região), inscrições, atendimentos, seus arquivos e o log de eventos
+# de cada UF vão para fila_<nome>.sqlite3: gravações em UFs diferentes não disputam o mesmo
+# arquivo. Usuários, projeções e o resto ficam no banco principal, anexado (ATTACH, só leitura
+# na prática) em cada fragmento para os joins com user.
+#
+# Fragmento 0 é o banco principal: linhas criadas antes de ligar a fragmentação ficam lá e
+# continuam sendo achadas. Cada fragmento k gera ids a partir de k * BLOCO, então o id diz onde
+# a linha está; o atendimento fica no fragmento da inscrição que o originou.
+#
+# Roteamento (SessaoFragmentada + _rotear):
+#   - gravações de objetos (flush): pelo id, pela UF da inscrição ou pela inscrição do atendimento
+#   - consultas: por `id`/`inscricao_id` (== ou IN) e `estado` (==) no WHERE; sem isso, em todos
+#     os fragmentos, juntando as linhas. Ordenação, agrupamento e agregados não podem ser juntados
+#     assim (ConsultaEntreFragmentos): quem precisa disso consulta cada fragmento com
+#     .execution_options(fragmento=i) e junta o resultado (históricos, ranking, lembretes).
+MODO = os.getenv("FRAGMENTOS", "").lower()
+URL = os.getenv("FRAGMENTOS_URL")  # padrão: fila_{nome}.sqlite3 na pasta do banco principal
+BLOCO = 10 ** 12
+
+REGIOES = {
+    "norte": ("AC", "AM", "AP", "PA", "RO", "RR", "TO"),
+    "nordeste": ("AL", "BA", "CE", "MA", "PB", "PE", "PI", "RN", "SE"),
+    "centro_oeste": ("DF", "GO", "MS", "MT"),
+    "sudeste": ("ES", "MG", "RJ", "SP"),
+    "sul": ("PR", "RS", "SC"),
+}
+UFS = sorted(uf for ufs in REGIOES.values() for uf in ufs)
+
+if MODO == "uf":
+    NOMES = [uf.lower() for uf in UFS]
+    _INDICE_UF = {uf: i + 1 for i, uf in enumerate(UFS)}
+elif MODO == "regiao":
+    NOMES = list(REGIOES)
+    _INDICE_UF = {uf: i + 1 for i, ufs in enumerate(REGIOES.values()) for uf in ufs}
+else:
+    if MODO:
+        print(f"[ERRO] FRAGMENTOS={MODO!r} inválido (use uf ou regiao); fragmentação desligada")
+    NOMES = []
+    _INDICE_UF = {}
+ATIVO = bool(NOMES)
+
+# Tabelas que vivem nos fragmentos; colunas que dizem o fragmento da linha
+TABELAS = ("sorteio_atendimento", "atendimento", "sorteio_atendimento_arquivo", "atendimento_arquivo",
+           "evento_dominio")
+COLUNAS_ID = ("id", "inscricao_id")
+COM_ESTADO = ("sorteio_atendimento", "sorteio_atendimento_arquivo")
+AGREGADOS = {"count", "max", "min", "sum", "avg", "total", "group_concat"}
+
+_legado = None  # o banco principal ainda tem inscrições/atendimentos?
+
+
+class ConsultaEntreFragmentos(RuntimeError):
+    """Consulta ordenada, agrupada ou com agregados que precisaria de mais de um fragmento."""
+
+
+def binds(url_principal):
+    """SQLALCHEMY_BINDS dos fragmentos (vazio com a fragmentação desligada)."""
+    modelo = URL
+    if not modelo:
+        pasta = os.path.dirname(make_url(url_principal).database or "")
+        modelo = f"sqlite:///{os.path.join(pasta, 'fila_{nome}.sqlite3')}"
+    return {f"fila_{nome}": modelo.format(nome=nome) for nome in NOMES}
+
+
+def do_id(id_):
+    """Fragmento onde está a linha de id `id_` (None com a fragmentação desligada)."""
+    if not ATIVO or id_ is None:
+        return None
+    return int(id_) // BLOCO
+
+
+def da_uf(uf):
+    """Fragmento que recebe as inscrições novas da UF; UF desconhecida fica no principal."""
+    if not ATIVO:
+        return None
+    return _INDICE_UF.get((uf or "").upper(), 0)
+
+
+def todos():
+    """Fragmentos para consultar um a um: [None] (o banco de sempre) com a fragmentação desligada."""
+    return list(range(len(NOMES) + 1)) if ATIVO else [None]
+
+
+def agrupar_ids(ids):
+    """{fragmento: [ids]} para gravações em lote por id."""
+    grupos = {}
+    for id_ in ids:
+        grupos.setdefault(do_id(id_), []).append(id_)
+    return grupos
+
+
+def _motor(db, indice):
+    return db.engines[None] if indice == 0 else db.engines[f"fila_{NOMES[indice - 1]}"]
+
+
+# ------------------------
+# Gravação de objetos: cada linha na conexão do seu fragmento
+# ------------------------
+def _indice_do_registro(registro):
+    tabela = type(registro).__table__.name
+    if tabela not in TABELAS:
+        return None
+    if registro.id is not None:
+        return do_id(registro.id)
+    if tabela == "sorteio_atendimento":
+        return da_uf(registro.estado)
+    if tabela == "atendimento" and registro.inscricao_id is not None:
+        return do_id(registro.inscricao_id)
+    return 0
+
+
+class SessaoFragmentada(Session):
+    # connection_callable só durante o flush: com ele definido, insert(Modelo) em lote (importação,
+    # barramento de invalidação) recusa rodar
+    def flush(self, objects=None):
+        if not ATIVO:
+            return super().flush(objects)
+        self.connection_callable = self._conexao_do_registro
+        try:
+            super().flush(objects)
+        finally:
+            self.connection_callable = None
+
+    def _conexao_do_registro(self, mapper=None, instance=None, **kw):
+        indice = _indice_do_registro(instance) if instance is not None else None
+        if indice is None:
+            return self.connection(bind_arguments={"mapper": mapper})
+        return self.connection(bind_arguments={"bind": _motor(self._db, indice)})
+
+
+# ------------------------
+# Consultas
+# ------------------------
+def _tabelas_da_fila(statement):
+    return {t.name for t in visitors.iterate(statement) if isinstance(t, Table) and t.name in TABELAS}
+
+
+def _criterios(statement):
+    if getattr(statement, "select", None) is not None:  # INSERT ... SELECT
+        statement = statement.select
+    pilha = [getattr(statement, "whereclause", None)]
+    while pilha:
+        criterio = pilha.pop()
+        if isinstance(criterio, BooleanClauseList) and criterio.operator is operators.and_:
+            pilha.extend(criterio.clauses)
+        elif isinstance(criterio, BinaryExpression):
+            yield criterio
+
+
+def _valor(lado, parametros):
+    if not isinstance(lado, BindParameter):
+        return None
+    if parametros and lado.key in parametros:
+        return parametros[lado.key]
+    return lado.effective_value
+
+
+def _indices_da_consulta(estado):
+    escolhidos = None
+    parametros = estado.parameters if isinstance(estado.parameters, dict) else None
+    for criterio in _criterios(estado.statement):
+        coluna = criterio.left
+        tabela = getattr(getattr(coluna, "table", None), "name", None)
+        if tabela not in TABELAS or criterio.operator not in (operators.eq, operators.in_op):
+            continue
+        valor = _valor(criterio.right, parametros)
+        if valor is None:
+            continue
+        valores = valor if criterio.operator is operators.in_op else [valor]
+        if coluna.name in COLUNAS_ID:
+            indices = {do_id(v) for v in valores}
+        elif coluna.name == "estado" and tabela in COM_ESTADO:
+            indices = {da_uf(v) for v in valores}
+            if _tem_legado(estado.session._db):
+                indices.add(0)
+        else:
+            continue
+        escolhidos = indices if escolhidos is None else (escolhidos & indices) or escolhidos
+    return sorted(escolhidos) if escolhidos is not None else todos()
+
+
+def _precisa_juntar(statement):
+    if getattr(statement, "_order_by_clauses", None) or getattr(statement, "_group_by_clauses", None):
+        return True
+    for coluna in getattr(statement, "selected_columns", ()):
+        if isinstance(coluna, Label):
+            coluna = coluna.element
+        if isinstance(coluna, FunctionElement) and coluna.name in AGREGADOS:
+            return True
+    return False
+
+
+def _tem_legado(db):
+    global _legado
+    if _legado is None:
+        with db.engines[None].connect() as conexao:
+            _legado = any(
+                conexao.execute(text(f"SELECT EXISTS (SELECT 1 FROM {nome})")).scalar()
+                for nome in ("sorteio_atendimento", "atendimento")
+                if conexao.dialect.has_table(conexao, nome)
+            )
+    return _legado
+
+
+@event.listens_for(SessaoFragmentada, "do_orm_execute")
+def _rotear(estado):
+    if not ATIVO or "bind" in estado.bind_arguments:
+        return None
+    if estado.execution_options.get("fragmento") is not None:
+        indices = [estado.execution_options["fragmento"]]
+    elif _tabelas_da_fila(estado.statement):
+        indices = _indices_da_consulta(estado)
+    else:
+        return None
+
+    if len(indices) > 1 and (not estado.is_select or _precisa_juntar(estado.statement)):
+        raise ConsultaEntreFragmentos(
+            f"{estado.statement} precisa de {len(indices)} fragmentos: consulte cada um com "
+            f".execution_options(fragmento=i) e junte o resultado"
+        )
+    resultados = [
+        estado.invoke_statement(bind_arguments={**estado.bind_arguments, "bind": _motor(estado.session._db, i)})
+        for i in indices
+    ]
+    return resultados[0].merge(*resultados[1:]) if len(resultados) > 1 else resultados[0]
+
+
+# ------------------------
+# Criação das tabelas nos fragmentos
+# ------------------------
+def _copia(tabela, metadata):
+    # Mesmas colunas e índices, sem FKs (user fica no principal) e com AUTOINCREMENT para a
+    # sequência começar no bloco do fragmento
+    copia = Table(
+        tabela.name, metadata,
+        *[Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, index=c.index, unique=c.unique)
+          for c in tabela.columns],
+        sqlite_autoincrement=True,
+    )
+    for indice in tabela.indexes:
+        if indice.name and not indice.name.startswith(f"ix_{tabela.name}_"):
+            Index(indice.name, *[copia.c[c.name] for c in indice.columns])
+    return copia
+
+
+def criar_tabelas(db):
+    metadata = MetaData()
+    copias = [_copia(db.metadata.tables[nome], metadata) for nome in TABELAS]
+    for indice in range(1, len(NOMES) + 1):
+        with _motor(db, indice).begin() as conexao:
+            metadata.create_all(conexao)
+            for copia in copias:
+                conexao.execute(
+                    text("INSERT INTO sqlite_sequence (name, seq) SELECT :nome, :inicio "
+                         "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :nome)"),
+                    {"nome": copia.name, "inicio": indice * BLOCO},
+                )
+
+
+def apagar_tabelas(db):
+    metadata = MetaData()
+    for nome in TABELAS:
+        _copia(db.metadata.tables[nome], metadata)
+    for indice in range(1, len(NOMES) + 1):
+        with _motor(db, indice).begin() as conexao:
+            metadata.drop_all(conexao)
+
+
+# create_all/drop_all do principal (criar-tabelas, seed) fazem o mesmo nos fragmentos
+def _apos_criar(target, connection, **kw):
+    from database import db
+    criar_tabelas(db)
+
+
+def _apos_apagar(target, connection, **kw):
+    global _legado
+    from database import db
+    apagar_tabelas(db)
+    _legado = None
+
+
+def registrar_fragmentos(app):
+    """Prepara os motores dos fragmentos (depois de db.init_app)."""
+    if not ATIVO:
+        return
+    from database import db
+
+    with app.app_context():
+        principal = db.engines[None]
+        if principal.dialect.name != "sqlite" or principal.url.database in (None, "", ":memory:"):
+            raise RuntimeError("FRAGMENTOS exige o banco principal num arquivo SQLite")
+        caminho = principal.url.database
+
+        def anexar_principal(conexao_dbapi, registro):
+            conexao_dbapi.execute("ATTACH DATABASE ? AS principal", (caminho,))
+
+        for nome in NOMES:
+            event.listen(db.engines[f"fila_{nome}"], "connect", anexar_principal)
+
+    if not event.contains(db.metadata, "after_create", _apos_criar):
+        event.listen(db.metadata, "after_create", _apos_criar)
+        event.listen(db.metadata, "after_drop", _apos_apagar)
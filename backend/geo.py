@@ -0,0 +1,172 @@
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import fragmentos
+from database import db
+from models import Profissional, SorteioAtendimento
+from estados import AGUARDANDO_SORTEIO
+
+RAIO_TERRA_KM = 6371.0
+KM_POR_GRAU = 111.32
+
+# Células de ~11 km: um raio típico (até algumas dezenas de km) cobre poucas células
+TAMANHO_CELULA_GRAUS = float(os.getenv("GEO_CELULA_GRAUS", 0.1))
+# A cada RELEITURA_SEGUNDOS, a atualização relê também as inscrições alteradas na janela antes
+# da leitura anterior: uma transação que confirma depois da leitura (com atualizado_em já no
+# passado) entra aí
+JANELA_RELEITURA = timedelta(seconds=int(os.getenv("GEO_JANELA_SEGUNDOS", 300)))
+RELEITURA_SEGUNDOS = float(os.getenv("GEO_RELEITURA_SEGUNDOS", 30))
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(math.sqrt(a))
+
+
+def caixa_envolvente(lat, lon, raio_km):
+    dlat = raio_km / KM_POR_GRAU
+    dlon = raio_km / (KM_POR_GRAU * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+
+def raio_sorteio_km(valor=None):
+    """Raio do modo de proximidade: parâmetro da requisição ou SORTEIO_RAIO_KM; 0 desativa."""
+    maximo = float(os.getenv("SORTEIO_RAIO_MAX_KM", 100))
+    try:
+        raio = float(valor if valor not in (None, "") else os.getenv("SORTEIO_RAIO_KM", 0))
+    except ValueError:
+        return 0.0
+    return max(0.0, min(raio, maximo))
+
+
+class IndiceEspacial:
+    """Buckets de grade (especialidade, célula) com as inscrições aguardando sorteio.
+
+    O índice cresce por atualizado_em: inscrições novas ou renovadas (inclusive por outros
+    workers) entram na próxima busca, relendo JANELA_RELEITURA para trás; as que saíram da fila
+    são descartadas quando a confirmação no banco não as encontra mais aguardando.
+    """
+
+    def __init__(self, tamanho_celula=TAMANHO_CELULA_GRAUS):
+        self.tamanho_celula = tamanho_celula
+        self._celulas = defaultdict(dict)   # (especialidade, i, j) -> {id: (lat, lon)}
+        self._chaves = {}                    # id -> (especialidade, i, j)
+        self._lidas_ate = {}                 # fragmento -> início da última leitura (ver fragmentos.py)
+        self._relida_em = {}                 # fragmento -> time.monotonic() da última releitura
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._chaves)
+
+    def _celula(self, lat, lon):
+        return math.floor(lat / self.tamanho_celula), math.floor(lon / self.tamanho_celula)
+
+    def adicionar(self, inscricao_id, especialidade, lat, lon):
+        chave = (especialidade, *self._celula(lat, lon))
+        self._celulas[chave][inscricao_id] = (lat, lon)
+        self._chaves[inscricao_id] = chave
+
+    def remover(self, inscricao_id):
+        chave = self._chaves.pop(inscricao_id, None)
+        if chave is not None:
+            celula = self._celulas[chave]
+            celula.pop(inscricao_id, None)
+            if not celula:
+                del self._celulas[chave]
+
+    def atualizar(self):
+        """Carrega as inscrições aguardando sorteio alteradas desde a última leitura (com folga)."""
+        for fragmento in fragmentos.todos():
+            self._atualizar(fragmento)
+
+    def _atualizar(self, fragmento):
+        inicio = datetime.utcnow()
+        anterior = self._lidas_ate.get(fragmento)
+        consulta = (
+            db.session.query(
+                SorteioAtendimento.id,
+                SorteioAtendimento.especialidade,
+                SorteioAtendimento.latitude,
+                SorteioAtendimento.longitude,
+            )
+            .filter(
+                SorteioAtendimento.status == AGUARDANDO_SORTEIO,
+                SorteioAtendimento.latitude != None,
+                SorteioAtendimento.longitude != None,
+            )
+            .execution_options(fragmento=fragmento)
+        )
+        reler = time.monotonic() - self._relida_em.get(fragmento, 0) >= RELEITURA_SEGUNDOS
+        if anterior is not None:  # primeira leitura: todas, inclusive sem atualizado_em
+            consulta = consulta.filter(
+                SorteioAtendimento.atualizado_em > (anterior - JANELA_RELEITURA if reler else anterior)
+            )
+        novas = consulta.all()
+        with self._lock:
+            for inscricao_id, especialidade, lat, lon in novas:
+                self.adicionar(inscricao_id, especialidade, lat, lon)
+            self._lidas_ate[fragmento] = max(inicio, anterior or inicio)
+            if reler or anterior is None:
+                self._relida_em[fragmento] = time.monotonic()
+
+    def buscar(self, especialidade, lat, lon, raio_km):
+        """Ids das inscrições da especialidade a até raio_km de (lat, lon)."""
+        lat_min, lat_max, lon_min, lon_max = caixa_envolvente(lat, lon, raio_km)
+        i_min, j_min = self._celula(lat_min, lon_min)
+        i_max, j_max = self._celula(lat_max, lon_max)
+        encontrados = []
+        with self._lock:
+            for i in range(i_min, i_max + 1):
+                for j in range(j_min, j_max + 1):
+                    celula = self._celulas.get((especialidade, i, j))
+                    if not celula:
+                        continue
+                    for inscricao_id, (lat_i, lon_i) in celula.items():
+                        if distancia_km(lat, lon, lat_i, lon_i) <= raio_km:
+                            encontrados.append(inscricao_id)
+        return encontrados
+
+    def descartar(self, ids):
+        with self._lock:
+            for inscricao_id in ids:
+                self.remover(inscricao_id)
+
+
+_indice = IndiceEspacial()
+
+
+def inscricoes_no_raio(especialidade, lat, lon, raio_km, agora):
+    """Inscrições elegíveis (aguardando e não expiradas) a até raio_km do ponto."""
+    _indice.atualizar()
+    ids = _indice.buscar(especialidade, lat, lon, raio_km)
+    if not ids:
+        return []
+
+    inscricoes = SorteioAtendimento.query.filter(SorteioAtendimento.id.in_(ids)).all()
+    # Expiradas continuam no índice (podem ser renovadas); as que saíram da fila não voltam
+    _indice.descartar(s.id for s in inscricoes if s.status != AGUARDANDO_SORTEIO)
+    return [
+        s for s in inscricoes
+        if s.status == AGUARDANDO_SORTEIO and (s.data_expiracao is None or s.data_expiracao > agora)
+    ]
+
+
+def existe_profissional_no_raio(especialidade, lat, lon, raio_km):
+    lat_min, lat_max, lon_min, lon_max = caixa_envolvente(lat, lon, raio_km)
+    profissionais = (
+        db.session.query(Profissional.latitude, Profissional.longitude)
+        .filter(
+            Profissional.especialidade == especialidade,
+            Profissional.latitude.between(lat_min, lat_max),
+            Profissional.longitude.between(lon_min, lon_max),
+        )
+        .all()
+    )
+    return any(distancia_km(lat, lon, p_lat, p_lon) <= raio_km for p_lat, p_lon in profissionais)
@@ -0,0 +1,50 @@
+import multiprocessing
+import os
+
+# Uso (na pasta backend): gunicorn -c gunicorn.conf.py wsgi:app
+# Tudo pode ser sobrescrito por variável de ambiente ou na linha de comando do gunicorn.
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}"
+
+# Processos para CPU, threads para esperar banco, ViaCEP e SMTP sem segurar o processo inteiro
+workers = int(os.getenv("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("WEB_THREADS", 4))
+worker_class = "gthread" if threads > 1 else "sync"
+
+# Com mais de um worker, as cópias em memória (invalidacao.py) precisam avisar as dos outros
+# workers; no PostgreSQL prefira INVALIDACAO_BACKEND=postgres
+if workers > 1:
+    os.environ.setdefault("INVALIDACAO_BACKEND", "banco")
+
+# Importa o app uma vez no mestre: os workers nascem do fork já com tudo carregado (partida
+# mais rápida e páginas de memória compartilhadas). Com preload, `kill -HUP` só recria os
+# workers a partir do código já carregado. Para subir código novo sem derrubar conexões:
+#   kill -USR2 <pid do mestre>   # sobe um mestre novo com o código novo, ao lado do antigo
+#   kill -WINCH <pid antigo>     # o antigo encerra os workers depois das requisições em curso
+#   kill -QUIT <pid antigo>
+# Ou rode com PRELOAD=0, em que o HUP recarrega o código também.
+preload_app = os.getenv("PRELOAD", "1") == "1"
+
+# Reciclagem gradual dos workers (vazamentos de memória) e prazo para terminar requisições
+# em andamento no reload/desligamento
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+keepalive = 5
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-") or None  # vazio desliga
+
+
+def post_fork(server, worker):
+    # Conexões abertas no mestre (create_all, CRIAR_TABELAS) não podem ser usadas por dois
+    # processos: cada worker começa com um pool vazio. close=False não fecha as do mestre.
+    from wsgi import app
+    from database import db
+    with app.app_context():
+        for engine in db.engines.values():  # principal e fragmentos (FRAGMENTOS)
+            engine.dispose(close=False)
+
+
+def when_ready(server):
+    server.log.info(f"{workers} workers x {threads} threads, preload={'sim' if preload_app else 'não'}")
@@ -0,0 +1,180 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from functools import wraps
+
+import click
+from flask import current_app, jsonify, make_response, request
+from flask.cli import with_appcontext
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import RespostaIdempotente
+from cache_http import identidade_atual
+
+TTL = timedelta(hours=float(os.getenv("IDEMPOTENCIA_TTL_HORAS", 24)))
+# Reserva de uma requisição que nunca terminou (processo morto) deixa de valer depois disso
+RESERVA = timedelta(seconds=int(os.getenv("IDEMPOTENCIA_RESERVA_SEGUNDOS", 60)))
+TAMANHO_MAXIMO_CHAVE = 255
+
+Guardada = namedtuple("Guardada", "impressao status mimetype corpo")
+
+
+class _CacheTTL:
+    """LRU em memória com prazo de validade; o banco continua sendo a fonte de verdade."""
+
+    def __init__(self, tamanho, ttl_segundos):
+        self.tamanho = tamanho
+        self.ttl = ttl_segundos
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            expira, valor = item
+            if expira < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+
+_cache = _CacheTTL(int(os.getenv("IDEMPOTENCIA_CACHE_TAMANHO", 4096)), TTL.total_seconds())
+
+
+def _impressao():
+    h = hashlib.blake2b(digest_size=16)
+    if request.mimetype == "multipart/form-data":
+        # O boundary muda a cada envio: compara campos e conteúdo dos arquivos
+        for campo, valor in sorted(request.form.items(multi=True)):
+            h.update(repr((campo, valor)).encode())
+        for campo, arquivo in sorted(request.files.items(multi=True), key=lambda i: i[0]):
+            h.update(campo.encode())
+            h.update(arquivo.read())
+            arquivo.seek(0)
+    else:
+        h.update(request.get_data())  # fica guardado: request.get_json continua funcionando
+    return h.hexdigest()
+
+
+def _reservar(chave, impressao):
+    """Grava a reserva da chave. Devolve None se esta requisição ficou com ela, senão a linha existente."""
+    existente = None
+    for _ in range(2):
+        agora = datetime.utcnow()
+        db.session.add(RespostaIdempotente(chave=chave, impressao=impressao, criado_em=agora))
+        try:
+            db.session.commit()
+            return None
+        except IntegrityError:
+            db.session.rollback()
+
+        existente = db.session.get(RespostaIdempotente, chave)
+        if existente is None:
+            continue  # removida entre o INSERT e a leitura
+        prazo = TTL if existente.status is not None else RESERVA
+        if existente.criado_em >= agora - prazo:
+            return existente
+        db.session.delete(existente)  # vencida: a chave pode ser usada de novo
+        db.session.commit()
+    return existente
+
+
+def _liberar(chave):
+    db.session.rollback()
+    db.session.execute(delete(RespostaIdempotente).where(RespostaIdempotente.chave == chave))
+    db.session.commit()
+
+
+def _repetir(guardada, impressao):
+    if guardada.impressao != impressao:
+        return jsonify({"message": "Idempotency-Key já usada em outra requisição."}), 422
+    if guardada.status is None:
+        response = jsonify({"message": "A requisição original ainda está em processamento."})
+        response.status_code = 409
+        response.headers["Retry-After"] = "1"
+        return response
+    response = current_app.response_class(guardada.corpo, status=guardada.status, mimetype=guardada.mimetype)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+# ------------------------
+# Decorador para endpoints que alteram estado
+# ------------------------
+def idempotente(view):
+    """Com o cabeçalho Idempotency-Key, repete a resposta já dada em vez de executar a view de novo.
+
+    A chave vale por usuário, método e rota. Respostas 5xx e exceções liberam a chave para nova
+    tentativa; as demais ficam guardadas (banco + LRU) por IDEMPOTENCIA_TTL_HORAS. Vai abaixo de
+    @jwt_required para enxergar o usuário.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        chave_cliente = request.headers.get("Idempotency-Key")
+        if not chave_cliente:
+            return view(*args, **kwargs)
+        if len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+            return jsonify({"message": "Idempotency-Key muito longa."}), 400
+
+        base = repr((identidade_atual(), request.method, request.path, chave_cliente)).encode()
+        chave = hashlib.blake2b(base, digest_size=16).hexdigest()
+        impressao = _impressao()
+
+        guardada = _cache.obter(chave)
+        if guardada is None:
+            linha = _reservar(chave, impressao)
+            if linha is not None:
+                guardada = Guardada(linha.impressao, linha.status, linha.mimetype, linha.corpo)
+                if guardada.status is not None:
+                    _cache.guardar(chave, guardada)
+        if guardada is not None:
+            return _repetir(guardada, impressao)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _liberar(chave)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            _liberar(chave)
+            return response
+
+        # Descarta o que a view deixou sem commit (ela já encerrou a própria transação)
+        db.session.rollback()
+        corpo = response.get_data()
+        db.session.execute(
+            update(RespostaIdempotente)
+            .where(RespostaIdempotente.chave == chave)
+            .values(status=response.status_code, mimetype=response.mimetype, corpo=corpo)
+        )
+        db.session.commit()
+        _cache.guardar(chave, Guardada(impressao, response.status_code, response.mimetype, corpo))
+        return response
+    return wrapper
+
+
+@click.command("limpar-idempotencia")
+@with_appcontext
+def limpar_idempotencia_command():
+    """Remove respostas guardadas de Idempotency-Key já vencidas."""
+    limite = datetime.utcnow() - TTL
+    total = db.session.execute(
+        delete(RespostaIdempotente).where(RespostaIdempotente.criado_em < limite)
+    ).rowcount
+    db.session.commit()
+    click.echo(f"{total} respostas removidas")
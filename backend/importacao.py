@@ -0,0 +1,179 @@
+import csv
+import io
+import os
+import re
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert, select
+from werkzeug.security import generate_password_hash
+
+from database import db
+from models import Paciente, Profissional, MODELOS_USUARIO
+from auth import is_cpf_valido
+from cep import normalizar_cep, consultar_cep
+
+# Mesmos campos obrigatórios dos endpoints de cadastro
+OBRIGATORIOS = {
+    "paciente": ["cpf", "email", "senha", "nome", "telefone", "cep", "endereco",
+                 "especialidade_necessaria", "descricao_necessidade", "estado", "municipio"],
+    "profissional": ["email", "senha", "nome", "cep", "endereco", "estado", "municipio",
+                     "especialidade", "local_atendimento", "registro_conselho",
+                     "uf_registro", "cidade"],
+}
+OPCIONAIS = {
+    "paciente": ["bairro"],
+    "profissional": ["telefone", "bairro"],
+}
+
+# Abaixo disso não compensa subir processos para gerar os hashes
+MINIMO_PARA_PROCESSOS = 64
+
+# A importação por HTTP roda dentro do worker, sem processos extras e gerando os hashes na
+# própria requisição (~0,1 s por senha): arquivos maiores vão pelo comando `flask importar-usuarios`
+MAX_LINHAS_HTTP = int(os.getenv("IMPORTACAO_MAX_LINHAS_HTTP", 200))
+
+
+def _chaves_existentes(tipo):
+    # Uma única consulta por importação; a deduplicação é feita em memória
+    if tipo == "paciente":
+        return set(db.session.execute(
+            select(Paciente.__table__.c.cpf).where(Paciente.__table__.c.cpf != None)
+        ).scalars())
+    return set(db.session.execute(
+        select(Profissional.__table__.c.registro_conselho, Profissional.__table__.c.uf_registro)
+    ).tuples())
+
+
+def _validar(tipo, linha, chaves):
+    erros = [f"Campo obrigatório ausente: {k}" for k in OBRIGATORIOS[tipo] if not linha.get(k)]
+    if erros:
+        return None, erros
+
+    dados = {k: linha[k].strip() for k in OBRIGATORIOS[tipo]}
+    dados.update({k: (linha.get(k) or "").strip() or None for k in OPCIONAIS[tipo]})
+
+    cep = normalizar_cep(dados["cep"])
+    if not cep:
+        return None, ["CEP inválido."]
+    dados["cep"] = cep
+
+    if tipo == "paciente":
+        dados["cpf"] = re.sub(r"\D", "", dados["cpf"])
+        if not is_cpf_valido(dados["cpf"]):
+            return None, ["CPF inválido."]
+        chave = dados["cpf"]
+        duplicado = "CPF já cadastrado."
+    else:
+        dados["uf_registro"] = dados["uf_registro"].upper()
+        chave = (dados["registro_conselho"], dados["uf_registro"])
+        duplicado = "Registro de conselho já cadastrado para esta UF."
+
+    if chave in chaves:
+        return None, [duplicado]
+    chaves.add(chave)
+
+    info = consultar_cep(cep)
+    if info:
+        dados["endereco"] = dados["endereco"] or info["logradouro"]
+        dados["bairro"] = dados["bairro"] or info["bairro"]
+        dados["codigo_municipio"] = info["codigo_municipio"]
+        dados["latitude"] = info["latitude"]
+        dados["longitude"] = info["longitude"]
+    dados["tipo"] = tipo
+    return dados, []
+
+
+def _gravar_lote(lote, pool):
+    senhas = [d.pop("senha") for d in lote]
+    if pool and len(senhas) >= MINIMO_PARA_PROCESSOS:
+        hashes = pool.map(generate_password_hash, senhas, chunksize=max(1, len(senhas) // 32))
+    else:
+        hashes = map(generate_password_hash, senhas)
+    for dados, senha_hash in zip(lote, hashes):
+        dados["senha_hash"] = senha_hash
+
+    # Insert em lote do ORM: grava user e a tabela do tipo (ids via RETURNING)
+    db.session.execute(insert(MODELOS_USUARIO[lote[0]["tipo"]]), lote)
+    db.session.commit()
+
+
+def importar_usuarios(arquivo, tipo, tamanho_lote=1000, processos=None):
+    """Importa pacientes ou profissionais de um CSV (arquivo texto aberto).
+
+    Retorna {"importados": n, "erros": [{"linha": n, "erros": [...]}]}; linhas com erro são
+    ignoradas e as demais são gravadas em transações de `tamanho_lote` linhas.
+    """
+    if tipo not in OBRIGATORIOS:
+        raise ValueError(f"Tipo inválido: {tipo}")
+
+    amostra = arquivo.read(4096)
+    arquivo.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(arquivo, dialect=dialeto)
+    if not leitor.fieldnames:
+        return {"importados": 0, "erros": [{"linha": 1, "erros": ["Arquivo vazio."]}]}
+    leitor.fieldnames = [c.strip().lower() for c in leitor.fieldnames]
+
+    chaves = _chaves_existentes(tipo)
+    importados, erros, lote = 0, [], []
+    processos = processos or os.cpu_count() or 1
+    pool = None
+    if processos > 1:
+        from concurrent.futures import ProcessPoolExecutor  # carregado só quando há paralelismo
+        pool = ProcessPoolExecutor(processos)
+    try:
+        for numero, linha in enumerate(leitor, start=2):  # linha 1 é o cabeçalho
+            dados, problemas = _validar(tipo, linha, chaves)
+            if problemas:
+                erros.append({"linha": numero, "erros": problemas})
+                continue
+            lote.append(dados)
+            if len(lote) >= tamanho_lote:
+                _gravar_lote(lote, pool)
+                importados += len(lote)
+                lote = []
+        if lote:
+            _gravar_lote(lote, pool)
+            importados += len(lote)
+    finally:
+        if pool:
+            pool.shutdown()
+    if tipo == "profissional" and importados:
+        # Novos profissionais mudam as regiões atendidas (mesmo aviso do cadastro)
+        import elegibilidade
+        import invalidacao
+        elegibilidade.invalidar()
+        invalidacao.publicar(elegibilidade.CANAL)
+        db.session.commit()
+    return {"importados": importados, "erros": erros}
+
+
+def importar_de_requisicao(tipo, request):
+    """Importação pelo endpoint de admin: None se o arquivo passar de MAX_LINHAS_HTTP linhas."""
+    enviado = request.files.get("arquivo")
+    conteudo = enviado.read() if enviado else request.get_data()
+    arquivo = io.StringIO(conteudo.decode("utf-8-sig"), newline="")
+    linhas = sum(1 for _ in csv.reader(arquivo)) - 1  # sem o cabeçalho
+    if linhas > MAX_LINHAS_HTTP:
+        return None
+    arquivo.seek(0)
+    return importar_usuarios(arquivo, tipo, processos=1)
+
+
+@click.command("importar-usuarios")
+@click.argument("tipo", type=click.Choice(["paciente", "profissional"]))
+@click.argument("arquivo", type=click.Path(exists=True, dir_okay=False))
+@click.option("--lote", type=int, default=1000, help="Linhas gravadas por transação.")
+@click.option("--processos", type=int, default=None, help="Processos para gerar os hashes de senha.")
+@with_appcontext
+def importar_usuarios_command(tipo, arquivo, lote, processos):
+    """Importa pacientes ou profissionais de um arquivo CSV."""
+    with open(arquivo, newline="", encoding="utf-8-sig") as f:
+        resultado = importar_usuarios(f, tipo, lote, processos)
+    for erro in resultado["erros"]:
+        click.echo(f"linha {erro['linha']}: {'; '.join(erro['erros'])}")
+    click.echo(f"{resultado['importados']} registros importados, {len(resultado['erros'])} linhas com erro")
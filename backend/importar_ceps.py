@@ -0,0 +1,19 @@
+import os
+import sys
+
+from cep import gerar_base_cep
+
+# Uso: python importar_ceps.py <dump.csv> [destino]
+# O dump deve ter cabeçalho com cep, logradouro, bairro, municipio/cidade, ibge, uf,
+# latitude e longitude (separador "," ou ";"). O destino padrão é o lido pela API.
+if len(sys.argv) < 2:
+    print("Uso: python importar_ceps.py <dump.csv> [destino]")
+    sys.exit(1)
+
+origem = sys.argv[1]
+destino = sys.argv[2] if len(sys.argv) > 2 else os.getenv(
+    "CEP_BASE_ARQUIVO", os.path.join(os.path.dirname(__file__), "instance", "ceps.bin")
+)
+
+total = gerar_base_cep(origem, destino)
+print(f"✅ {total} CEPs importados em {destino}")
@@ -0,0 +1,188 @@
+import json
+import os
+import select as _select
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, insert, select, text
+from sqlalchemy.orm import Session
+
+from database import db
+from models import Invalidacao
+
+# Avisa os outros processos (workers do gunicorn, outros servidores) de que uma cópia em memória
+# ficou velha. O processo que faz a alteração já atualiza as próprias cópias; os avisos vão só
+# para os demais, que chamam as funções registradas com ouvir(canal, funcao).
+#
+#   local     um processo só (python app.py): nenhum aviso sai do processo
+#   banco     tabela invalidacao, lida no começo das requisições no máximo a cada INTERVALO
+#   postgres  LISTEN/NOTIFY, entregue por uma thread de cada processo assim que o commit acontece
+#
+# Nos dois últimos o aviso é gravado/enviado na própria transação da alteração: só chega aos
+# outros processos se o commit acontecer, e nunca antes dele.
+BACKEND = os.getenv("INVALIDACAO_BACKEND", "local")
+INTERVALO = float(os.getenv("INVALIDACAO_INTERVALO_SEGUNDOS", 1))
+# Transações mais longas que isso podem ter avisos perdidos pelo backend de banco
+MARGEM = timedelta(seconds=int(os.getenv("INVALIDACAO_MARGEM_SEGUNDOS", 10)))
+RETENCAO = timedelta(minutes=10)
+CANAL_POSTGRES = "invalidacao"
+
+_ouvintes = defaultdict(list)
+
+
+def _nova_origem():
+    global _origem
+    _origem = uuid.uuid4().hex
+
+
+_nova_origem()
+if hasattr(os, "register_at_fork"):
+    # Workers nascidos por fork (preload) não podem compartilhar a identidade do mestre
+    os.register_at_fork(after_in_child=_nova_origem)
+
+
+def ouvir(canal, funcao):
+    """Registra funcao(chave) para avisos de outros processos; chave None vale o canal inteiro."""
+    _ouvintes[canal].append(funcao)
+
+
+def publicar(canal, chave=None):
+    """Avisa os outros processos no commit da transação corrente (descartado no rollback)."""
+    db.session.info.setdefault("invalidacoes", set()).add((canal, None if chave is None else str(chave)))
+
+
+def _entregar(mensagens):
+    for canal, chave in mensagens:
+        for funcao in _ouvintes.get(canal, ()):
+            try:
+                funcao(chave)
+            except Exception as e:
+                print(f"[ERRO] Invalidação de '{canal}' falhou: {e}")
+
+
+def _entregar_tudo():
+    _entregar((canal, None) for canal in list(_ouvintes))
+
+
+# ------------------------
+# Backends
+# ------------------------
+class _Local:
+    def transmitir(self, sessao, mensagens):
+        pass
+
+    def receber(self):
+        pass
+
+
+class _Banco:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._proxima = 0.0
+        self._desde = datetime.utcnow()
+        self._vistos = set()
+        self._ultima_limpeza = 0.0
+
+    def transmitir(self, sessao, mensagens):
+        agora = datetime.utcnow()
+        sessao.execute(insert(Invalidacao), [
+            {"canal": canal, "chave": chave, "origem": _origem, "criado_em": agora} for canal, chave in mensagens
+        ])
+
+    def receber(self):
+        if time.monotonic() < self._proxima or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._proxima = time.monotonic() + INTERVALO
+            agora = datetime.utcnow()
+            # Relê a margem anterior: um aviso com criado_em antigo pode ter sido commitado depois
+            # da última leitura. Os ids já vistos não são entregues de novo
+            try:
+                linhas = db.session.execute(
+                    select(Invalidacao.id, Invalidacao.canal, Invalidacao.chave, Invalidacao.origem)
+                    .where(Invalidacao.criado_em >= self._desde - MARGEM)
+                ).all()
+            except Exception as e:  # ex.: tabela ainda não criada; a requisição segue sem avisos
+                db.session.rollback()
+                print(f"[ERRO] Leitura de invalidações falhou: {e}")
+                return
+            self._desde = agora
+            novas = [l for l in linhas if l.id not in self._vistos and l.origem != _origem]
+            self._vistos = {l.id for l in linhas}
+            _entregar((l.canal, l.chave) for l in novas)
+            if time.monotonic() - self._ultima_limpeza > RETENCAO.total_seconds() / 2:
+                self._ultima_limpeza = time.monotonic()
+                with db.engine.begin() as conexao:
+                    conexao.execute(delete(Invalidacao).where(Invalidacao.criado_em < agora - RETENCAO))
+        finally:
+            self._lock.release()
+
+
+class _Postgres:
+    def __init__(self):
+        self._pid = None
+
+    def transmitir(self, sessao, mensagens):
+        # NOTIFY dentro da transação: o PostgreSQL só entrega depois do commit
+        for canal, chave in mensagens:
+            sessao.execute(text("SELECT pg_notify(:canal, :mensagem)"),
+                           {"canal": CANAL_POSTGRES, "mensagem": json.dumps([_origem, canal, chave])})
+
+    def receber(self):
+        # Uma thread por processo, criada no primeiro request (depois do fork)
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._escutar, args=(db.engine,), daemon=True,
+                             name="invalidacao").start()
+
+    def _escutar(self, engine):
+        while True:
+            conexao = None
+            try:
+                conexao = engine.raw_connection()
+                conexao.detach()  # fora do pool: a conexão fica em autocommit
+                bruta = conexao.driver_connection
+                bruta.autocommit = True
+                bruta.cursor().execute(f"LISTEN {CANAL_POSTGRES}")
+                # Avisos enviados enquanto estava desconectado se perderam
+                _entregar_tudo()
+                while True:
+                    if _select.select([bruta], [], [], 60) == ([], [], []):
+                        continue
+                    bruta.poll()
+                    while bruta.notifies:
+                        origem, canal, chave = json.loads(bruta.notifies.pop(0).payload)
+                        if origem != _origem:
+                            _entregar([(canal, chave)])
+            except Exception as e:
+                print(f"[ERRO] Escuta de invalidações interrompida: {e}")
+                if conexao is not None:
+                    try:
+                        conexao.close()
+                    except Exception:
+                        pass
+                time.sleep(max(INTERVALO, 1))
+
+
+_backend = {"banco": _Banco, "postgres": _Postgres}.get(BACKEND, _Local)()
+
+
+@event.listens_for(Session, "before_commit")
+def _transmitir(sessao):
+    mensagens = sessao.info.pop("invalidacoes", None)
+    if mensagens:
+        _backend.transmitir(sessao, sorted(mensagens, key=lambda m: (m[0], m[1] or "")))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar(sessao, transacao_anterior):
+    sessao.info.pop("invalidacoes", None)
+
+
+def registrar_invalidacao(app):
+    @app.before_request
+    def receber_invalidacoes():
+        _backend.receber()
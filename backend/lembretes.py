@@ -0,0 +1,84 @@
+import heapq
+import os
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, update
+
+import fragmentos
+from database import db
+from models import User, SorteioAtendimento
+from estados import AGUARDANDO_SORTEIO
+
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+
+
+def _corpo(nome, especialidade, municipio, estado, expira_em, inscricao_id):
+    return (
+        f"Olá {nome},\n\n"
+        f"Sua inscrição no sorteio de {especialidade} em {municipio}/{estado} "
+        f"expira em {expira_em:%d/%m/%Y}.\n"
+        "Para continuar concorrendo, renove o prazo pelo link abaixo:\n\n"
+        f"{FRONTEND_URL}/paciente/inscricao/{inscricao_id}\n\n"
+        "Atenciosamente,\nEquipe Meu Atendimento Solidario"
+    )
+
+
+def enviar_lembretes(dias=3, limite=200, agora=None):
+    """Avisa os pacientes cujas inscrições aguardando sorteio expiram nos próximos `dias` dias.
+
+    Uma consulta (faixa em ix_sorteio_status_expiracao, já com nome e e-mail), no máximo `limite`
+    e-mails na mesma sessão SMTP e um UPDATE marcando data_lembrete das inscrições avisadas.
+    As mais próximas de expirar vão primeiro; o restante fica para a próxima execução.
+    """
+    agora = agora or datetime.utcnow()
+    consulta = (
+        select(SorteioAtendimento.id, SorteioAtendimento.especialidade, SorteioAtendimento.municipio,
+               SorteioAtendimento.estado, SorteioAtendimento.data_expiracao, User.nome, User.email)
+        .join(User, User.id == SorteioAtendimento.paciente_id)
+        .where(
+            SorteioAtendimento.status == AGUARDANDO_SORTEIO,
+            SorteioAtendimento.data_expiracao > agora,
+            SorteioAtendimento.data_expiracao <= agora + timedelta(days=dias),
+            SorteioAtendimento.data_lembrete == None,
+        )
+        .order_by(SorteioAtendimento.data_expiracao)
+        .limit(limite)
+    )
+    # Com FRAGMENTOS: as `limite` mais próximas de cada fragmento, intercaladas
+    linhas = list(heapq.merge(
+        *[db.session.execute(consulta.execution_options(fragmento=f)).all() for f in fragmentos.todos()],
+        key=lambda l: l.data_expiracao,
+    ))[:limite]
+    if not linhas:
+        return 0
+
+    from utils.email_utils import enviar_emails_em_lote
+    enviadas, recusadas = enviar_emails_em_lote(
+        (l.id, l.email, "Sua inscrição está perto de expirar",
+         _corpo(l.nome, l.especialidade, l.municipio, l.estado, l.data_expiracao, l.id))
+        for l in linhas
+    )
+    if enviadas or recusadas:
+        # Só a marca do aviso: não é mudança de estado, não mexe na versão da linha.
+        # Endereço recusado também é marcado, para não ocupar o limite de toda execução
+        for ids in fragmentos.agrupar_ids(enviadas + recusadas).values():
+            db.session.execute(
+                update(SorteioAtendimento.__table__)
+                .where(SorteioAtendimento.__table__.c.id.in_(ids))
+                .values(data_lembrete=agora)
+            )
+        db.session.commit()
+    return len(enviadas)
+
+
+@click.command("enviar-lembretes")
+@click.option("--dias", type=int, default=lambda: int(os.getenv("LEMBRETE_DIAS", 3)),
+              help="Avisa inscrições que expiram nesse número de dias.")
+@click.option("--limite", type=int, default=lambda: int(os.getenv("LEMBRETE_LIMITE", 200)),
+              help="Máximo de e-mails por execução.")
+@with_appcontext
+def enviar_lembretes_command(dias, limite):
+    """Envia lembretes de expiração de inscrições (agendar no cron)."""
+    click.echo(f"{enviar_lembretes(dias, limite)} lembretes enviados")
@@ -0,0 +1,62 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import inspect as sa_inspect, text
+
+from database import db
+
+# Colunas acrescentadas a tabelas que já existiam. create_all (flask criar-tabelas) só cria
+# tabelas novas, nunca altera as existentes: bancos anteriores recebem as colunas aqui. Os
+# fragmentos (fragmentos.py) já nascem com o esquema atual e não precisam disso.
+# tabela -> colunas do modelo, na ordem em que são acrescentadas
+COLUNAS_NOVAS = {
+    "user": ["codigo_municipio", "latitude", "longitude", "atualizado_em"],
+    "sorteio_atendimento": ["latitude", "longitude", "data_lembrete", "atualizado_em", "versao"],
+    "atendimento": ["data_confirmacao", "justificativa_cancelamento", "inscricao_id", "atualizado_em", "versao"],
+}
+# Colunas NOT NULL: valor das linhas existentes (DEFAULT do ALTER TABLE)
+PADROES = {"versao": "1"}
+# (tabela, coluna) -> expressão SQL que preenche as linhas existentes logo depois do ALTER TABLE
+PREENCHER = {
+    ("user", "atualizado_em"): "criado_em",
+    # Inscrições existentes ficam com as coordenadas atuais do paciente (sorteio por raio)
+    ("sorteio_atendimento", "latitude"): '(SELECT latitude FROM "user" WHERE "user".id = paciente_id)',
+    ("sorteio_atendimento", "longitude"): '(SELECT longitude FROM "user" WHERE "user".id = paciente_id)',
+    ("sorteio_atendimento", "atualizado_em"): "data_inscricao",
+    ("atendimento", "atualizado_em"): "data_inicio",
+}
+# As tabelas de arquivo repetem as colunas das vivas
+ARQUIVOS = {"sorteio_atendimento_arquivo": "sorteio_atendimento", "atendimento_arquivo": "atendimento"}
+for _arquivo, _viva in ARQUIVOS.items():
+    COLUNAS_NOVAS[_arquivo] = COLUNAS_NOVAS[_viva]
+    PREENCHER.update({(_arquivo, c): e for (t, c), e in list(PREENCHER.items()) if t == _viva})
+
+
+def _acrescentar(conexao, tabela, coluna):
+    tipo = tabela.c[coluna].type.compile(dialect=conexao.dialect)
+    definicao = f"{tipo} NOT NULL DEFAULT {PADROES[coluna]}" if coluna in PADROES else tipo
+    conexao.execute(text(f'ALTER TABLE "{tabela.name}" ADD COLUMN {coluna} {definicao}'))
+    expressao = PREENCHER.get((tabela.name, coluna))
+    if expressao:
+        conexao.execute(text(f'UPDATE "{tabela.name}" SET {coluna} = {expressao}'))
+
+
+@click.command("migrar-esquema")
+@with_appcontext
+def migrar_esquema_command():
+    """Acrescenta às tabelas existentes as colunas e índices criados depois delas."""
+    conexao = db.session.connection()
+    inspetor = sa_inspect(conexao)
+    for nome, colunas in COLUNAS_NOVAS.items():
+        if not inspetor.has_table(nome):
+            continue  # o criar-tabelas cria com o esquema atual
+        tabela = db.metadata.tables[nome]
+        existentes = {c["name"] for c in inspetor.get_columns(nome)}
+        novas = [c for c in colunas if c not in existentes]
+        for coluna in novas:
+            _acrescentar(conexao, tabela, coluna)
+        presentes = existentes | set(novas)
+        for indice in tabela.indexes:
+            if all(c.name in presentes for c in indice.columns):
+                indice.create(conexao, checkfirst=True)
+        click.echo(f"{nome}: " + (f"colunas acrescentadas: {', '.join(novas)}" if novas else "já atualizada"))
+    db.session.commit()
@@ -0,0 +1,63 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import MetaData, text
+from sqlalchemy import inspect as sa_inspect
+
+from busca import criar_indice
+from database import db
+from models import User, MODELOS_USUARIO
+
+# Colunas que saíram da tabela user para a tabela de cada tipo
+COLUNAS = {
+    tipo: [c.name for c in modelo.__table__.columns if c.name != "id"]
+    for tipo, modelo in MODELOS_USUARIO.items()
+}
+
+
+def _remover_colunas_sqlite(conexao, antigas):
+    # SQLite não remove coluna UNIQUE (cpf): recria user só com as colunas comuns. A nova é
+    # criada com outro nome e renomeada depois do DROP, para as chaves estrangeiras das outras
+    # tabelas continuarem apontando para "user"
+    for indice in sa_inspect(conexao).get_indexes("user"):
+        conexao.execute(text(f'DROP INDEX IF EXISTS "{indice["name"]}"'))
+    nova = User.__table__.to_metadata(MetaData(), name="user_nova")
+    for indice in nova.indexes:
+        indice.name = indice.name.replace("ix_user_nova_", "ix_user_")
+    nova.create(conexao)
+    colunas = ", ".join(f'"{c.name}"' for c in User.__table__.columns if c.name in antigas)
+    conexao.execute(text(f'INSERT INTO user_nova ({colunas}) SELECT {colunas} FROM "user"'))
+    conexao.execute(text('DROP TABLE "user"'))
+    conexao.execute(text('ALTER TABLE user_nova RENAME TO "user"'))
+
+
+@click.command("migrar-usuarios")
+@click.option("--manter-colunas", is_flag=True, help="Só copia os dados; não remove as colunas antigas de user.")
+@with_appcontext
+def migrar_usuarios_command(manter_colunas):
+    """Separa os dados de pacientes e profissionais da tabela user nas tabelas de cada tipo."""
+    conexao = db.session.connection()
+    antigas = {c["name"] for c in sa_inspect(conexao).get_columns("user")}
+    if not antigas & {c for colunas in COLUNAS.values() for c in colunas}:
+        click.echo("A tabela user já está separada por tipo.")
+        return
+
+    for tipo, modelo in MODELOS_USUARIO.items():
+        modelo.__table__.create(conexao, checkfirst=True)
+        colunas = ", ".join(COLUNAS[tipo])
+        total = conexao.execute(text(
+            f'INSERT INTO {modelo.__tablename__} (id, {colunas}) SELECT id, {colunas} FROM "user" '
+            f"WHERE tipo = :tipo AND id NOT IN (SELECT id FROM {modelo.__tablename__})"
+        ), {"tipo": tipo}).rowcount
+        click.echo(f"{tipo}: {total} registros copiados")
+
+    if not manter_colunas:
+        if conexao.dialect.name == "sqlite":
+            _remover_colunas_sqlite(conexao, antigas)
+            criar_indice(conexao)  # os gatilhos de busca em user saíram junto com a tabela antiga
+        else:
+            for coluna in sorted(antigas & {c for colunas in COLUNAS.values() for c in colunas}):
+                conexao.execute(text(f'ALTER TABLE "user" DROP COLUMN {coluna}'))
+            for indice in User.__table__.indexes:
+                indice.create(conexao, checkfirst=True)
+        click.echo("Colunas de paciente e profissional removidas de user.")
+    db.session.commit()
@@ -1,14 +1,19 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 import uuid
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+
 from database import db
+from estados import StatusCodigo
 
+# Herança por tabelas ligadas: user tem os dados comuns de login e endereço; Paciente e
+# Profissional juntam user com a tabela do tipo. Admin fica só em user.
 class User(db.Model):
     __tablename__ = "user"
     id = db.Column(db.Integer, primary_key=True)
 
-    # Comum
-    tipo = db.Column(db.String(20), nullable=False)  # "paciente" ou "profissional"
-    email = db.Column(db.String(120), unique=False, nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)  # "paciente", "profissional" ou "admin"
+    email = db.Column(db.String(120), unique=False, nullable=False, index=True)
     senha_hash = db.Column(db.String(255), nullable=False)
     nome = db.Column(db.String(120), nullable=False)
     telefone = db.Column(db.String(40), nullable=True)
@@ -17,43 +22,89 @@ class User(db.Model):
     bairro = db.Column(db.String(120))
     estado = db.Column(db.String(2))       # UF do endereço
     municipio = db.Column(db.String(120))
+    codigo_municipio = db.Column(db.String(7))  # código IBGE, preenchido pela base de CEPs
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    __mapper_args__ = {"polymorphic_on": tipo, "polymorphic_identity": "admin"}
+
 
-    # Paciente
+class Paciente(User):
+    __tablename__ = "paciente"
+    id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
     cpf = db.Column(db.String(11), unique=True, nullable=True)
     especialidade_necessaria = db.Column(db.String(120))
     descricao_necessidade = db.Column(db.Text)
 
-    # Profissional
-    especialidade = db.Column(db.String(120))
+    __mapper_args__ = {"polymorphic_identity": "paciente"}
+
+
+class Profissional(User):
+    __tablename__ = "profissional"
+    id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    especialidade = db.Column(db.String(120), index=True)
     local_atendimento = db.Column(db.String(255))
     registro_conselho = db.Column(db.String(60))        # número do registro
     uf_registro = db.Column(db.String(2))               # UF do registro
     cidade = db.Column(db.String(120))
 
+    __mapper_args__ = {"polymorphic_identity": "profissional"}
+    __table_args__ = (db.Index("ix_profissional_registro", "registro_conselho", "uf_registro"),)
+
+
+# Modelo de cada tipo de login (o token traz o tipo): busca direto na tabela certa
+MODELOS_USUARIO = {"paciente": Paciente, "profissional": Profissional}
+
+
+# Visão com as colunas da antiga tabela larga, para a listagem de usuários do admin
+usuarios_completos = (
+    select(
+        User.__table__,
+        *[c for t in (Paciente.__table__, Profissional.__table__) for c in t.c if c.name != "id"],
+    )
+    .select_from(User.__table__.outerjoin(Paciente.__table__).outerjoin(Profissional.__table__))
+    .subquery("usuarios")
+)
+
+
+@event.listens_for(User, "before_update", propagate=True)
+def _marcar_atualizacao(mapper, connection, usuario):
+    # Alteração só na tabela do tipo (ex.: especialidade) não dispara o onupdate de user
+    if object_session(usuario).is_modified(usuario, include_collections=False):
+        usuario.atualizado_em = datetime.utcnow()
+
 
 class PasswordReset(db.Model):
-    __tablename__ = "password_resets"
+    # Um código ativo por e-mail, guardado só como HMAC (ver codigos_reset.py)
+    __tablename__ = "codigo_reset"
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), nullable=False)
-    codigo = db.Column(db.String(6), nullable=False)
+    email = db.Column(db.String(120), nullable=False, unique=True)
+    codigo_hash = db.Column(db.String(64), nullable=False)
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
-    expira_em = db.Column(db.DateTime, nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+
 
-    def __init__(self, email, codigo):
-        self.email = email
-        self.codigo = codigo
-        self.expira_em = datetime.utcnow() + timedelta(minutes=10)
+class Invalidacao(db.Model):
+    # Avisos de cache desatualizado entre processos (ver invalidacao.py, INVALIDACAO_BACKEND=banco)
+    __tablename__ = "invalidacao"
+    id = db.Column(db.Integer, primary_key=True)
+    canal = db.Column(db.String(60), nullable=False)
+    chave = db.Column(db.String(255))     # None: o canal inteiro
+    origem = db.Column(db.String(32), nullable=False)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
 
 class SorteioAtendimento(db.Model):
     __tablename__ = "sorteio_atendimento"
 
     id = db.Column(db.Integer, primary_key=True)
-    profissional_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    profissional_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
     profissional = db.relationship("User", foreign_keys=[profissional_id], backref="sorteios_realizados")
 
-    paciente_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    paciente_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     paciente = db.relationship("User", foreign_keys=[paciente_id], backref="sorteios_recebidos")
     
     especialidade = db.Column(db.String(120), nullable=False)
@@ -63,6 +114,10 @@ class SorteioAtendimento(db.Model):
     # NOVO: congelar o descritivo no momento da inscrição
     descricao_necessidade = db.Column(db.Text, nullable=True)
 
+    # Coordenadas do paciente (via CEP) para o sorteio por raio
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+
     # Datas
     data_inscricao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     data_renovacao = db.Column(db.DateTime, nullable=True)
@@ -71,11 +126,20 @@ class SorteioAtendimento(db.Model):
     data_cancelamento_profissional = db.Column(db.DateTime, nullable=True)
     data_finalizacao = db.Column(db.DateTime, nullable=True)
     data_expiracao = db.Column(db.DateTime, nullable=True)
-    status = db.Column(db.String(30), nullable=False, default='aguardando_sorteio')
+    data_lembrete = db.Column(db.DateTime, nullable=True)  # último aviso de expiração (lembretes.py)
+    status = db.Column(StatusCodigo, nullable=False, default='aguardando_sorteio', index=True)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     inscricao_origem_id = db.Column(db.Integer, db.ForeignKey('sorteio_atendimento.id'), nullable=True)
     inscricao_origem = db.relationship('SorteioAtendimento', remote_side=[id], backref='inscricoes_derivadas', uselist=False)
 
+    # Controle de concorrência otimista: UPDATE só vale se a versão lida não mudou
+    versao = db.Column(db.Integer, nullable=False, default=1)
+    __mapper_args__ = {"version_id_col": versao}
+
+    # Busca por faixa de expiração dentro de um status (lembretes, expiração)
+    __table_args__ = (db.Index("ix_sorteio_status_expiracao", "status", "data_expiracao"),)
+
     
     
 
@@ -85,15 +149,128 @@ class Atendimento(db.Model):
     __tablename__ = "atendimento"
     id = db.Column(db.Integer, primary_key=True)
 
-    profissional_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    profissional_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True, index=True)
     profissional = db.relationship("User", foreign_keys=[profissional_id])
-    paciente_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    paciente_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     paciente = db.relationship("User", foreign_keys=[paciente_id])
     especialidade = db.Column(db.String(120))
-    status = db.Column(db.String(50), default="Em atendimento")  # "Em atendimento", "Concluído", "Expirado"
+    status = db.Column(StatusCodigo, default="Em atendimento", index=True)  # códigos em estados.py
     data_inicio = db.Column(db.DateTime, default=datetime.utcnow)
     data_fim = db.Column(db.DateTime, nullable=True)
+    data_confirmacao = db.Column(db.DateTime, nullable=True)
+    justificativa_cancelamento = db.Column(db.Text, nullable=True)
+
+    # Inscrição que originou o atendimento (preenchida no sorteio; nula em atendimentos antigos)
+    inscricao_id = db.Column(db.Integer, db.ForeignKey("sorteio_atendimento.id"), nullable=True, index=True)
+    inscricao = db.relationship("SorteioAtendimento", foreign_keys=[inscricao_id])
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Controle de concorrência otimista (ver SorteioAtendimento.versao)
+    versao = db.Column(db.Integer, nullable=False, default=1)
+    __mapper_args__ = {"version_id_col": versao}
     #descricao_necessidade = db.Column(db.String(50), nullable=False)
 
-    
-    
+
+class RespostaIdempotente(db.Model):
+    """Resposta guardada para uma Idempotency-Key (ver idempotencia.py)."""
+    __tablename__ = "resposta_idempotente"
+    chave = db.Column(db.String(32), primary_key=True)      # hash de usuário, método, rota e chave
+    impressao = db.Column(db.String(32), nullable=False)    # hash do corpo da requisição original
+    status = db.Column(db.SmallInteger, nullable=True)      # nulo enquanto a requisição original roda
+    mimetype = db.Column(db.String(60))
+    corpo = db.Column(db.LargeBinary)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+# ------------------------
+# Log de eventos de domínio (somente inserção; ver eventos.py) e projeções (projecoes.py)
+# ------------------------
+class EventoDominio(db.Model):
+    __tablename__ = "evento_dominio"
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(40), nullable=False)
+    ocorrido_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Sem FKs: o log sobrevive ao arquivamento das linhas operacionais
+    inscricao_id = db.Column(db.Integer, index=True)
+    atendimento_id = db.Column(db.Integer)
+    paciente_id = db.Column(db.Integer)
+    profissional_id = db.Column(db.Integer)
+    especialidade = db.Column(db.String(120))
+    estado = db.Column(db.String(2))
+    municipio = db.Column(db.String(120))
+    data_inscricao = db.Column(db.DateTime)  # para o tempo de espera sem voltar à inscrição
+    dados = db.Column(db.JSON)
+
+
+class ProjecaoCheckpoint(db.Model):
+    __tablename__ = "projecao_checkpoint"
+    nome = db.Column(db.String(40), primary_key=True)
+    ultimo_evento_id = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ProjecaoLacuna(db.Model):
+    """Id que faltava abaixo do checkpoint (transação ainda aberta): relido nas próximas rodadas."""
+    __tablename__ = "projecao_lacuna"
+    nome = db.Column(db.String(40), primary_key=True)
+    evento_id = db.Column(db.Integer, primary_key=True)
+    vista_em = db.Column(db.DateTime, nullable=False)
+
+
+class ProjecaoRegiao(db.Model):
+    """Funil e espera por município/especialidade."""
+    __tablename__ = "projecao_regiao"
+    estado = db.Column(db.String(2), primary_key=True)
+    municipio = db.Column(db.String(120), primary_key=True)
+    especialidade = db.Column(db.String(120), primary_key=True)
+    inscricoes = db.Column(db.Integer, nullable=False, default=0)
+    renovacoes = db.Column(db.Integer, nullable=False, default=0)
+    inscricoes_canceladas = db.Column(db.Integer, nullable=False, default=0)
+    sorteios = db.Column(db.Integer, nullable=False, default=0)
+    concluidos = db.Column(db.Integer, nullable=False, default=0)
+    confirmados = db.Column(db.Integer, nullable=False, default=0)
+    atendimentos_cancelados = db.Column(db.Integer, nullable=False, default=0)
+    # Espera (inscrição -> sorteio) em segundos: soma, soma dos quadrados e máximo
+    espera_total = db.Column(db.Float, nullable=False, default=0)
+    espera_quadrados = db.Column(db.Float, nullable=False, default=0)
+    espera_maxima = db.Column(db.Float, nullable=False, default=0)
+
+
+class ProjecaoProfissional(db.Model):
+    """Sorteios e desfechos por profissional."""
+    __tablename__ = "projecao_profissional"
+    profissional_id = db.Column(db.Integer, primary_key=True)
+    sorteios = db.Column(db.Integer, nullable=False, default=0)
+    concluidos = db.Column(db.Integer, nullable=False, default=0)
+    confirmados = db.Column(db.Integer, nullable=False, default=0)
+    cancelados_paciente = db.Column(db.Integer, nullable=False, default=0)
+    cancelados_profissional = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ------------------------
+# Tabelas de arquivo (linhas em estado final movidas por arquivamento.py)
+# ------------------------
+def _colunas_arquivo(modelo):
+    # Mesmas colunas da tabela viva, sem FKs: o arquivo não depende das linhas vivas
+    return [db.Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, index=c.index)
+            for c in modelo.__table__.columns]
+
+
+class SorteioAtendimentoArquivo(db.Model):
+    __table__ = db.Table(
+        "sorteio_atendimento_arquivo", db.metadata,
+        *_colunas_arquivo(SorteioAtendimento),
+        db.Column("arquivado_em", db.DateTime, nullable=False),
+    )
+    profissional = db.relationship("User", primaryjoin="User.id == foreign(SorteioAtendimentoArquivo.profissional_id)", viewonly=True)
+    paciente = db.relationship("User", primaryjoin="User.id == foreign(SorteioAtendimentoArquivo.paciente_id)", viewonly=True)
+
+
+class AtendimentoArquivo(db.Model):
+    __table__ = db.Table(
+        "atendimento_arquivo", db.metadata,
+        *_colunas_arquivo(Atendimento),
+        db.Column("arquivado_em", db.DateTime, nullable=False),
+    )
+    profissional = db.relationship("User", primaryjoin="User.id == foreign(AtendimentoArquivo.profissional_id)", viewonly=True)
+    paciente = db.relationship("User", primaryjoin="User.id == foreign(AtendimentoArquivo.paciente_id)", viewonly=True)
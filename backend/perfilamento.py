@@ -0,0 +1,160 @@
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from flask import g, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Perfilamento sob demanda: a requisição roda com um amostrador que lê a pilha da thread dela a
+# cada INTERVALO e grava, em PASTA:
+#   <nome>.folded   pilhas no formato "a;b;c contagem" (flamegraph.pl, speedscope.app, inferno)
+#   <nome>.sql.txt  tempo total, SQL executado em ordem e agrupado por comando
+# Liga com o cabeçalho X-Perfilamento: 1 numa requisição de admin, X-Perfilamento: <PERFILAMENTO_CHAVE>
+# em qualquer requisição (rotas de paciente/profissional), ou para uma fração PERFILAMENTO_AMOSTRAGEM
+# das requisições. O nome dos arquivos volta no mesmo cabeçalho. Nada de dados de usuário vai para
+# o disco: o SQL é gravado sem os valores dos parâmetros e a URL sem os valores da query string.
+# Só os MAXIMO_PERFIS mais recentes ficam na pasta.
+# Desligado, custa uma leitura de cabeçalho por requisição e um getattr por comando SQL.
+CABECALHO = "X-Perfilamento"
+CHAVE = os.getenv("PERFILAMENTO_CHAVE")
+AMOSTRAGEM = float(os.getenv("PERFILAMENTO_AMOSTRAGEM", 0))
+INTERVALO = float(os.getenv("PERFILAMENTO_INTERVALO_MS", 5)) / 1000
+PASTA = os.getenv("PERFILAMENTO_PASTA", os.path.join(os.path.dirname(__file__), "instance", "perfis"))
+MAXIMO_PERFIS = int(os.getenv("PERFILAMENTO_MAX_ARQUIVOS", 200))
+
+_local = threading.local()
+
+
+class _Amostrador(threading.Thread):
+    def __init__(self, alvo):
+        super().__init__(daemon=True, name="perfilamento")
+        self.alvo = alvo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(INTERVALO):
+            frame = sys._current_frames().get(self.alvo)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            if pilha:
+                self.pilhas[";".join(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+
+# ------------------------
+# SQL da requisição perfilada (mesma thread)
+# ------------------------
+def _antes_sql(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, "consultas", None) is not None:
+        conn.info.setdefault("perfilamento_inicio", []).append(time.perf_counter())
+
+
+def _depois_sql(conn, cursor, statement, parameters, context, executemany):
+    consultas = getattr(_local, "consultas", None)
+    inicios = conn.info.get("perfilamento_inicio")
+    if consultas is not None and inicios:
+        # Só a quantidade: os valores (e-mail, CPF, hashes de senha e de código) não são guardados
+        quantidade = f"lote de {len(parameters)}" if executemany else f"{len(parameters or ())} parâmetros"
+        consultas.append((time.perf_counter() - inicios.pop(), statement, quantidade))
+
+
+def _ativar():
+    valor = request.headers.get(CABECALHO)
+    if valor:
+        if CHAVE and hmac.compare_digest(valor.encode(), CHAVE.encode()):
+            return True
+        try:
+            verify_jwt_in_request(optional=True)
+            return get_jwt().get("tipo") == "admin"
+        except Exception:  # token inválido: a própria rota responde o erro
+            return False
+    return AMOSTRAGEM > 0 and random.random() < AMOSTRAGEM
+
+
+def _gravar(pilhas, consultas, duracao, status):
+    os.makedirs(PASTA, exist_ok=True)
+    nome = f"{datetime.utcnow():%Y%m%d-%H%M%S}-{request.endpoint or 'sem-rota'}-{uuid.uuid4().hex[:6]}"
+    with open(os.path.join(PASTA, f"{nome}.folded"), "w", encoding="utf-8") as f:
+        for pilha, contagem in pilhas.most_common():
+            f.write(f"{pilha} {contagem}\n")
+
+    por_comando = defaultdict(lambda: [0, 0.0])
+    for tempo, comando, _ in consultas:
+        por_comando[comando][0] += 1
+        por_comando[comando][1] += tempo
+    with open(os.path.join(PASTA, f"{nome}.sql.txt"), "w", encoding="utf-8") as f:
+        campos = "&".join(f"{campo}=…" for campo in request.args)
+        f.write(f"{request.method} {request.path}{'?' + campos if campos else ''} -> {status}\n")
+        f.write(f"total {duracao * 1000:.1f} ms, {sum(pilhas.values())} amostras a cada {INTERVALO * 1000:g} ms, "
+                f"{len(consultas)} comandos SQL em {sum(c[0] for c in consultas) * 1000:.1f} ms\n\n")
+        f.write("# Por comando (vezes, tempo total)\n")
+        for comando, (vezes, tempo) in sorted(por_comando.items(), key=lambda i: -i[1][1]):
+            f.write(f"{vezes:5d}x {tempo * 1000:9.2f} ms  {' '.join(comando.split())}\n")
+        f.write("\n# Em ordem\n")
+        for tempo, comando, parametros in consultas:
+            f.write(f"{tempo * 1000:9.2f} ms  {' '.join(comando.split())}  [{parametros}]\n")
+    _podar()
+    return nome
+
+
+def _podar():
+    # Os nomes começam pela data: em ordem alfabética, os mais antigos vêm primeiro
+    perfis = sorted(n[:-len(".sql.txt")] for n in os.listdir(PASTA) if n.endswith(".sql.txt"))
+    for nome in perfis[:max(len(perfis) - MAXIMO_PERFIS, 0)]:
+        for extensao in (".folded", ".sql.txt"):
+            try:
+                os.remove(os.path.join(PASTA, nome + extensao))
+            except FileNotFoundError:  # outro worker podou antes
+                pass
+
+
+def _encerrar():
+    perfil = g.pop("perfilamento", None)
+    if perfil is None:
+        return None
+    amostrador, inicio = perfil
+    amostrador.parar()
+    consultas, _local.consultas = _local.consultas, None
+    return amostrador.pilhas, consultas, time.perf_counter() - inicio
+
+
+def registrar_perfilamento(app):
+    if os.getenv("PERFILAMENTO", "1") != "1":
+        return
+    if not event.contains(Engine, "before_cursor_execute", _antes_sql):
+        event.listen(Engine, "before_cursor_execute", _antes_sql)
+        event.listen(Engine, "after_cursor_execute", _depois_sql)
+
+    @app.before_request
+    def iniciar_perfilamento():
+        if not _ativar():
+            return
+        _local.consultas = []
+        g.perfilamento = (_Amostrador(threading.get_ident()), time.perf_counter())
+        g.perfilamento[0].start()
+
+    @app.after_request
+    def gravar_perfilamento(response):
+        resultado = _encerrar()
+        if resultado:
+            response.headers[CABECALHO] = _gravar(*resultado, response.status_code)
+        return response
+
+    @app.teardown_request
+    def descartar_perfilamento(exc):
+        _encerrar()  # exceção antes do after_request: não deixa o amostrador rodando
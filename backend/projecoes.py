@@ -0,0 +1,311 @@
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+import fragmentos
+from database import db
+from models import EventoDominio, ProjecaoCheckpoint, ProjecaoLacuna, ProjecaoRegiao, ProjecaoProfissional
+from eventos import (
+    INSCRICAO_CRIADA, INSCRICAO_RENOVADA, INSCRICAO_SORTEADA, INSCRICAO_CANCELADA,
+    ATENDIMENTO_CONCLUIDO, ATENDIMENTO_CONFIRMADO, ATENDIMENTO_CANCELADO_PACIENTE,
+    ATENDIMENTO_CANCELADO_PROFISSIONAL,
+)
+
+# Eventos mais novos que isso esperam a próxima rodada, para que a maioria das transações ainda
+# abertas (ids menores que não apareceram) confirme antes de o checkpoint passar por elas
+ATRASO = timedelta(seconds=int(os.getenv("PROJECAO_ATRASO_SEGUNDOS", 5)))
+# Ids que faltam abaixo do checkpoint viram lacunas, relidas a cada rodada até o evento aparecer.
+# Depois desse prazo a lacuna é descartada: o id foi de uma transação desfeita (sequência
+# queimada). Um intervalo de mais de LACUNA_MAXIMA ids seguidos é salto de sequência (início de
+# fragmento, cache do Postgres), não transações abertas, e não é registrado
+PRAZO_LACUNA = timedelta(hours=int(os.getenv("PROJECAO_PRAZO_LACUNA_HORAS", 24)))
+LACUNA_MAXIMA = 1000
+
+
+def _espera(linha, evento):
+    if evento.tipo != INSCRICAO_SORTEADA or not evento.data_inscricao:
+        return
+    segundos = (evento.ocorrido_em - evento.data_inscricao).total_seconds()
+    linha["espera_total"] += segundos
+    linha["espera_quadrados"] += segundos * segundos
+    linha["espera_maxima"] = max(linha["espera_maxima"], segundos)
+
+
+COLUNAS_LIDAS = [EventoDominio.__table__.c[c] for c in (
+    "id", "tipo", "ocorrido_em", "profissional_id", "especialidade", "estado", "municipio", "data_inscricao",
+)]
+
+# chave(evento) -> chave primária da linha (ou None para ignorar); contadores: tipo -> coluna
+Projecao = namedtuple("Projecao", "modelo chave contadores extra")
+
+PROJECOES = {
+    "regiao": Projecao(
+        ProjecaoRegiao,
+        lambda e: (e.estado, e.municipio, e.especialidade) if e.municipio and e.especialidade else None,
+        {
+            INSCRICAO_CRIADA: "inscricoes",
+            INSCRICAO_RENOVADA: "renovacoes",
+            INSCRICAO_CANCELADA: "inscricoes_canceladas",
+            INSCRICAO_SORTEADA: "sorteios",
+            ATENDIMENTO_CONCLUIDO: "concluidos",
+            ATENDIMENTO_CONFIRMADO: "confirmados",
+            ATENDIMENTO_CANCELADO_PACIENTE: "atendimentos_cancelados",
+            ATENDIMENTO_CANCELADO_PROFISSIONAL: "atendimentos_cancelados",
+        },
+        _espera,
+    ),
+    "profissional": Projecao(
+        ProjecaoProfissional,
+        lambda e: e.profissional_id,
+        {
+            INSCRICAO_SORTEADA: "sorteios",
+            ATENDIMENTO_CONCLUIDO: "concluidos",
+            ATENDIMENTO_CONFIRMADO: "confirmados",
+            ATENDIMENTO_CANCELADO_PACIENTE: "cancelados_paciente",
+            ATENDIMENTO_CANCELADO_PROFISSIONAL: "cancelados_profissional",
+        },
+        None,
+    ),
+}
+
+
+def _chaves_pk(tabela):
+    return list(tabela.primary_key.columns)
+
+
+def _como_tupla(chave):
+    return chave if isinstance(chave, tuple) else (chave,)
+
+
+def _carregar(tabela, chaves):
+    """Linhas já existentes da projeção para as chaves do lote, como dicts."""
+    pk = _chaves_pk(tabela)
+    existentes = {}
+    chaves = list(chaves)
+    for i in range(0, len(chaves), 500):
+        parte = chaves[i:i + 500]
+        filtro = tuple_(*pk).in_([_como_tupla(c) for c in parte]) if len(pk) > 1 else pk[0].in_(parte)
+        for linha in db.session.execute(select(tabela).where(filtro)).mappings():
+            valores = tuple(linha[c.name] for c in pk)
+            existentes[valores if len(pk) > 1 else valores[0]] = dict(linha)
+    return existentes
+
+
+def _zerada(tabela, chave):
+    pk = [c.name for c in _chaves_pk(tabela)]
+    linha = {c.name: 0 for c in tabela.columns}
+    linha.update(zip(pk, _como_tupla(chave)))
+    return linha
+
+
+def _gravar(tabela, linhas, existentes):
+    pk = [c.name for c in _chaves_pk(tabela)]
+    novas = [l for chave, l in linhas.items() if chave not in existentes]
+    alteradas = [{**l, **{f"pk_{c}": l[c] for c in pk}} for chave, l in linhas.items() if chave in existentes]
+    if novas:
+        db.session.execute(insert(tabela), novas)
+    if alteradas:
+        db.session.execute(
+            update(tabela)
+            .where(*[tabela.c[c] == bindparam(f"pk_{c}") for c in pk])
+            .values({c.name: bindparam(c.name) for c in tabela.columns if c.name not in pk}),
+            alteradas,
+        )
+
+
+def _aplicar(projecao, tabela, eventos):
+    """Soma os eventos às linhas da projeção (na transação atual, sem commit)."""
+    aplicaveis = []
+    for evento in eventos:
+        coluna = projecao.contadores.get(evento.tipo)
+        chave = projecao.chave(evento)
+        if coluna is not None and chave is not None:
+            aplicaveis.append((chave, coluna, evento))
+
+    existentes = _carregar(tabela, {chave for chave, _, _ in aplicaveis})
+    linhas = {}
+    for chave, coluna, evento in aplicaveis:
+        linha = linhas.get(chave)
+        if linha is None:
+            linha = linhas[chave] = existentes.get(chave) or _zerada(tabela, chave)
+        linha[coluna] += 1
+        if projecao.extra:
+            projecao.extra(linha, evento)
+    _gravar(tabela, linhas, existentes)
+
+
+def _lacunas(anterior, eventos):
+    """Ids ausentes entre o checkpoint e os eventos lidos (em ordem de id)."""
+    faltando = []
+    for evento in eventos:
+        if anterior and 1 < evento.id - anterior <= LACUNA_MAXIMA + 1:
+            faltando.extend(range(anterior + 1, evento.id))
+        anterior = evento.id
+    return faltando
+
+
+def _reler_lacunas(checkpoint, projecao, tabela, fragmento):
+    """Aplica os eventos que apareceram nas lacunas do checkpoint e descarta as vencidas."""
+    lacunas = db.session.execute(
+        select(ProjecaoLacuna.evento_id, ProjecaoLacuna.vista_em).where(ProjecaoLacuna.nome == checkpoint)
+    ).all()
+    if not lacunas:
+        return 0
+    eventos = db.session.execute(
+        select(*COLUNAS_LIDAS)
+        .where(EventoDominio.id.in_([l.evento_id for l in lacunas]))
+        .order_by(EventoDominio.id)
+        .execution_options(fragmento=fragmento)
+    ).all()
+    vencidas = [l.evento_id for l in lacunas if l.vista_em < datetime.utcnow() - PRAZO_LACUNA]
+    resolvidas = {e.id for e in eventos} | set(vencidas)
+    if not resolvidas:
+        db.session.rollback()
+        return 0
+
+    _aplicar(projecao, tabela, eventos)
+    # Só quem apagar todas as lacunas aplica: outro processo que releu as mesmas desfaz
+    apagadas = db.session.execute(
+        delete(ProjecaoLacuna)
+        .where(ProjecaoLacuna.nome == checkpoint, ProjecaoLacuna.evento_id.in_(resolvidas))
+    ).rowcount
+    if apagadas != len(resolvidas):
+        db.session.rollback()
+        return 0
+    db.session.commit()
+    return len(eventos)
+
+
+def _avancar_checkpoint(nome, anterior, novo):
+    if anterior is None:
+        db.session.add(ProjecaoCheckpoint(nome=nome, ultimo_evento_id=novo))
+        try:
+            db.session.flush()
+            return True
+        except IntegrityError:
+            return False
+    return db.session.execute(
+        update(ProjecaoCheckpoint)
+        .where(ProjecaoCheckpoint.nome == nome, ProjecaoCheckpoint.ultimo_evento_id == anterior)
+        .values(ultimo_evento_id=novo)
+    ).rowcount == 1
+
+
+# ------------------------
+# Atualização incremental a partir do checkpoint
+# ------------------------
+def projetar(nome, lote=1000):
+    """Aplica à projeção `nome` os eventos posteriores ao checkpoint. Devolve quantos leu.
+
+    Cada lote soma os eventos em memória e grava as linhas tocadas e o checkpoint na mesma
+    transação, então reprocessar nunca conta duas vezes; se outro processo avançou o checkpoint
+    no meio do caminho, o lote é descartado.
+    """
+    return sum(_projetar(nome, fragmento, lote) for fragmento in fragmentos.todos())
+
+
+def _projetar(nome, fragmento, lote):
+    # Com FRAGMENTOS cada fragmento tem o próprio log e o próprio checkpoint ("regiao:sp")
+    checkpoint = f"{nome}:{fragmentos.NOMES[fragmento - 1]}" if fragmento else nome
+    projecao = PROJECOES[nome]
+    tabela = projecao.modelo.__table__
+    limite = datetime.utcnow() - ATRASO
+
+    total = _reler_lacunas(checkpoint, projecao, tabela, fragmento)
+    while True:
+        anterior = db.session.execute(
+            select(ProjecaoCheckpoint.ultimo_evento_id).where(ProjecaoCheckpoint.nome == checkpoint)
+        ).scalar()
+        # Linhas simples em vez de entidades: o log só é lido, nunca alterado
+        eventos = db.session.execute(
+            select(*COLUNAS_LIDAS)
+            .where(EventoDominio.id > (anterior or 0))
+            .order_by(EventoDominio.id)
+            .limit(lote)
+            .execution_options(fragmento=fragmento)
+        ).all()
+
+        lidos = 0
+        for evento in eventos:
+            if evento.ocorrido_em > limite:
+                break
+            lidos += 1
+        if not lidos:
+            db.session.rollback()
+            return total
+
+        _aplicar(projecao, tabela, eventos[:lidos])
+        agora = datetime.utcnow()
+        faltando = _lacunas(anterior, eventos[:lidos])
+        try:
+            if faltando:
+                db.session.execute(insert(ProjecaoLacuna), [
+                    {"nome": checkpoint, "evento_id": id_, "vista_em": agora} for id_ in faltando
+                ])
+        except IntegrityError:  # outro processo já registrou este trecho
+            db.session.rollback()
+            return total
+        if not _avancar_checkpoint(checkpoint, anterior, eventos[lidos - 1].id):
+            db.session.rollback()
+            return total
+        db.session.commit()
+        total += lidos
+        if lidos < lote:
+            return total
+
+
+def refazer(nome, lote=1000):
+    """Apaga a projeção e a reconstrói do início do log."""
+    db.session.execute(delete(PROJECOES[nome].modelo))
+    for modelo in (ProjecaoCheckpoint, ProjecaoLacuna):
+        db.session.execute(delete(modelo).where(
+            (modelo.nome == nome) | modelo.nome.startswith(f"{nome}:")
+        ))
+    db.session.commit()
+    return projetar(nome, lote)
+
+
+# ------------------------
+# Leitura (admin)
+# ------------------------
+def _linha_regiao(linha):
+    d = {c.name: getattr(linha, c.name) for c in ProjecaoRegiao.__table__.columns}
+    n = linha.sorteios
+    media = linha.espera_total / n if n else None
+    # Desvio padrão da espera: quanto maior em relação à média, menos uniforme o sorteio na região
+    desvio = (max(linha.espera_quadrados / n - media * media, 0) ** 0.5) if n else None
+    d["espera_media_horas"] = round(media / 3600, 2) if n else None
+    d["espera_desvio_horas"] = round(desvio / 3600, 2) if n else None
+    d["espera_maxima_horas"] = round(linha.espera_maxima / 3600, 2)
+    for c in ("espera_total", "espera_quadrados", "espera_maxima"):
+        del d[c]
+    return d
+
+
+def listar_projecao(nome, estado=None):
+    modelo = PROJECOES[nome].modelo
+    consulta = select(modelo)
+    if nome == "regiao":
+        if estado:
+            consulta = consulta.where(ProjecaoRegiao.estado == estado)
+        consulta = consulta.order_by(ProjecaoRegiao.estado, ProjecaoRegiao.municipio, ProjecaoRegiao.especialidade)
+        return [_linha_regiao(l) for l in db.session.execute(consulta).scalars()]
+    consulta = consulta.order_by(ProjecaoProfissional.sorteios.desc())
+    return [{c.name: getattr(l, c.name) for c in modelo.__table__.columns}
+            for l in db.session.execute(consulta).scalars()]
+
+
+@click.command("projetar")
+@click.option("--refazer", "do_zero", is_flag=True, help="Reconstrói as projeções do início do log.")
+@click.option("--lote", type=int, default=1000, help="Eventos lidos por transação.")
+@with_appcontext
+def projetar_command(do_zero, lote):
+    """Atualiza as projeções analíticas a partir do log de eventos."""
+    for nome in PROJECOES:
+        total = refazer(nome, lote) if do_zero else projetar(nome, lote)
+        click.echo(f"{nome}: {total} eventos aplicados")
@@ -1,7 +1,7 @@
 from werkzeug.security import generate_password_hash
 from app import create_app
 from database import db
-from models import User
+from models import User, Paciente, Profissional
 
 app = create_app()
 
@@ -11,8 +11,7 @@ with app.app_context():
     db.create_all()
 
     # ====== Profissionais ======
-    prof1 = User(
-        tipo="profissional",
+    prof1 = Profissional(
         email="dr.joao@example.com",
         senha_hash=generate_password_hash("123456"),
         nome="Dr. João Silva",
@@ -29,8 +28,7 @@ with app.app_context():
         uf_registro="SP"
     )
 
-    prof2 = User(
-        tipo="profissional",
+    prof2 = Profissional(
         email="dra.maria@example.com",
         senha_hash=generate_password_hash("123456"),
         nome="Dra. Maria Oliveira",
@@ -48,8 +46,7 @@ with app.app_context():
     )
 
     # ====== Pacientes ======
-    pac1 = User(
-        tipo="paciente",
+    pac1 = Paciente(
         cpf="12345678901",
         email="ana@example.com",
         senha_hash=generate_password_hash("123456"),
@@ -63,8 +60,7 @@ with app.app_context():
         especialidade_necessaria="Cardiologia"
     )
 
-    pac2 = User(
-        tipo="paciente",
+    pac2 = Paciente(
         cpf="23456789012",
         email="carlos@example.com",
         senha_hash=generate_password_hash("123456"),
@@ -78,8 +74,7 @@ with app.app_context():
         especialidade_necessaria="Dermatologia"
     )
 
-    pac3 = User(
-        tipo="paciente",
+    pac3 = Paciente(
         cpf="34567890123",
         email="beatriz@example.com",
         senha_hash=generate_password_hash("123456"),
@@ -0,0 +1,117 @@
+from functools import lru_cache
+from operator import attrgetter
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # dependência opcional: sem ela fica o JSON padrão do Flask
+    orjson = None
+
+# Mapeamento status interno => status amigável para o frontend
+STATUS_LABELS = {
+    "cancelado_paciente": "Cancelado pelo paciente",
+    "cancelado_profissional": "Cancelado pelo profissional",
+    "aguardando_sorteio": "Aguardando sorteio",
+    "sorteado_em_atendimento": "Em atendimento",
+    "atendimento_concluido": "Concluído",
+    "finalizado_profissional": "Aguardando confirmação de conclusão",
+    "atendimento_expirado": "Atendimento expirado",
+    "inscricao_expirada" : "Inscrição expirada"
+    # Inclua outros status do seu sistema aqui conforme usados...
+}
+
+
+@lru_cache(maxsize=None)
+def status_amigavel(status):
+    return STATUS_LABELS.get(status, status.capitalize())
+
+
+def _iso(valor):
+    return valor.isoformat() if valor is not None else None
+
+
+# ------------------------
+# Serializadores pré-compilados
+# ------------------------
+def serializador_objeto(campos, datas=()):
+    """Serializador de objeto ORM: um attrgetter para todos os campos e isoformat nas datas."""
+    valores = attrgetter(*campos)
+    datas = tuple(datas)
+
+    def serializar(obj):
+        d = dict(zip(campos, valores(obj)))
+        for campo in datas:
+            d[campo] = _iso(d[campo])
+        return d
+    return serializar
+
+
+def mapeador_linhas(chaves, datas=(), status=None):
+    """Mapeador de tuplas de consulta (select de colunas) para dicts de resposta.
+
+    `datas` são as chaves convertidas com isoformat; com `status`, acrescenta "status_legivel".
+    """
+    chaves = tuple(chaves)
+    posicoes_datas = tuple(chaves.index(c) for c in datas)
+    posicao_status = chaves.index(status) if status else None
+
+    def mapear(linha):
+        valores = list(linha)
+        for i in posicoes_datas:
+            if valores[i] is not None:
+                valores[i] = valores[i].isoformat()
+        d = dict(zip(chaves, valores))
+        if posicao_status is not None:
+            d["status_legivel"] = status_amigavel(valores[posicao_status])
+        return d
+    return mapear
+
+
+CAMPOS_USUARIO = (
+    "id", "tipo", "email", "nome", "telefone", "cep", "endereco", "bairro", "estado",
+    "municipio", "codigo_municipio", "latitude", "longitude", "criado_em", "cpf",
+    "especialidade_necessaria", "descricao_necessidade", "especialidade",
+    "local_atendimento", "registro_conselho", "uf_registro", "cidade",
+)
+
+
+@lru_cache(maxsize=None)
+def _serializador_usuario(classe):
+    # Campos de outro tipo de usuário (ex.: cpf num Profissional) saem como None, como antes
+    presentes = tuple(c for c in CAMPOS_USUARIO if hasattr(classe, c))
+    serializar = serializador_objeto(presentes, datas=("criado_em",))
+    vazios = dict.fromkeys(c for c in CAMPOS_USUARIO if c not in presentes)
+    return lambda usuario: {**serializar(usuario), **vazios}
+
+
+def serialize_user(usuario):
+    return _serializador_usuario(type(usuario))(usuario)
+
+
+# ------------------------
+# Provedor JSON rápido (orjson), ligado em create_app quando disponível
+# ------------------------
+class OrjsonProvider(DefaultJSONProvider):
+    # Datas soltas passam pelo default do Flask (HTTP date), como no provedor padrão
+    _opcoes = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+    _padrao = staticmethod(DefaultJSONProvider.default)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self._padrao, option=self._opcoes).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if self._app.debug:  # saída indentada do provedor padrão em desenvolvimento
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self._padrao, option=self._opcoes),
+            mimetype=self.mimetype,
+        )
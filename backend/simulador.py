@@ -0,0 +1,345 @@
+import math
+import os
+import time
+from collections import Counter, namedtuple
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+# NumPy é dependência opcional e pesada: carregado só quando uma simulação roda, não na
+# importação (o app importa este módulo para registrar o comando)
+np = None
+
+import fragmentos
+from database import db
+from models import EventoDominio
+from estados import (
+    AGUARDANDO_SORTEIO, SORTEADO, CODIGOS, NOMES, PRAZO_INSCRICAO, REENTRADA, TRANSICOES, TransicaoInvalida,
+)
+from eventos import (
+    INSCRICAO_CRIADA, INSCRICAO_RENOVADA, INSCRICAO_SORTEADA, INSCRICAO_CANCELADA,
+    ATENDIMENTO_CONCLUIDO, ATENDIMENTO_CANCELADO_PACIENTE, ATENDIMENTO_CANCELADO_PROFISSIONAL,
+)
+
+# Simulador da fila, fora do ar: chegadas, renovações, desistências, sorteios e desfechos de
+# atendimento por balde (especialidade, UF, município), em passos de tempo, com todas as
+# inscrições em vetores NumPy. Roda a política atual (estados.PRAZO_INSCRICAO e
+# estados.REENTRADA) e uma proposta sobre as mesmas chegadas e compara espera e tamanho da fila.
+# As mudanças de status passam pela tabela de transições das rotas (estados.TRANSICOES).
+#
+# O cenário vem do log de eventos (chegadas reproduzidas como aconteceram, taxas medidas) ou é
+# sintético. Simplificações: cada balde tem uma taxa fixa de sorteios por dia (os profissionais
+# sorteiam havendo fila ou não), o sorteio por raio não é modelado e o paciente decide renovar
+# ao receber o lembrete (LEMBRETE_DIAS antes de expirar).
+ANTECEDENCIA_RENOVACAO = int(os.getenv("LEMBRETE_DIAS", 3))
+DESFECHOS = ("concluir", "cancelar_paciente", "cancelar_profissional")
+DESFECHOS_DO_LOG = {
+    ATENDIMENTO_CONCLUIDO: "concluir",
+    ATENDIMENTO_CANCELADO_PACIENTE: "cancelar_paciente",
+    ATENDIMENTO_CANCELADO_PROFISSIONAL: "cancelar_profissional",
+}
+
+Politica = namedtuple("Politica", "prazo_dias reentrada")
+POLITICA_ATUAL = Politica(PRAZO_INSCRICAO.total_seconds() / 86400, REENTRADA)
+
+# Comportamento sem dados do log
+PADROES = {
+    "renovacao": 0.5, "desistencia": 0.01, "duracao": 20.0,
+    "desfechos": {"concluir": 0.85, "cancelar_paciente": 0.05, "cancelar_profissional": 0.10},
+}
+
+# chegadas e sorteios: por dia, um valor por balde; renovacao: chance de renovar no lembrete;
+# desistencia: cancelamentos da inscrição por dia de espera; duracao: dias até o desfecho;
+# desfechos: {ação: probabilidade}; replay: (dia, balde) das chegadas reais, ou None
+Cenario = namedtuple("Cenario", "nomes chegadas sorteios renovacao desistencia duracao desfechos replay periodo")
+
+
+def _carregar_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+
+
+# ------------------------
+# Cenários
+# ------------------------
+def cenario_sintetico(baldes, chegadas, sorteios, semente=0):
+    """Baldes com taxas espalhadas em torno das médias (gama, forma 2)."""
+    _carregar_numpy()
+    rng = np.random.default_rng(semente)
+    return Cenario(
+        nomes=[f"balde {i}" for i in range(baldes)],
+        chegadas=chegadas * rng.gamma(2.0, 0.5, baldes),
+        sorteios=sorteios * rng.gamma(2.0, 0.5, baldes),
+        replay=None, periodo=None, **PADROES,
+    )
+
+
+def cenario_do_log():
+    """Cenário medido em evento_dominio (None se o log estiver vazio).
+
+    Os sorteios observados são um limite inferior da capacidade: tentativas sem fila não ficam
+    no log.
+    """
+    _carregar_numpy()
+    e = EventoDominio.__table__.c
+    consulta = select(e.tipo, e.ocorrido_em, e.inscricao_id, e.especialidade, e.estado, e.municipio, e.dados)
+    linhas = sorted(
+        (l for f in fragmentos.todos() for l in db.session.execute(consulta.execution_options(fragmento=f))),
+        key=lambda l: l.ocorrido_em,
+    )
+    if not linhas:
+        return None
+    inicio = linhas[0].ocorrido_em
+    dia = lambda d: (d - inicio).total_seconds() / 86400
+    periodo = max(dia(linhas[-1].ocorrido_em), 1.0)
+    prazo = POLITICA_ATUAL.prazo_dias
+
+    baldes, chegadas, sorteios = {}, [], Counter()
+    criadas, sorteadas, saidas, renovadas = {}, {}, {}, Counter()
+    duracoes, desfechos = [], Counter()
+    cancelamentos = 0
+    for l in linhas:
+        d = dia(l.ocorrido_em)
+        balde = baldes.setdefault((l.especialidade, l.estado, l.municipio), len(baldes))
+        if l.tipo == INSCRICAO_CRIADA:
+            criadas[l.inscricao_id] = d
+            if not (l.dados or {}).get("origem"):  # reentradas o simulador gera sozinho
+                chegadas.append((d, balde))
+        elif l.tipo == INSCRICAO_SORTEADA:
+            sorteadas[l.inscricao_id] = d
+            saidas.setdefault(l.inscricao_id, d)
+            sorteios[balde] += 1
+        elif l.tipo == INSCRICAO_RENOVADA:
+            renovadas[l.inscricao_id] += 1
+        elif l.tipo == INSCRICAO_CANCELADA:
+            cancelamentos += 1
+            saidas.setdefault(l.inscricao_id, d)
+        elif l.tipo in DESFECHOS_DO_LOG and l.inscricao_id in sorteadas:
+            desfechos[DESFECHOS_DO_LOG[l.tipo]] += 1
+            duracoes.append(d - sorteadas.pop(l.inscricao_id))
+
+    # Espera acumulada (para a taxa de desistência) e inscrições que expiraram sem renovar
+    dias_na_fila = expiradas = 0
+    for i, criada in criadas.items():
+        limite = criada + prazo * (1 + renovadas[i])
+        dias_na_fila += min(saidas.get(i, periodo), limite, periodo) - criada
+        expiradas += i not in saidas and limite <= periodo
+    total_renovacoes = sum(renovadas.values())
+    total_desfechos = sum(desfechos.values())
+
+    dias, indices = zip(*chegadas) if chegadas else ((), ())
+    return Cenario(
+        nomes=[f"{esp} {mun}/{uf}" for esp, uf, mun in baldes],
+        chegadas=np.bincount(np.array(indices, dtype=np.int64), minlength=len(baldes)) / periodo,
+        sorteios=np.array([sorteios[i] for i in range(len(baldes))], dtype=float) / periodo,
+        renovacao=total_renovacoes / (total_renovacoes + expiradas) if total_renovacoes + expiradas else PADROES["renovacao"],
+        desistencia=cancelamentos / dias_na_fila if dias_na_fila else PADROES["desistencia"],
+        duracao=sum(duracoes) / len(duracoes) if duracoes else PADROES["duracao"],
+        desfechos={a: desfechos[a] / total_desfechos for a in DESFECHOS} if total_desfechos else PADROES["desfechos"],
+        replay=(np.array(dias, dtype=float), np.array(indices, dtype=np.int64)),
+        periodo=periodo,
+    )
+
+
+# ------------------------
+# Simulação
+# ------------------------
+CAMPOS = {"balde": "int64", "status": "int16", "origem": "float64", "expira": "float64",
+          "fim": "float64", "decidiu": "bool"}
+
+
+def _transicionar(acao, fila, indices):
+    # Mesma regra das rotas para a inscrição: status de origem permitidos e status de destino
+    regra = TRANSICOES[acao]["sorteio_atendimento"]
+    status = fila["status"]
+    invalidos = indices[~np.isin(status[indices], [CODIGOS[s] for s in regra.origens])]
+    if invalidos.size:
+        raise TransicaoInvalida(acao, NOMES[int(status[invalidos[0]])])
+    status[indices] = CODIGOS[regra.destino]
+
+
+def _acrescentar(fila, balde, origem, inicio, prazo):
+    novas = {
+        "balde": balde, "status": np.full(balde.size, CODIGOS[AGUARDANDO_SORTEIO]), "origem": origem,
+        "expira": inicio + prazo, "fim": np.full(balde.size, np.inf), "decidiu": np.zeros(balde.size, bool),
+    }
+    for campo, tipo in CAMPOS.items():
+        fila[campo] = np.concatenate([fila[campo], novas[campo].astype(tipo)])
+
+
+def _compactar(fila, t, contagem):
+    # Tira da fila o que já terminou; expirar não é transição (a inscrição só deixa de ser elegível)
+    status = fila["status"]
+    aguardando = status == CODIGOS[AGUARDANDO_SORTEIO]
+    expiradas = aguardando & (fila["expira"] <= t)
+    vivas = (aguardando & ~expiradas) | (status == CODIGOS[SORTEADO])
+    contagem["expiradas"] += int(expiradas.sum())
+    for campo in CAMPOS:
+        fila[campo] = fila[campo][vivas]
+
+
+def simular(cenario, politica, dias, passo=1.0, semente=0):
+    """Roda `dias` de plataforma em passos de `passo` dias. Devolve contagens, esperas e fila por passo."""
+    _carregar_numpy()
+    # Um gerador por processo: chegadas e sorteios iguais entre políticas com a mesma semente
+    rng = {nome: np.random.default_rng([semente, i])
+           for i, nome in enumerate(("chegadas", "sorteios", "escolha", "pacientes", "desfechos"))}
+    nbaldes = len(cenario.nomes)
+    prazo = politica.prazo_dias
+    acoes = list(cenario.desfechos)
+    chances = np.array([cenario.desfechos[a] for a in acoes])
+    chances = chances / chances.sum()
+
+    fila = {campo: np.empty(0, tipo) for campo, tipo in CAMPOS.items()}
+    contagem = Counter()
+    esperas = []
+    passos = int(math.ceil(dias / passo))
+    tamanho = np.zeros(passos, dtype=np.int64)
+    aguardando, sorteado = CODIGOS[AGUARDANDO_SORTEIO], CODIGOS[SORTEADO]
+
+    for i in range(passos):
+        t0, t = i * passo, (i + 1) * passo
+
+        # Chegadas: do log enquanto houver, depois pelas taxas
+        if cenario.replay is not None and t0 < cenario.periodo:
+            quando = (cenario.replay[0] >= t0) & (cenario.replay[0] < t)
+            instantes, baldes = cenario.replay[0][quando], cenario.replay[1][quando]
+        else:
+            baldes = np.repeat(np.arange(nbaldes), rng["chegadas"].poisson(cenario.chegadas * passo))
+            instantes = t0 + rng["chegadas"].random(baldes.size) * passo
+        _acrescentar(fila, baldes, instantes, instantes, prazo)
+        contagem["inscricoes"] += baldes.size
+
+        # Fim dos atendimentos; a reentrada volta à fila com a primeira inscrição como origem
+        terminados = np.flatnonzero((fila["status"] == sorteado) & (fila["fim"] <= t))
+        escolhas = rng["desfechos"].choice(len(acoes), size=terminados.size, p=chances)
+        reentradas = []
+        for j, acao in enumerate(acoes):
+            indices = terminados[escolhas == j]
+            _transicionar(acao, fila, indices)
+            contagem[acao] += indices.size
+            if acao in politica.reentrada:
+                reentradas.append(indices)
+        if reentradas:
+            indices = np.concatenate(reentradas)
+            _acrescentar(fila, fila["balde"][indices], fila["origem"][indices], fila["fim"][indices], prazo)
+            contagem["reentradas"] += indices.size
+
+        # Pacientes: desistência durante a espera; renovação ao receber o lembrete
+        na_fila = np.flatnonzero((fila["status"] == aguardando) & (fila["expira"] > t))
+        desistem = rng["pacientes"].random(na_fila.size) < -np.expm1(-cenario.desistencia * passo)
+        _transicionar("cancelar_inscricao", fila, na_fila[desistem])
+        contagem["desistencias"] += int(desistem.sum())
+        na_fila = na_fila[~desistem]
+        avisados = na_fila[~fila["decidiu"][na_fila] & (fila["expira"][na_fila] - ANTECEDENCIA_RENOVACAO <= t)]
+        renovam = rng["pacientes"].random(avisados.size) < cenario.renovacao
+        fila["expira"][avisados[renovam]] = t + prazo  # renovar_sorteio: agora + prazo
+        fila["decidiu"][avisados[~renovam]] = True
+        contagem["renovacoes"] += int(renovam.sum())
+
+        # Sorteios: em cada balde, até `vagas` inscrições elegíveis ao acaso (como random.choice)
+        vagas = rng["sorteios"].poisson(cenario.sorteios * passo)
+        elegiveis = np.flatnonzero((fila["status"] == aguardando) & (fila["expira"] > t))
+        baldes = fila["balde"][elegiveis]
+        ordem = np.lexsort((rng["escolha"].random(elegiveis.size), baldes))
+        elegiveis, baldes = elegiveis[ordem], baldes[ordem]
+        por_balde = np.bincount(baldes, minlength=nbaldes)
+        posicao = np.arange(elegiveis.size) - (np.cumsum(por_balde) - por_balde)[baldes]
+        sorteadas = elegiveis[posicao < vagas[baldes]]
+        _transicionar("sortear", fila, sorteadas)
+        fila["fim"][sorteadas] = t + rng["desfechos"].exponential(cenario.duracao, sorteadas.size)
+        esperas.append(t - fila["origem"][sorteadas])
+        contagem["sorteios"] += sorteadas.size
+        tamanho[i] = elegiveis.size - sorteadas.size
+
+        if i % 30 == 29:
+            _compactar(fila, t, contagem)
+
+    _compactar(fila, passos * passo, contagem)
+    contagem["aguardando ao fim"] = int((fila["status"] == aguardando).sum())
+    contagem["em atendimento ao fim"] = int((fila["status"] == sorteado).sum())
+    return {"contagem": contagem, "esperas": np.concatenate(esperas), "fila": tamanho, "passo": passo}
+
+
+def resumir(resultado):
+    """Linhas (rótulo, valor) para a tabela comparativa."""
+    _carregar_numpy()
+    c, esperas, fila = resultado["contagem"], resultado["esperas"], resultado["fila"]
+    entradas = max(c["inscricoes"] + c["reentradas"], 1)
+    p = lambda q: f"{np.percentile(esperas, q):.1f}" if esperas.size else "-"
+    linhas = [
+        ("inscrições novas", c["inscricoes"]),
+        ("reentradas", c["reentradas"]),
+        ("renovações", c["renovacoes"]),
+        ("sorteadas", f"{c['sorteios']} ({c['sorteios'] / entradas:.0%})"),
+        ("expiradas sem sorteio", f"{c['expiradas']} ({c['expiradas'] / entradas:.0%})"),
+        ("desistências", c["desistencias"]),
+        ("atendimentos concluídos", c["concluir"]),
+        ("cancelados pelo profissional", c["cancelar_profissional"]),
+        ("espera p50 (dias)", p(50)),
+        ("espera p90 (dias)", p(90)),
+        ("espera p99 (dias)", p(99)),
+        ("fila média", f"{fila.mean():.0f}" if fila.size else "-"),
+        ("fila máxima", int(fila.max()) if fila.size else "-"),
+    ]
+    por_mes = max(int(round(30 / resultado["passo"])), 1)
+    for i in range(por_mes - 1, fila.size, por_mes):
+        linhas.append((f"fila no dia {int(round((i + 1) * resultado['passo']))}", int(fila[i])))
+    return linhas
+
+
+@click.command("simular")
+@click.option("--prazo", type=float, default=None, help="Prazo da inscrição proposto, em dias (padrão: o atual).")
+@click.option("--reentrada/--sem-reentrada", default=None,
+              help="Proposta: cancelamento pelo profissional devolve o paciente à fila (padrão: o atual).")
+@click.option("--fonte", type=click.Choice(["log", "sintetico"]), default="log",
+              help="Cenário medido no log de eventos ou sintético.")
+@click.option("--dias", type=int, default=None, help="Tempo de plataforma simulado (padrão: período do log, ou 180).")
+@click.option("--passo-horas", type=float, default=24.0)
+@click.option("--baldes", type=int, default=500, help="Sintético: especialidade x município.")
+@click.option("--chegadas", type=float, default=2.0, help="Sintético: inscrições por dia por balde, em média.")
+@click.option("--sorteios", type=float, default=1.5, help="Sintético: sorteios por dia por balde, em média.")
+@click.option("--renovacao", type=float, default=None, help="Chance de renovar ao receber o lembrete.")
+@click.option("--desistencia", type=float, default=None, help="Cancelamentos de inscrição por dia de espera.")
+@click.option("--duracao", type=float, default=None, help="Dias do sorteio ao desfecho do atendimento.")
+@click.option("--semente", type=int, default=0)
+@with_appcontext
+def simular_command(prazo, reentrada, fonte, dias, passo_horas, baldes, chegadas, sorteios,
+                    renovacao, desistencia, duracao, semente):
+    """Compara a política atual da fila com uma proposta (prazo, reentrada)."""
+    try:
+        _carregar_numpy()
+    except ImportError:
+        raise click.ClickException("O simulador precisa do NumPy: pip install numpy") from None
+    if fonte == "log":
+        cenario = cenario_do_log()
+        if cenario is None:
+            raise click.ClickException("Log de eventos vazio: use --fonte sintetico.")
+    else:
+        cenario = cenario_sintetico(baldes, chegadas, sorteios, semente)
+    ajustes = {"renovacao": renovacao, "desistencia": desistencia, "duracao": duracao}
+    cenario = cenario._replace(**{k: v for k, v in ajustes.items() if v is not None})
+    dias = dias or (math.ceil(cenario.periodo) if cenario.periodo else 180)
+
+    proposta = Politica(
+        POLITICA_ATUAL.prazo_dias if prazo is None else prazo,
+        POLITICA_ATUAL.reentrada if reentrada is None else (("cancelar_profissional",) if reentrada else ()),
+    )
+    click.echo(
+        f"{len(cenario.nomes)} baldes, {cenario.chegadas.sum():.1f} inscrições/dia, "
+        f"{cenario.sorteios.sum():.1f} sorteios/dia, renovação {cenario.renovacao:.0%}, "
+        f"desistência {cenario.desistencia:.3f}/dia, duração {cenario.duracao:.1f} dias, {dias} dias simulados"
+    )
+    colunas = []
+    for politica in (POLITICA_ATUAL, proposta):
+        inicio = time.perf_counter()
+        colunas.append(resumir(simular(cenario, politica, dias, passo_horas / 24, semente)))
+        click.echo(f"  prazo {politica.prazo_dias:g} dias, reentrada {'sim' if politica.reentrada else 'não'}: "
+                   f"{time.perf_counter() - inicio:.2f}s")
+
+    click.echo(f"\n{'':<28}{'atual':>16}{'proposta':>16}")
+    for (rotulo, atual), (_, novo) in zip(*colunas):
+        click.echo(f"{rotulo:<28}{atual!s:>16}{novo!s:>16}")
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Os testes rodam na pasta backend (python -m pytest), com banco SQLite temporário
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'teste.sqlite3')}"
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from database import db
+from models import Paciente, Profissional
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Paciente(email="pac@example.com", senha_hash="-", nome="Paciente"),
+            Profissional(email="prof@example.com", senha_hash="-", nome="Profissional"),
+        ])
+        db.session.commit()
+    return app
+
+
+@pytest.fixture(scope="session")
+def tokens(app):
+    with app.app_context():
+        return {
+            "paciente": create_access_token(identity="1", additional_claims={"tipo": "paciente"}),
+            "profissional": create_access_token(identity="2", additional_claims={"tipo": "profissional"}),
+        }
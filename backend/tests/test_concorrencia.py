@@ -0,0 +1,75 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+from models import SorteioAtendimento, Atendimento
+
+RODADAS = 20
+JUSTIFICATIVA = {"justificativa": "Cancelamento concorrente para teste de versão."}
+
+# Par de operações disparadas ao mesmo tempo: (quem, ação)
+CENARIOS = {
+    "cancelar x concluir": [("paciente", "cancelar"), ("profissional", "concluir")],
+    "cancelar x cancelar": [("profissional", "cancelar"), ("profissional", "cancelar")],
+    "concluir x concluir": [("profissional", "concluir"), ("profissional", "concluir")],
+}
+
+# Estado do atendimento -> estado esperado da inscrição
+COERENTES = {
+    "cancelado_paciente": "cancelado_paciente",
+    "cancelado_profissional": "cancelado_profissional",
+    "finalizado_profissional": "finalizado_profissional",
+}
+
+
+def novo_atendimento():
+    agora = datetime.utcnow()
+    inscricao = SorteioAtendimento(
+        paciente_id=1, profissional_id=2, especialidade="Cardiologia", estado="SP",
+        municipio="São Paulo", status="sorteado_em_atendimento", data_inscricao=agora,
+        data_sorteio=agora,
+    )
+    db.session.add(inscricao)
+    db.session.flush()
+    atendimento = Atendimento(
+        paciente_id=1, profissional_id=2, especialidade="Cardiologia", status="Em atendimento",
+        data_inicio=agora, data_fim=agora + timedelta(days=30), inscricao_id=inscricao.id,
+    )
+    db.session.add(atendimento)
+    db.session.commit()
+    return atendimento.id, inscricao.id
+
+
+def disparar(app, operacoes, atendimento_id, tokens):
+    barreira = threading.Barrier(len(operacoes))
+    respostas = [None] * len(operacoes)
+
+    def executar(i, quem, acao):
+        cliente = app.test_client()
+        barreira.wait()
+        respostas[i] = cliente.put(
+            f"/auth/atendimentos/{atendimento_id}/{acao}", json=JUSTIFICATIVA,
+            headers={"Authorization": f"Bearer {tokens[quem]}"},
+        ).status_code
+
+    threads = [threading.Thread(target=executar, args=(i, *op)) for i, op in enumerate(operacoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return respostas
+
+
+@pytest.mark.parametrize("operacoes", CENARIOS.values(), ids=CENARIOS.keys())
+def test_uma_transicao_vence_por_rodada(app, tokens, operacoes):
+    for _ in range(RODADAS):
+        with app.app_context():
+            atendimento_id, inscricao_id = novo_atendimento()
+        respostas = disparar(app, operacoes, atendimento_id, tokens)
+        assert respostas.count(200) == 1, respostas
+        with app.app_context():
+            atendimento = db.session.get(Atendimento, atendimento_id)
+            inscricao = db.session.get(SorteioAtendimento, inscricao_id)
+            assert COERENTES.get(atendimento.status) == inscricao.status
@@ -1,26 +1,11 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt
-from models import User
+from sqlalchemy.orm import selectin_polymorphic
 
-users_bp = Blueprint("users", __name__, url_prefix="/users")
+from models import User, Paciente, Profissional
+from serializacao import serialize_user
 
-def serialize_user(u: User):
-    return {
-        "id": u.id,
-        "tipo": u.tipo,
-        "email": u.email,
-        "nome": u.nome,
-        "telefone": u.telefone,
-        "cep": u.cep,
-        "endereco": u.endereco,
-        "especialidade_necessaria": u.especialidade_necessaria,
-        "descricao_necessidade": u.descricao_necessidade,
-        "especialidade": u.especialidade,
-        "local_atendimento": u.local_atendimento,
-        "registro_conselho": u.registro_conselho,
-        "cidade": u.cidade,
-        "criado_em": u.criado_em.isoformat()
-    }
+users_bp = Blueprint("users", __name__, url_prefix="/users")
 
 # Lista todos os usuários
 @users_bp.get("/")
@@ -28,21 +13,24 @@ def serialize_user(u: User):
 def listar_todos():
     # Exemplo simples, sem filtro por perfil.
     # Poderia verificar: if get_jwt().get("tipo") != "admin": return 403
-    usuarios = User.query.order_by(User.criado_em.desc()).all()
+    usuarios = (
+        User.query.options(selectin_polymorphic(User, [Paciente, Profissional]))
+        .order_by(User.criado_em.desc()).all()
+    )
     return jsonify([serialize_user(u) for u in usuarios])
 
 # Lista apenas pacientes
 @users_bp.get("/pacientes")
 @jwt_required()
 def listar_pacientes():
-    usuarios = User.query.filter_by(tipo="paciente").order_by(User.criado_em.desc()).all()
+    usuarios = Paciente.query.order_by(Paciente.criado_em.desc()).all()
     return jsonify([serialize_user(u) for u in usuarios])
 
 # Lista apenas profissionais
 @users_bp.get("/profissionais")
 @jwt_required()
 def listar_profissionais():
-    usuarios = User.query.filter_by(tipo="profissional").order_by(User.criado_em.desc()).all()
+    usuarios = Profissional.query.order_by(Profissional.criado_em.desc()).all()
     return jsonify([serialize_user(u) for u in usuarios])
 
 # Buscar por email (?email=)
@@ -1,32 +1,134 @@
 import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 import os
 
+# Envio fora da requisição: o handler responde e o SMTP fica com um pool de threads do processo
+EMAIL_ASSINCRONO = os.getenv("EMAIL_ASSINCRONO", "1") == "1"
+EMAIL_THREADS = int(os.getenv("EMAIL_THREADS", 4))
+# Acima disso a requisição volta a esperar o envio: segura o backlog que o desligamento
+# gracioso do worker (graceful_timeout) consegue esvaziar
+EMAIL_FILA_MAXIMA = int(os.getenv("EMAIL_FILA_MAXIMA", 100))
+
+
+def _config():
+    smtp_server = os.getenv("SMTP_SERVER")
+    smtp_port = int(os.getenv("SMTP_PORT", 587))
+    smtp_username = os.getenv("SMTP_USERNAME")
+    smtp_password = os.getenv("SMTP_PASSWORD")
+    email_from = os.getenv("EMAIL_FROM", smtp_username)
+
+    if not all([smtp_server, smtp_port, smtp_username, smtp_password]):
+        return None
+    return smtp_server, smtp_port, smtp_username, smtp_password, email_from
+
+
+def _mensagem(email_from, destinatario, assunto, mensagem):
+    msg = MIMEText(mensagem, "plain", "utf-8")
+    msg["Subject"] = assunto
+    msg["From"] = email_from
+    msg["To"] = destinatario
+    return msg.as_string()
+
+
+@contextmanager
+def sessao_smtp():
+    """Conexão SMTP autenticada reaproveitada por vários envios.
+
+    Entrega uma função enviar(destinatario, assunto, mensagem), ou None se o SMTP não estiver configurado.
+    """
+    config = _config()
+    if not config:
+        print("[ERRO] Configurações SMTP ausentes no .env")
+        yield None
+        return
+    smtp_server, smtp_port, smtp_username, smtp_password, email_from = config
+
+    with smtplib.SMTP(smtp_server, smtp_port) as server:
+        # SMTP_STARTTLS=0 só para relays locais sem TLS (ex.: servidor de testes)
+        if os.getenv("SMTP_STARTTLS", "1") == "1":
+            server.starttls()
+        server.login(smtp_username, smtp_password)
+
+        def enviar(destinatario, assunto, mensagem):
+            server.sendmail(email_from, [destinatario], _mensagem(email_from, destinatario, assunto, mensagem))
+
+        yield enviar
+
+
 def enviar_email(destinatario, assunto, mensagem):
     try:
-        smtp_server = os.getenv("SMTP_SERVER")
-        smtp_port = int(os.getenv("SMTP_PORT", 587))
-        smtp_username = os.getenv("SMTP_USERNAME")
-        smtp_password = os.getenv("SMTP_PASSWORD")
-        email_from = os.getenv("EMAIL_FROM", smtp_username)
-
-        if not all([smtp_server, smtp_port, smtp_username, smtp_password]):
-            print("[ERRO] Configurações SMTP ausentes no .env")
-            return False
-
-        msg = MIMEText(mensagem, "plain", "utf-8")
-        msg["Subject"] = assunto
-        msg["From"] = email_from
-        msg["To"] = destinatario
-
-        # Conexão e envio
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.sendmail(email_from, [destinatario], msg.as_string())
+        with sessao_smtp() as enviar:
+            if not enviar:
+                return False
+            enviar(destinatario, assunto, mensagem)
 
         print(f"[EMAIL] Enviado para {destinatario}")
         return True
     except Exception as e:
         print(f"[ERRO] Falha ao enviar e-mail: {e}")
         return False
+
+
+def enviar_emails_em_lote(mensagens):
+    """Envia (chave, destinatario, assunto, mensagem) numa única sessão SMTP.
+
+    Devolve (enviadas, recusadas): chaves enviadas e chaves com destinatário recusado pelo
+    servidor. Uma recusa não interrompe o lote; queda da conexão encerra o envio.
+    """
+    enviadas, recusadas = [], []
+    try:
+        with sessao_smtp() as enviar:
+            if not enviar:
+                return enviadas, recusadas
+            for chave, destinatario, assunto, mensagem in mensagens:
+                try:
+                    enviar(destinatario, assunto, mensagem)
+                    enviadas.append(chave)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                    print(f"[ERRO] Falha ao enviar e-mail para {destinatario}: {e}")
+                    recusadas.append(chave)
+    except Exception as e:
+        print(f"[ERRO] Falha na sessão SMTP: {e}")
+    print(f"[EMAIL] Lote: {len(enviadas)} enviados, {len(recusadas)} recusados")
+    return enviadas, recusadas
+
+
+_fila = None
+_trava_fila = threading.Lock()
+_vagas = threading.BoundedSemaphore(EMAIL_FILA_MAXIMA)
+
+
+def _descartar_fila():
+    # Threads não sobrevivem ao fork (gunicorn com preload): o worker cria o seu pool
+    global _fila, _vagas
+    _fila = None
+    _vagas = threading.BoundedSemaphore(EMAIL_FILA_MAXIMA)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_fila)
+
+
+def enviar_email_em_segundo_plano(destinatario, assunto, mensagem):
+    """Como enviar_email, sem esperar o SMTP: devolve True se a mensagem foi aceita para envio.
+
+    Falhas no envio só aparecem no log. Com EMAIL_ASSINCRONO=0, ou com a fila cheia, envia na hora.
+    """
+    global _fila
+    if not EMAIL_ASSINCRONO:
+        return enviar_email(destinatario, assunto, mensagem)
+    if not _config():
+        print("[ERRO] Configurações SMTP ausentes no .env")
+        return False
+    vagas = _vagas
+    if not vagas.acquire(blocking=False):
+        return enviar_email(destinatario, assunto, mensagem)
+    with _trava_fila:
+        if _fila is None:
+            _fila = ThreadPoolExecutor(EMAIL_THREADS, thread_name_prefix="email")
+    # Na saída do processo o interpretador espera a fila esvaziar
+    _fila.submit(enviar_email, destinatario, assunto, mensagem).add_done_callback(lambda _: vagas.release())
+    return True
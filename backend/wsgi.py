@@ -0,0 +1,18 @@
+import os
+
+from app import create_app
+
+# Ponto de entrada de produção. Linux/macOS: gunicorn -c gunicorn.conf.py wsgi:app
+# Windows (sem fork): python wsgi.py, com waitress
+app = create_app()
+
+
+if __name__ == "__main__":
+    from waitress import serve
+
+    serve(
+        app,
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 5000)),
+        threads=int(os.getenv("WEB_THREADS", 8)),
+    )
@@ -1,4 +1,4 @@
-import React, { useEffect, useMemo, useState } from "react";
+import React, { useEffect, useMemo, useState, useRef } from "react";
 import {
   Container,
   Typography,
@@ -14,7 +14,7 @@ import {
   Stack,
 } from "@mui/material";
 import { useNavigate } from "react-router-dom";
-import api from "./api";
+import api, { acaoIdempotente } from "./api";
 
 // Lista mock de especialidades; pode vir do backend futuramente
 const especialidadesDisponiveis = [
@@ -54,6 +54,7 @@ const isCPFValido = (cpf) => {
 
 const CadastroPaciente = () => {
   const navigate = useNavigate();
+  const cadastrar = useRef(acaoIdempotente()).current; // mesma chave nos reenvios
   const [form, setForm] = useState({
     cpf: "",
     email: "",
@@ -204,7 +205,7 @@ const CadastroPaciente = () => {
     }
 
     try {
-      await api.post("/auth/register/paciente", { ...form, cpf: form.cpf.replace(/\D/g, "") });
+      await cadastrar((config) => api.post("/auth/register/paciente", { ...form, cpf: form.cpf.replace(/\D/g, "") }, config));
       setMsg("Cadastro realizado com sucesso!");
       setTimeout(() => navigate("/login"), 1500);
     } catch (err) {
@@ -18,7 +18,7 @@ import {
 import Grid from "@mui/material/Grid";
 import InfoOutlinedIcon from "@mui/icons-material/InfoOutlined";
 import { useNavigate } from "react-router-dom";
-import api from "./api";
+import api, { acaoIdempotente } from "./api";
 
 // Key do Google (use .env preferencialmente)
 const GOOGLE_MAPS_API_KEY =
@@ -44,6 +44,7 @@ const especialidadesDisponiveis = [
 export default function CadastroProfissional() {
   const navigate = useNavigate();
 
+  const cadastrar = useRef(acaoIdempotente()).current; // mesma chave nos reenvios
   const [form, setForm] = useState({
     email: "",
     senha: "",
@@ -279,7 +280,7 @@ export default function CadastroProfissional() {
     }
 
     try {
-      await api.post("/auth/register/profissional", form);
+      await cadastrar((config) => api.post("/auth/register/profissional", form, config));
       setMsg("Cadastro realizado com sucesso!");
       setTimeout(() => navigate("/login"), 1500);
     } catch (err) {
@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useState, useRef } from "react";
 import {
   Container,
   Box,
@@ -7,13 +7,14 @@ import {
   Button,
   Paper,
 } from "@mui/material";
-import api from "./api";
+import api, { acaoIdempotente } from "./api";
 import { useNavigate } from "react-router-dom";
 
 const EsqueciSenha = () => {
   const navigate = useNavigate();
 
   const [email, setEmail] = useState("");
+  const enviarCodigo = useRef(acaoIdempotente()).current; // mesma chave nos reenvios
   const [codigo, setCodigo] = useState("");
   const [novaSenha, setNovaSenha] = useState("");
 
@@ -24,7 +25,7 @@ const EsqueciSenha = () => {
   const handleEnviarCodigo = async () => {
     setMsg("");
     try {
-      const res = await api.post("/auth/enviar-codigo", { email });
+      const res = await enviarCodigo((config) => api.post("/auth/enviar-codigo", { email }, config));
       setMsg(res.data.message);
       setMsgColor("success.main");
       setEtapa(2);
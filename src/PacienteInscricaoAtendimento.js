@@ -1,4 +1,4 @@
-import React, { useMemo, useState } from "react";
+import React, { useMemo, useState, useRef } from "react";
 import {
   Container,
   Typography,
@@ -14,7 +14,7 @@ import {
   Stack,
 } from "@mui/material";
 import { useNavigate } from "react-router-dom";
-import api from "./api"; // import da instância axios configurada
+import api, { acaoIdempotente } from "./api"; // import da instância axios configurada
 
 // Mock de Estados e Municípios
 const estadosMunicipios = {
@@ -60,6 +60,7 @@ const especialidadesMock = [
 
 const PacienteInscricaoAtendimento = () => {
   const navigate = useNavigate();
+  const inscrever = useRef(acaoIdempotente()).current; // mesma chave nos reenvios
   const [form, setForm] = useState({
     estado: "",
     municipio: "",
@@ -100,12 +101,12 @@ const PacienteInscricaoAtendimento = () => {
     }
 
     try {
-      await api.post("/auth/paciente/sorteios", {
+      await inscrever((config) => api.post("/auth/paciente/sorteios", {
         estado: form.estado,
         municipio: form.municipio,
         especialidade: form.especialidade,
         descricao: form.descricao,
-      });
+      }, config));
 
       setMsgTipo("success");
       setMsg("Inscrição realizada com sucesso! Aguarde ser sorteado.");
@@ -1,4 +1,4 @@
-import React, { useState, useMemo, useEffect } from "react";
+import React, { useState, useMemo, useEffect, useRef } from "react";
 import {
   Container,
   Typography,
@@ -16,7 +16,7 @@ import {
   CircularProgress,
 } from "@mui/material";
 import { useNavigate, useLocation } from "react-router-dom";
-import api from "./api";
+import api, { acaoIdempotente } from "./api";
 
 const statusColor = (statusLegivel) => {
   // Ajuste para usar os status amigáveis vindos do backend
@@ -43,6 +43,7 @@ const ProfissionalDashboard = () => {
   const navigate = useNavigate();
   const { state } = useLocation();
   const [atendimentos, setAtendimentos] = useState([]);
+  const sortear = useRef(acaoIdempotente()).current; // mesma chave nos reenvios
   const [loading, setLoading] = useState(true);
   const [msg, setMsg] = useState("");
 
@@ -115,7 +116,7 @@ const ProfissionalDashboard = () => {
   const handleSortear = async () => {
     setMsg("");
     try {
-      const res = await api.get("/auth/sortear-paciente");
+      const res = await sortear((config) => api.get("/auth/sortear-paciente", config));
       //navigate("/profissional/paciente-sorteado", {
       navigate(`/profissional/atendimento/${res.data.atendimento.id}`, {
         state: {
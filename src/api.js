@@ -17,7 +17,69 @@ api.interceptors.request.use((config) => {
     delete config.headers["Content-Type"];
   }
 
+  // Chave de idempotência: quem não recebeu uma de acaoIdempotente() ganha uma por requisição,
+  // que vale para as novas tentativas automáticas abaixo (mesmo config, mesma chave)
+  const altera = ["post", "put", "patch", "delete"].includes(config.method) || config.url?.includes("/sortear-paciente");
+  if (altera && !config.headers["Idempotency-Key"]) {
+    config.headers["Idempotency-Key"] = novaChave();
+  }
+
   return config;
 });
 
+// Nova tentativa automática quando a resposta não chegou (rede caiu) ou o servidor pediu para
+// esperar (409 da requisição original ainda em andamento, 503 com Retry-After). O config é o
+// mesmo, então a chave de idempotência também: o back-end repete a resposta já dada.
+const MAX_TENTATIVAS = 2;
+
+api.interceptors.response.use(undefined, async (err) => {
+  const config = err.config;
+  const status = err.response?.status;
+  const repetir = (!err.response && !axios.isCancel(err)) || status === 409 || status === 503;
+  const idempotente = config && (config.method === "get" || config.headers?.["Idempotency-Key"]);
+  if (!repetir || !idempotente || (config.__tentativas || 0) >= MAX_TENTATIVAS) {
+    throw err;
+  }
+  if (status === 409 && !emAndamento(err)) {
+    throw err; // conflito de verdade (CPF já cadastrado, registro alterado por outro...)
+  }
+  config.__tentativas = (config.__tentativas || 0) + 1;
+  const espera = Number(err.response?.headers["retry-after"]) || config.__tentativas;
+  await new Promise((resolve) => setTimeout(resolve, Math.min(espera, 10) * 1000));
+  return api(config);
+});
+
+// 409 com Retry-After: a requisição original com esta chave ainda está em processamento
+function emAndamento(err) {
+  return err.response?.status === 409 && Boolean(err.response.headers["retry-after"]);
+}
+
+function novaChave() {
+  return window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
+// Uma chave por ação do usuário (envio de um formulário, clique em "Sortear"): guarde o retorno
+// num useRef e faça cada envio da mesma ação por ele, passando o config recebido ao api.
+// Enquanto o servidor não responder, reenvios (duplo clique, novo clique depois de a rede cair)
+// repetem a chave e o back-end devolve a resposta já dada em vez de cadastrar/sortear de novo;
+// depois de uma resposta, o próximo envio ganha chave nova.
+export function acaoIdempotente() {
+  let chave = null;
+  return async (enviar) => {
+    chave = chave || novaChave();
+    try {
+      const res = await enviar({ headers: { "Idempotency-Key": chave } });
+      chave = null;
+      return res;
+    } catch (err) {
+      if (err.response && !emAndamento(err)) {
+        chave = null;
+      }
+      throw err;
+    }
+  };
+}
+
 export default api;
\ No newline at end of file